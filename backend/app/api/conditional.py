@@ -0,0 +1,87 @@
+"""Conditional GET helpers: strong ETags, If-None-Match and Cache-Control.
+
+Public endpoints derive their ETag from content versions that are cheap to
+read (``Book.manifest_version`` plus the Redis content revision bumped by
+every admin write), so a matching ``If-None-Match`` is answered with 304
+before any content query runs. When Redis is unavailable the ETag falls
+back to a hash of the response body — still correct, it only saves
+bandwidth instead of database work.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+from app.cache import get_content_revision
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def compute_etag(*parts) -> str:
+    """Quoted strong ETag from version parts."""
+    raw = "-".join(str(p) for p in parts)
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def content_etag(body: bytes) -> str:
+    """Quoted strong ETag from the response body itself."""
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+async def versioned_etag(*parts) -> Optional[str]:
+    """ETag tied to the current content revision, or None without Redis."""
+    revision = await get_content_revision()
+    if revision is None:
+        return None
+    return compute_etag(*parts, revision)
+
+
+def etag_matches(request: Request, etag: str, allow_wildcard: bool = True) -> bool:
+    """Weak comparison of If-None-Match against ``etag`` (RFC 9110 §13.1.2).
+
+    ``*`` matches any existing representation; pass ``allow_wildcard=False``
+    when answering before the resource is known to exist.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return allow_wildcard
+    wanted = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == wanted or candidate.strip('"') == wanted.strip('"'):
+            return True
+    return False
+
+
+def not_modified_response(etag: str, cache_control: Optional[str] = None) -> Response:
+    return Response(
+        status_code=304,
+        headers={
+            "ETag": etag,
+            "Cache-Control": cache_control or settings.PUBLIC_CACHE_CONTROL,
+        },
+    )
+
+
+def conditional_json_response(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    cache_control: Optional[str] = None,
+) -> Response:
+    """Return ``body`` as JSON with ETag/Cache-Control, or 304 if the client has it."""
+    etag = etag or content_etag(body)
+    if etag_matches(request, etag):
+        return not_modified_response(etag, cache_control)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={
+            "ETag": etag,
+            "Cache-Control": cache_control or settings.PUBLIC_CACHE_CONTROL,
+        },
+    )
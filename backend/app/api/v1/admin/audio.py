@@ -1,13 +1,15 @@
 """Admin audio management endpoints."""
 
+import functools
 import os
 import shutil
 import logging
+import time
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Query
 from fastapi.responses import FileResponse
-from sqlalchemy import select, delete as sa_delete
+from sqlalchemy import select, delete as sa_delete, insert as sa_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -19,6 +21,11 @@ from app.models.book import TextUnit
 from app.models.system import AuditLog
 from app.schemas.audio import AudioFileOut, AudioSegmentOut, AudioSegmentUpdate, SegmentMappingCreate, SegmentMappingOut
 from app.config import get_settings
+from app.services.manifest_stats import (
+    adjust_manifest_stats, count_published_mappings, refresh_manifest_stats,
+)
+from app.services.page_cache import invalidate_page_cache
+from app.services.page_payload import segment_url
 from app.utils.validators import validate_file_extension, sanitize_filename
 
 logger = logging.getLogger("muallimi")
@@ -144,7 +151,7 @@ async def get_segments(
         AudioSegmentOut(
             id=s.id,
             segment_index=s.segment_index,
-            file_url=f"{settings.MEDIA_BASE_URL}/{s.file_path}" if s.file_path else None,
+            file_url=segment_url(s.id, s.file_path, s.byte_start),
             start_ms=s.start_ms,
             end_ms=s.end_ms,
             duration_ms=s.duration_ms,
@@ -182,7 +189,7 @@ async def update_segment(
     return AudioSegmentOut(
         id=seg.id,
         segment_index=seg.segment_index,
-        file_url=f"{settings.MEDIA_BASE_URL}/{seg.file_path}" if seg.file_path else None,
+        file_url=segment_url(seg.id, seg.file_path, seg.byte_start),
         start_ms=seg.start_ms,
         end_ms=seg.end_ms,
         duration_ms=seg.duration_ms,
@@ -196,6 +203,7 @@ async def update_segment(
 @router.delete("/segments/{segment_id}")
 async def delete_segment(
     segment_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -211,8 +219,11 @@ async def delete_segment(
         if os.path.exists(fpath):
             os.remove(fpath)
 
+    removed_segments = await count_published_mappings(db, segment_id=segment_id)
     await db.delete(seg)
+    await adjust_manifest_stats(db, None, segments=-removed_segments)
     db.add(AuditLog(admin_id=admin.id, action="delete", entity_type="audio_segment", entity_id=segment_id))
+    background_tasks.add_task(invalidate_page_cache)
     return {"message": "Segment o'chirildi"}
 
 
@@ -223,6 +234,7 @@ async def delete_segment(
 @router.post("/mappings", response_model=SegmentMappingOut, status_code=201)
 async def create_mapping(
     data: SegmentMappingCreate,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -239,12 +251,14 @@ async def create_mapping(
     db.add(mapping)
     await db.flush()
     db.add(AuditLog(admin_id=admin.id, action="create", entity_type="mapping", entity_id=mapping.id))
+    background_tasks.add_task(invalidate_page_cache)
     return mapping
 
 
 @router.delete("/mappings/{mapping_id}")
 async def delete_mapping(
     mapping_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -253,28 +267,124 @@ async def delete_mapping(
     if not mapping:
         raise HTTPException(status_code=404, detail="Mapping topilmadi")
     await db.delete(mapping)
+    if mapping.is_published:
+        await adjust_manifest_stats(db, None, segments=-1)
     db.add(AuditLog(admin_id=admin.id, action="delete", entity_type="mapping", entity_id=mapping_id))
+    background_tasks.add_task(invalidate_page_cache)
     return {"message": "Mapping o'chirildi"}
 
 
+@router.post("/pages/{page_id}/align")
+async def align_page_audio(
+    page_id: int,
+    dry_run: bool = Query(False),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Auto-align a page's units to the segments of its audio and save draft mappings.
+
+    Previous auto-generated drafts of the page are replaced; units that
+    already have a published or hand-made mapping are left alone. Drafts carry a
+    ``confidence`` score for review. ``dry_run`` only returns the plan.
+    """
+    import asyncio
+    from app.services.alignment import load_page_alignment_input, plan_page_alignment
+
+    alignment_input = await db.run_sync(load_page_alignment_input, page_id)
+    if alignment_input is None:
+        raise HTTPException(status_code=404, detail="Sahifa topilmadi")
+    if not alignment_input["segments"]:
+        raise HTTPException(status_code=400, detail="Sahifaga tegishli segmentlangan audio yo'q")
+
+    # The DP is CPU-bound: keep it off the event loop
+    loop = asyncio.get_event_loop()
+    try:
+        plan = await loop.run_in_executor(None, plan_page_alignment, alignment_input)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Tekislash uchun juda katta: {e}")
+
+    unit_ids = select(TextUnit.id).where(TextUnit.page_id == page_id)
+    # Published and hand-made (no confidence) mappings are kept as they are
+    kept = (await db.execute(
+        select(UnitSegmentMapping.text_unit_id, UnitSegmentMapping.is_published).where(
+            UnitSegmentMapping.text_unit_id.in_(unit_ids),
+            (UnitSegmentMapping.is_published == True) | UnitSegmentMapping.confidence.is_(None),
+        )
+    )).all()
+    published = {unit_id for unit_id, is_published in kept if is_published}
+    manual = {unit_id for unit_id, is_published in kept if not is_published} - published
+    drafts = [
+        m for m in plan["mappings"]
+        if m["text_unit_id"] not in published and m["text_unit_id"] not in manual
+    ]
+
+    if not dry_run:
+        await db.execute(
+            sa_delete(UnitSegmentMapping).where(
+                UnitSegmentMapping.text_unit_id.in_(unit_ids),
+                UnitSegmentMapping.is_published == False,
+                UnitSegmentMapping.confidence.isnot(None),
+            )
+        )
+        if drafts:
+            await db.execute(sa_insert(UnitSegmentMapping), drafts)
+        db.add(AuditLog(
+            admin_id=admin.id,
+            action="align_audio",
+            entity_type="page",
+            entity_id=page_id,
+            details={
+                "draft_count": len(drafts),
+                "skipped_published": len(published),
+                "skipped_manual": len(manual),
+            },
+        ))
+
+    confidences = [m["confidence"] for m in drafts]
+    return {
+        "page_id": page_id,
+        "dry_run": dry_run,
+        "page_range": plan["page_range"],
+        "unit_count": plan["unit_count"],
+        "segment_count": plan["segment_count"],
+        "draft_count": len(drafts),
+        "skipped_published": len(published),
+        "skipped_manual": len(manual),
+        "mean_confidence": round(sum(confidences) / len(confidences), 3) if confidences else None,
+        "mappings": drafts,
+    }
+
+
 # ═══════════════════════════════════════════════════════════
 # SYNC Processing — Celery'siz to'g'ridan-to'g'ri ishlash
 # ═══════════════════════════════════════════════════════════
 
+def _check_silence_threshold(value: str) -> None:
+    from app.services.silence import parse_threshold_db
+    try:
+        parse_threshold_db(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Noto'g'ri silence_threshold: {value}")
+
+
 @router.post("/files/{audio_file_id}/sync-process")
 async def sync_process_audio(
     audio_file_id: int,
+    background_tasks: BackgroundTasks,
+    silence_threshold: str = Query("-30dB"),
+    min_silence_duration: float = Query(0.3, gt=0, le=10),
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Sinxron audio processing: davomiylik, waveform, auto-segmentatsiya.
     Celery'ga bog'liq emas — to'g'ridan-to'g'ri FFmpeg chaqiradi.
+    Silence parametrlarini avval ``segmentation-preview`` bilan tanlash mumkin.
     """
     import asyncio
-    from app.services.audio_processor import (
-        get_audio_duration_ms, generate_waveform_peaks, auto_segment,
-    )
+    from app.services.audio_processor import analyze_audio, auto_segment, envelope_path, waveform_path
+
+    _check_silence_threshold(silence_threshold)
 
     audio_file = await db.get(AudioFile, audio_file_id)
     if not audio_file:
@@ -291,18 +401,29 @@ async def sync_process_audio(
         # Run FFmpeg in thread pool to avoid blocking
         loop = asyncio.get_event_loop()
 
-        # 1. Duration
-        duration = await loop.run_in_executor(None, get_audio_duration_ms, source_path)
+        # 1. Duration, waveform peaks and silences from a single decode
+        peaks_rel_path = waveform_path(audio_file.id)
+        analysis = await loop.run_in_executor(
+            None, functools.partial(
+                analyze_audio, source_path,
+                peaks_path=os.path.join(settings.MEDIA_DIR, peaks_rel_path),
+                envelope_path=os.path.join(settings.MEDIA_DIR, envelope_path(audio_file.id)),
+                silence_threshold=silence_threshold,
+                min_silence_duration=min_silence_duration,
+            )
+        )
+        if analysis is None:
+            raise RuntimeError("FFmpeg audio tahlili muvaffaqiyatsiz")
+        duration = analysis.duration_ms
+        peaks = analysis.peaks
         audio_file.duration_ms = duration
-
-        # 2. Waveform peaks
-        peaks = await loop.run_in_executor(None, generate_waveform_peaks, source_path)
         audio_file.waveform_peaks = peaks
 
-        # 3. Auto-segment
-        segments_data = await loop.run_in_executor(
-            None, auto_segment, source_path, duration
-        )
+        # 2. Auto-segment
+        segment_started = time.perf_counter()
+        segments_data = auto_segment(duration, analysis.silences)
+        timings = dict(analysis.timings_ms)
+        timings["segment"] = int((time.perf_counter() - segment_started) * 1000)
 
         # Delete old segments
         await db.execute(
@@ -327,10 +448,17 @@ async def sync_process_audio(
             "segment_count": len(segments_data),
             "duration_ms": duration,
             "peaks_count": len(peaks),
+            "waveform_path": peaks_rel_path if peaks else None,
+            "silence_threshold": silence_threshold,
+            "min_silence_duration": min_silence_duration,
+            "timings_ms": timings,
         }
+        await db.flush()
+        await refresh_manifest_stats(db, audio_file.book_id)
         await db.commit()
 
         logger.info(f"Sync process complete: {len(segments_data)} segments, {duration}ms")
+        background_tasks.add_task(invalidate_page_cache)
 
         return {
             "message": f"Audio qayta ishlandi: {len(segments_data)} ta segment topildi",
@@ -350,6 +478,7 @@ async def sync_process_audio(
 @router.post("/files/{audio_file_id}/sync-cut")
 async def sync_cut_segments(
     audio_file_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -358,13 +487,16 @@ async def sync_cut_segments(
     Celery'ga bog'liq emas — to'g'ridan-to'g'ri FFmpeg chaqiradi.
     """
     import asyncio
-    from app.services.audio_processor import cut_segment_file
+    from app.services.audio_processor import (
+        assign_segment_byte_ranges, cut_segment_files, segment_source_path,
+    )
+    from app.services.mp3_frames import build_frame_index
 
     audio_file = await db.get(AudioFile, audio_file_id)
     if not audio_file:
         raise HTTPException(status_code=404, detail="Audio fayl topilmadi")
 
-    source_path = os.path.join(settings.MEDIA_DIR, audio_file.file_path)
+    source_path = os.path.join(settings.MEDIA_DIR, segment_source_path(audio_file))
     if not os.path.exists(source_path):
         raise HTTPException(status_code=404, detail="Audio fayl topilmadi diskda")
 
@@ -385,27 +517,39 @@ async def sync_cut_segments(
     segments_dir = os.path.join(settings.MEDIA_DIR, "segments")
     os.makedirs(segments_dir, exist_ok=True)
 
-    loop = asyncio.get_event_loop()
     cut_count = 0
     errors = []
+    to_cut = []
 
     for seg in segments:
         if seg.start_ms >= seg.end_ms:
             errors.append(f"Segment #{seg.segment_index}: noto'g'ri chegaralar ({seg.start_ms}-{seg.end_ms})")
             continue
-
         filename = f"seg_{audio_file_id}_{seg.segment_index:04d}_v{seg.version}.mp3"
-        output_path = os.path.join(segments_dir, filename)
+        to_cut.append((seg, filename))
 
-        success = await loop.run_in_executor(
-            None, cut_segment_file, source_path, output_path, seg.start_ms, seg.end_ms
+    loop = asyncio.get_event_loop()
+    frame_index = None
+    if settings.AUDIO_VIRTUAL_SEGMENTS:
+        frame_index = await loop.run_in_executor(None, build_frame_index, source_path)
+
+    if frame_index is not None:
+        # Virtual segments: byte ranges into the source, nothing is written
+        assign_segment_byte_ranges(frame_index, [seg for seg, _ in to_cut])
+        cut_count = len(to_cut)
+    else:
+        # Batched ffmpeg runs in a worker thread, so the event loop stays free
+        results = await loop.run_in_executor(
+            None, cut_segment_files, source_path,
+            [(seg.start_ms, seg.end_ms, os.path.join(segments_dir, filename)) for seg, filename in to_cut],
         )
-
-        if success:
-            seg.file_path = f"segments/{filename}"
-            cut_count += 1
-        else:
-            errors.append(f"Segment #{seg.segment_index}: kesish amalga oshmadi")
+        for (seg, filename), success in zip(to_cut, results):
+            if success:
+                seg.file_path = f"segments/{filename}"
+                seg.byte_start = seg.byte_end = None
+                cut_count += 1
+            else:
+                errors.append(f"Segment #{seg.segment_index}: kesish amalga oshmadi")
 
     audio_file.status = AudioStatus.READY
     await db.commit()
@@ -415,9 +559,11 @@ async def sync_cut_segments(
         action="sync_cut_segments",
         entity_type="audio_file",
         entity_id=audio_file_id,
-        details={"cut_count": cut_count, "errors": errors},
+        details={"cut_count": cut_count, "errors": errors, "virtual": frame_index is not None},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     msg = f"{cut_count} ta segment kesildi"
     if errors:
         msg += f" ({len(errors)} ta xatolik)"
@@ -447,9 +593,99 @@ async def get_audio_play_url(
     }
 
 
+@router.get("/files/{audio_file_id}/waveform")
+async def get_audio_waveform(
+    audio_file_id: int,
+    buckets: int = Query(8000, ge=1),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """One zoom level of the stored peak pyramid (closest to ``buckets``).
+
+    ``min``/``max`` are raw int16 sample peaks; the whole pyramid is also
+    available as a binary file at ``url``.
+    """
+    from app.services.audio_processor import waveform_path
+    from app.services.waveform import decode_peak_pyramid
+
+    audio_file = await db.get(AudioFile, audio_file_id)
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio fayl topilmadi")
+
+    rel_path = waveform_path(audio_file_id)
+    fpath = os.path.join(settings.MEDIA_DIR, rel_path)
+    if not os.path.exists(fpath):
+        raise HTTPException(status_code=404, detail="Waveform hali yaratilmagan")
+
+    with open(fpath, "rb") as f:
+        pyramid = decode_peak_pyramid(f.read(), buckets)
+    (count, (mins, maxs)), = pyramid.levels.items()
+    return {
+        "url": f"{settings.MEDIA_BASE_URL}/{rel_path}",
+        "sample_rate": pyramid.sample_rate,
+        "duration_ms": pyramid.duration_ms,
+        "buckets": count,
+        "min": mins.tolist(),
+        "max": maxs.tolist(),
+    }
+
+
+@router.get("/files/{audio_file_id}/segmentation-preview")
+async def preview_segmentation(
+    audio_file_id: int,
+    silence_threshold: str = Query("-30dB"),
+    min_silence_duration: float = Query(0.3, gt=0, le=10),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Segment boundaries for the given silence parameters, without saving anything.
+
+    Runs on the cached energy envelope (see app/services/silence.py); files
+    processed before the envelope existed are decoded once to build it.
+    """
+    import asyncio
+    from app.services.audio_processor import (
+        analyze_audio, auto_segment, envelope_path, segment_source_path,
+    )
+    from app.services.silence import detect_silences, load_envelope
+
+    _check_silence_threshold(silence_threshold)
+    audio_file = await db.get(AudioFile, audio_file_id)
+    if not audio_file:
+        raise HTTPException(status_code=404, detail="Audio fayl topilmadi")
+
+    env_path = os.path.join(settings.MEDIA_DIR, envelope_path(audio_file_id))
+    loop = asyncio.get_event_loop()
+    envelope = await loop.run_in_executor(None, load_envelope, env_path)
+    if envelope is None:
+        source_path = os.path.join(settings.MEDIA_DIR, segment_source_path(audio_file))
+        if not os.path.exists(source_path):
+            raise HTTPException(status_code=404, detail="Audio fayl topilmadi diskda")
+        analysis = await loop.run_in_executor(
+            None, functools.partial(analyze_audio, source_path, envelope_path=env_path)
+        )
+        envelope = await loop.run_in_executor(None, load_envelope, env_path) if analysis else None
+        if envelope is None:
+            raise HTTPException(status_code=500, detail="Audio tahlili muvaffaqiyatsiz")
+
+    started = time.perf_counter()
+    duration = audio_file.duration_ms or envelope.duration_ms
+    silences = detect_silences(envelope, silence_threshold, min_silence_duration)
+    segments = auto_segment(duration, silences)
+    return {
+        "silence_threshold": silence_threshold,
+        "min_silence_duration": min_silence_duration,
+        "duration_ms": duration,
+        "segment_count": len(segments),
+        "segments": segments,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
 @router.delete("/files/{audio_file_id}")
 async def delete_audio_file(
     audio_file_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -463,6 +699,13 @@ async def delete_audio_file(
     if os.path.exists(fpath):
         os.remove(fpath)
 
+    # Delete waveform pyramid and energy envelope
+    from app.services.audio_processor import envelope_path, waveform_path
+    for rel_path in (waveform_path(audio_file_id), envelope_path(audio_file_id)):
+        wpath = os.path.join(settings.MEDIA_DIR, rel_path)
+        if os.path.exists(wpath):
+            os.remove(wpath)
+
     # Delete segment files
     result = await db.execute(
         select(AudioSegment).where(AudioSegment.audio_file_id == audio_file_id)
@@ -474,12 +717,15 @@ async def delete_audio_file(
                 os.remove(sfpath)
 
     await db.delete(audio_file)  # cascade deletes segments
+    await db.flush()
+    await refresh_manifest_stats(db, audio_file.book_id)
     db.add(AuditLog(
         admin_id=admin.id,
         action="delete",
         entity_type="audio_file",
         entity_id=audio_file_id,
     ))
+    background_tasks.add_task(invalidate_page_cache)
 
     return {"message": "Audio fayl o'chirildi"}
 
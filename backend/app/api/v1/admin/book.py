@@ -1,17 +1,20 @@
 """Admin book management endpoints."""
 
+import asyncio
+import logging
 import os
 import shutil
 from datetime import datetime
 from typing import List, Optional
+from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Body
 from sqlalchemy import select, delete, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database import get_db
-from app.api.deps import get_current_admin, get_any_book, UNIT_TYPE_MAP
+from app.database import AsyncSessionLocal, get_db
+from app.api.deps import get_current_admin, get_any_book
 from app.models.admin import AdminUser
 from app.models.book import Book, Chapter, Page, TextUnit, UnitType, PageStatus, PageVersion
 from app.models.system import AuditLog
@@ -20,9 +23,17 @@ from app.schemas import (
     PageOut, TextUnitCreate, TextUnitUpdate, TextUnitOut,
 )
 from app.config import get_settings
+from app.services.manifest_stats import (
+    adjust_manifest_stats, count_published_mappings, refresh_manifest_stats,
+)
+from app.services.page_cache import invalidate_page_cache, warm_page_cache
+from app.services.page_payload import load_audio_urls
+from app.services.page_versions import compact_page_versions, record_page_version, rollback_page_units
+from app.services.unit_editor import apply_unit_edits
 
 router = APIRouter(prefix="/book", tags=["Admin Book"])
 settings = get_settings()
+logger = logging.getLogger("muallimi")
 
 
 @router.get("", response_model=BookOut)
@@ -41,6 +52,7 @@ async def admin_get_book(
 
 @router.put("/publish")
 async def publish_book(
+    background_tasks: BackgroundTasks,
     book: Book = Depends(get_any_book),
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
@@ -69,6 +81,11 @@ async def publish_book(
     )
     db.add(log)
     await db.flush()
+    await refresh_manifest_stats(db, book.id)
+
+    # Offline bundle for the new version (built after commit)
+    from app.services.bundle import schedule_bundle_build
+    background_tasks.add_task(schedule_bundle_build)
 
     return {"version": book.manifest_version, "message": "Kitob nashr qilindi"}
 
@@ -78,6 +95,7 @@ async def publish_book(
 @router.post("/chapters", response_model=ChapterOut, status_code=201)
 async def create_chapter(
     data: ChapterCreate,
+    background_tasks: BackgroundTasks,
     book: Book = Depends(get_any_book),
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
@@ -88,12 +106,14 @@ async def create_chapter(
     await db.flush()
 
     db.add(AuditLog(admin_id=admin.id, action="create", entity_type="chapter", entity_id=chapter.id))
+    background_tasks.add_task(invalidate_page_cache)
     return chapter
 
 
 @router.delete("/chapters/{chapter_id}")
 async def delete_chapter(
     chapter_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -103,6 +123,7 @@ async def delete_chapter(
         raise HTTPException(status_code=404, detail="Bob topilmadi")
     await db.delete(chapter)
     db.add(AuditLog(admin_id=admin.id, action="delete", entity_type="chapter", entity_id=chapter_id))
+    background_tasks.add_task(invalidate_page_cache)
     return {"message": "Bob o'chirildi"}
 
 
@@ -161,8 +182,42 @@ async def admin_get_page_units(
 
 # === Image Upload & Analysis ===
 
+def _save_page_image(source, file_path: str):
+    """Write an uploaded image; returns its (width, height), or Nones if unreadable."""
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(source, f)
+
+    try:
+        from PIL import Image
+        with Image.open(file_path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+
+async def _queue_page_analysis(page_id: int, image_path: str, task_id: str) -> None:
+    """Queue OCR for an uploaded page; without a broker, mark the page so it can be re-queued."""
+    from app.tasks.page_tasks import analyze_page_image_task
+
+    try:
+        await asyncio.to_thread(
+            analyze_page_image_task.apply_async, (page_id, image_path), task_id=task_id,
+        )
+    except Exception as e:
+        logger.error(f"Could not queue analysis for page {page_id}: {e}")
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Page).where(Page.id == page_id).values(
+                    analysis_status=PageStatus.ERROR,
+                    analysis_error="Tahlil navbatga qo'yilmadi, /pages/analyze orqali qayta urinib ko'ring",
+                )
+            )
+            await db.commit()
+
+
 @router.post("/pages/upload-image")
 async def upload_page_image(
+    background_tasks: BackgroundTasks,
     page_number: int = Form(...),
     file: UploadFile = File(...),
     book: Book = Depends(get_any_book),
@@ -190,17 +245,8 @@ async def upload_page_image(
     file_path = os.path.join(upload_dir, filename)
     relative_path = f"pages/source/{filename}"
 
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-
-    # Get image dimensions
-    try:
-        from PIL import Image
-        img = Image.open(file_path)
-        img_width, img_height = img.size
-        img.close()
-    except Exception:
-        img_width, img_height = None, None
+    # Saving and probing the image is blocking I/O: keep it off the event loop
+    img_width, img_height = await asyncio.to_thread(_save_page_image, file.file, file_path)
 
     # Create or update page
     result = await db.execute(
@@ -232,49 +278,11 @@ async def upload_page_image(
 
     await db.flush()
 
-    # Start background analysis
-    try:
-        from app.tasks.page_tasks import analyze_page_image_task
-        task = analyze_page_image_task.delay(page.id, relative_path)
-        task_id = task.id
-    except Exception as e:
-        # If Celery is not available, run analysis inline
-        task_id = None
-        try:
-            from app.services.image_analyzer import analyze_image
-            units = analyze_image(file_path)
-
-            # Delete existing non-manual units
-            await db.execute(
-                delete(TextUnit).where(
-                    TextUnit.page_id == page.id,
-                    TextUnit.is_manual == False
-                )
-            )
-
-            for unit_data in units:
-                unit_type_map = UNIT_TYPE_MAP
-                unit = TextUnit(
-                    page_id=page.id,
-                    unit_type=unit_type_map.get(unit_data.unit_type, UnitType.WORD),
-                    text_content=unit_data.text,
-                    bbox_x=unit_data.bbox_x,
-                    bbox_y=unit_data.bbox_y,
-                    bbox_w=unit_data.bbox_w,
-                    bbox_h=unit_data.bbox_h,
-                    sort_order=unit_data.sort_order,
-                    confidence=unit_data.confidence,
-                    is_manual=False,
-                    metadata_=unit_data.metadata or {},
-                )
-                db.add(unit)
+    # OCR runs in the worker; the job is queued after the commit (see
+    # _queue_page_analysis) and can be polled at /admin/tasks/{task_id}
+    task_id = str(uuid4())
 
-            page.analysis_status = PageStatus.DRAFT
-            page.has_text_data = len(units) > 0
-            await db.flush()
-        except Exception as analysis_error:
-            page.analysis_status = PageStatus.ERROR
-            page.analysis_error = str(analysis_error)
+    await refresh_manifest_stats(db, book.id)
 
     db.add(AuditLog(
         admin_id=admin.id,
@@ -284,6 +292,12 @@ async def upload_page_image(
         details={"filename": file.filename, "page_number": page_number, "task_id": task_id},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+    # Queued after the commit so the worker sees the new page and source image
+    from app.tasks.page_tasks import enqueue_image_variants
+    background_tasks.add_task(_queue_page_analysis, page.id, relative_path, task_id)
+    background_tasks.add_task(enqueue_image_variants, page.id)
+
     return {
         "message": "Rasm yuklandi va tahlil boshlandi",
         "page_id": page.id,
@@ -293,6 +307,82 @@ async def upload_page_image(
     }
 
 
+@router.post("/pages/analyze")
+async def analyze_pages(
+    page_start: int = Body(..., embed=True, ge=1),
+    page_end: int = Body(..., embed=True, ge=1),
+    include_published: bool = Body(False, embed=True),
+    book: Book = Depends(get_any_book),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue OCR for every page with an image in ``page_start..page_end``.
+
+    One worker job analyzes the pages in parallel and commits each page as
+    it finishes; poll ``/admin/tasks/{task_id}`` for progress. Published
+    pages are skipped unless ``include_published``.
+    """
+    if page_end < page_start:
+        raise HTTPException(status_code=400, detail="page_end page_start dan kichik bo'lmasligi kerak")
+
+    from app.tasks.page_tasks import analyze_pages_task
+
+    try:
+        task = await asyncio.to_thread(
+            analyze_pages_task.delay, book.id, page_start, page_end, include_published,
+        )
+    except Exception:
+        raise HTTPException(status_code=503, detail="Fon vazifalar xizmati mavjud emas")
+
+    db.add(AuditLog(
+        admin_id=admin.id,
+        action="analyze_pages",
+        entity_type="book",
+        entity_id=book.id,
+        details={"page_start": page_start, "page_end": page_end, "task_id": task.id},
+    ))
+
+    return {"message": "Sahifalar tahlili boshlandi", "task_id": task.id}
+
+
+@router.post("/pages/image-variants")
+async def regenerate_image_variants(
+    book: Book = Depends(get_any_book),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue responsive image derivatives for every page that has an image.
+
+    Unchanged sources keep their files (names are content-hashed), so this
+    is cheap to repeat; use it to backfill pages imported before variants existed.
+    """
+    from app.tasks.page_tasks import generate_image_variants_task
+
+    result = await db.execute(
+        select(Page.id).where(
+            Page.book_id == book.id,
+            (Page.image_path != None) | (Page.source_image_path != None),
+        ).order_by(Page.page_number)
+    )
+    page_ids = result.scalars().all()
+
+    try:
+        for page_id in page_ids:
+            generate_image_variants_task.delay(page_id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Fon vazifalar xizmati mavjud emas")
+
+    db.add(AuditLog(
+        admin_id=admin.id,
+        action="image_variants",
+        entity_type="book",
+        entity_id=book.id,
+        details={"pages": len(page_ids)},
+    ))
+
+    return {"message": "Rasm variantlari navbatga qo'yildi", "pages": len(page_ids)}
+
+
 @router.get("/pages/{page_id}/draft")
 async def get_page_draft(
     page_id: int,
@@ -341,6 +431,7 @@ async def get_page_draft(
 @router.put("/pages/{page_id}/units/bulk")
 async def bulk_update_units(
     page_id: int,
+    background_tasks: BackgroundTasks,
     units: List[dict] = Body(...),
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
@@ -351,69 +442,29 @@ async def bulk_update_units(
     - "update": update existing unit (requires "id")
     - "create": create new unit
     - "delete": delete unit (requires "id")
+
+    Applied set-based (see app/services/unit_editor.py); the response lists
+    the IDs of created units in request order.
     """
     result = await db.execute(select(Page).where(Page.id == page_id))
     page = result.scalar_one_or_none()
     if not page:
         raise HTTPException(status_code=404, detail="Sahifa topilmadi")
 
-    created = 0
-    updated = 0
-    deleted = 0
-
-    for u in units:
-        action = u.get("action", "update")
-
-        if action == "delete":
-            unit_id = u.get("id")
-            if unit_id:
-                await db.execute(delete(TextUnit).where(TextUnit.id == unit_id, TextUnit.page_id == page_id))
-                deleted += 1
-
-        elif action == "create":
-            unit_type_map = UNIT_TYPE_MAP
-            new_unit = TextUnit(
-                page_id=page_id,
-                unit_type=unit_type_map.get(u.get("unit_type", "word"), UnitType.WORD),
-                text_content=u.get("text_content", ""),
-                bbox_x=u.get("bbox_x", 0),
-                bbox_y=u.get("bbox_y", 0),
-                bbox_w=u.get("bbox_w", 0),
-                bbox_h=u.get("bbox_h", 0),
-                sort_order=u.get("sort_order", 0),
-                is_manual=True,
-                metadata_=u.get("metadata", {}),
-            )
-            db.add(new_unit)
-            created += 1
-
-        elif action == "update":
-            unit_id = u.get("id")
-            if not unit_id:
-                continue
-            result = await db.execute(
-                select(TextUnit).where(TextUnit.id == unit_id, TextUnit.page_id == page_id)
-            )
-            unit = result.scalar_one_or_none()
-            if not unit:
-                continue
-
-            for field in ["text_content", "bbox_x", "bbox_y", "bbox_w", "bbox_h", "sort_order"]:
-                if field in u:
-                    setattr(unit, field, u[field])
-            if "unit_type" in u:
-                try:
-                    unit.unit_type = UnitType(u["unit_type"])
-                except ValueError:
-                    pass
-            if "metadata" in u:
-                unit.metadata_ = u["metadata"]
-            unit.is_manual = True
-            updated += 1
+    delete_ids = [u["id"] for u in units if u.get("action") == "delete" and u.get("id")]
+    removed_segments = await count_published_mappings(db, delete_ids, page_id=page_id)
+
+    # Set-based: a fixed number of statements whatever the batch size
+    edits = await db.run_sync(apply_unit_edits, page_id, units)
+    created, updated, deleted = edits["created"], edits["updated"], edits["deleted"]
+    removed_units = edits["removed_units"]
 
     page.is_annotated = True
     page.has_text_data = True
     await db.flush()
+    await adjust_manifest_stats(
+        db, page.book_id, units=created - removed_units, segments=-removed_segments
+    )
 
     db.add(AuditLog(
         admin_id=admin.id,
@@ -423,22 +474,26 @@ async def bulk_update_units(
         details={"created": created, "updated": updated, "deleted": deleted},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {
         "message": f"Yangilandi: {created} yaratildi, {updated} o'zgartirildi, {deleted} o'chirildi",
         "created": created,
         "updated": updated,
         "deleted": deleted,
+        "created_ids": edits["created_ids"],
     }
 
 
 @router.post("/pages/{page_id}/publish")
 async def publish_page(
     page_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     """Run QA checks and publish a page if it passes."""
-    from app.services.qa_checker import run_qa_checks
+    from app.services.qa_checker import qa_input, run_qa_checks
 
     result = await db.execute(
         select(Page).options(selectinload(Page.text_units)).where(Page.id == page_id)
@@ -447,21 +502,8 @@ async def publish_page(
     if not page:
         raise HTTPException(status_code=404, detail="Sahifa topilmadi")
 
-    # Build unit dicts for QA
-    units_data = [
-        {
-            "text_content": u.text_content,
-            "bbox_x": u.bbox_x,
-            "bbox_y": u.bbox_y,
-            "bbox_w": u.bbox_w,
-            "bbox_h": u.bbox_h,
-            "sort_order": u.sort_order,
-            "audio_segment_url": None,  # TODO: add audio mapping check
-        }
-        for u in page.text_units
-    ]
-
-    qa_result = run_qa_checks(units_data)
+    audio_urls = await db.run_sync(load_audio_urls, [page_id])
+    qa_result = run_qa_checks(qa_input(page.text_units, audio_urls))
     page.qa_report = qa_result.to_dict()
 
     if not qa_result.passed:
@@ -474,40 +516,9 @@ async def publish_page(
             }
         )
 
-    # QA passed — create version snapshot BEFORE publishing
-    from app.models.book import PageVersion
-
-    # Get next version number
-    ver_result = await db.execute(
-        select(func.coalesce(func.max(PageVersion.version), 0))
-        .where(PageVersion.page_id == page_id)
-    )
-    next_version = ver_result.scalar() + 1
-
-    # Serialize text units to snapshot
-    snapshot = [
-        {
-            "unit_type": u.unit_type.value if hasattr(u.unit_type, 'value') else str(u.unit_type),
-            "text_content": u.text_content,
-            "bbox_x": u.bbox_x,
-            "bbox_y": u.bbox_y,
-            "bbox_w": u.bbox_w,
-            "bbox_h": u.bbox_h,
-            "sort_order": u.sort_order,
-            "is_manual": u.is_manual,
-            "confidence": u.confidence,
-            "metadata": u.metadata_,
-        }
-        for u in page.text_units
-    ]
-
-    db.add(PageVersion(
-        page_id=page_id,
-        version=next_version,
-        snapshot=snapshot,
-        qa_report=qa_result.to_dict(),
-        published_by=admin.id,
-    ))
+    # QA passed — record the version (full snapshot or delta) BEFORE publishing
+    next_version = await db.run_sync(record_page_version, page_id, qa_result.to_dict(), admin.id)
+    await db.run_sync(compact_page_versions, page_id)
 
     # Publish
     page.analysis_status = PageStatus.PUBLISHED
@@ -524,6 +535,8 @@ async def publish_page(
         details={"qa_score": qa_result.score, "version": next_version},
     ))
 
+    background_tasks.add_task(warm_page_cache, page.page_number)
+
     return {
         "message": f"Sahifa nashr qilindi (v{next_version})",
         "page_id": page_id,
@@ -532,6 +545,83 @@ async def publish_page(
     }
 
 
+@router.post("/pages/publish-batch")
+async def publish_pages_batch(
+    page_ids: Optional[List[int]] = Body(None, embed=True),
+    all_drafts: bool = Body(False, embed=True),
+    book: Book = Depends(get_any_book),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue QA and publishing of ``page_ids`` (or every draft page with ``all_drafts``).
+
+    One worker job checks the pages in parallel, publishes those that pass
+    and bumps the manifest version once; the consolidated report is the
+    result of ``/admin/tasks/{task_id}``.
+    """
+    if not page_ids and not all_drafts:
+        raise HTTPException(status_code=400, detail="page_ids yoki all_drafts ko'rsatilishi kerak")
+
+    from app.tasks.page_tasks import batch_publish_task
+
+    try:
+        task = await asyncio.to_thread(
+            batch_publish_task.delay, book.id, None if all_drafts else page_ids, admin.id,
+        )
+    except Exception:
+        raise HTTPException(status_code=503, detail="Fon vazifalar xizmati mavjud emas")
+
+    db.add(AuditLog(
+        admin_id=admin.id,
+        action="publish_pages_batch",
+        entity_type="book",
+        entity_id=book.id,
+        details={
+            "page_ids": None if all_drafts else page_ids,
+            "all_drafts": all_drafts,
+            "task_id": task.id,
+        },
+    ))
+
+    return {"message": "Sahifalarni nashr qilish boshlandi", "task_id": task.id}
+
+
+@router.get("/qa-report")
+async def get_qa_report(
+    book: Book = Depends(get_any_book),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Book-wide QA report from the per-page cache.
+
+    Pages edited since their last check are listed in ``stale_page_ids``;
+    ``POST /qa-report`` rechecks them.
+    """
+    from app.services.qa_report import build_qa_report
+
+    return await db.run_sync(build_qa_report, book.id, False)
+
+
+@router.post("/qa-report")
+async def refresh_qa_report(
+    book: Book = Depends(get_any_book),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue QA of every page whose units or audio mappings changed since its last check.
+
+    The refreshed report is the result of ``/admin/tasks/{task_id}``.
+    """
+    from app.tasks.page_tasks import book_qa_report_task
+
+    try:
+        task = await asyncio.to_thread(book_qa_report_task.delay, book.id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Fon vazifalar xizmati mavjud emas")
+
+    return {"message": "QA hisoboti yangilanmoqda", "task_id": task.id}
+
+
 @router.get("/pages/{page_id}/versions")
 async def list_page_versions(
     page_id: int,
@@ -550,7 +640,8 @@ async def list_page_versions(
         {
             "id": v.id,
             "version": v.version,
-            "unit_count": len(v.snapshot) if v.snapshot else 0,
+            "kind": v.kind,
+            "unit_count": v.unit_count if v.unit_count is not None else len(v.snapshot or []),
             "qa_score": v.qa_report.get("score") if v.qa_report else None,
             "created_at": v.created_at.isoformat() if v.created_at else None,
         }
@@ -562,10 +653,15 @@ async def list_page_versions(
 async def rollback_page(
     page_id: int,
     version_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    """Rollback a page to a previous version's text units."""
+    """Rollback a page to a previous version's text units.
+
+    Applied in place (see app/services/page_versions.py): units keep their
+    IDs, so sections and audio mappings of surviving units stay attached.
+    """
     # Load version
     ver_result = await db.execute(
         select(PageVersion).where(
@@ -577,69 +673,71 @@ async def rollback_page(
     if not version:
         raise HTTPException(status_code=404, detail="Versiya topilmadi")
 
-    # Load page
-    page_result = await db.execute(
-        select(Page).options(selectinload(Page.text_units)).where(Page.id == page_id)
-    )
-    page = page_result.scalar_one_or_none()
+    page = await db.get(Page, page_id)
     if not page:
         raise HTTPException(status_code=404, detail="Sahifa topilmadi")
 
-    # Delete current text units
-    await db.execute(
-        delete(TextUnit).where(TextUnit.page_id == page_id)
-    )
-
-    # Restore from snapshot
-    for u_data in version.snapshot:
-        unit_type_val = u_data.get("unit_type", "letter")
-        try:
-            unit_type = UnitType(unit_type_val)
-        except ValueError:
-            unit_type = UnitType.LETTER
-
-        db.add(TextUnit(
-            page_id=page_id,
-            unit_type=unit_type,
-            text_content=u_data.get("text_content", ""),
-            bbox_x=u_data.get("bbox_x", 0),
-            bbox_y=u_data.get("bbox_y", 0),
-            bbox_w=u_data.get("bbox_w", 0),
-            bbox_h=u_data.get("bbox_h", 0),
-            sort_order=u_data.get("sort_order", 0),
-            is_manual=u_data.get("is_manual", False),
-            confidence=u_data.get("confidence"),
-            metadata_=u_data.get("metadata"),
-        ))
+    restored = await db.run_sync(rollback_page_units, page_id, version.version)
+    if restored is None:
+        raise HTTPException(status_code=409, detail="Versiya tarixi to'liq emas")
 
     # Set page to DRAFT for re-review
     page.analysis_status = PageStatus.DRAFT
     page.qa_report = version.qa_report
 
     await db.flush()
+    await refresh_manifest_stats(db, page.book_id)
 
     db.add(AuditLog(
         admin_id=admin.id,
         action="rollback_page",
         entity_type="page",
         entity_id=page_id,
-        details={"restored_version": version.version},
+        details={"restored_version": version.version, **restored},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {
         "message": f"Sahifa v{version.version} ga qaytarildi",
         "page_id": page_id,
         "restored_version": version.version,
-        "unit_count": len(version.snapshot),
+        **restored,
     }
 
 
+@router.post("/versions/compact")
+async def compact_versions(
+    keep: Optional[int] = Body(None, embed=True, ge=1),
+    admin: AdminUser = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue compaction of every page's version history to the newest ``keep``
+    versions (default ``PAGE_VERSIONS_KEEP``)."""
+    from app.tasks.page_tasks import compact_page_versions_task
+
+    try:
+        task = await asyncio.to_thread(compact_page_versions_task.delay, keep)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Fon vazifalar xizmati mavjud emas")
+
+    db.add(AuditLog(
+        admin_id=admin.id,
+        action="compact_versions",
+        entity_type="page_version",
+        details={"keep": keep, "task_id": task.id},
+    ))
+
+    return {"message": "Versiyalar tarixini ixchamlash boshlandi", "task_id": task.id}
+
+
 # === Single Unit CRUD (kept for backward compat) ===
 
 @router.post("/pages/{page_id}/units", response_model=TextUnitOut, status_code=201)
 async def create_text_unit(
     page_id: int,
     data: TextUnitCreate,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -665,8 +763,10 @@ async def create_text_unit(
     page.is_annotated = True
     page.has_text_data = True
     await db.flush()
+    await adjust_manifest_stats(db, page.book_id, units=1)
 
     db.add(AuditLog(admin_id=admin.id, action="create", entity_type="text_unit", entity_id=unit.id))
+    background_tasks.add_task(invalidate_page_cache)
     return unit
 
 
@@ -674,6 +774,7 @@ async def create_text_unit(
 async def update_text_unit(
     unit_id: int,
     data: TextUnitUpdate,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -689,12 +790,14 @@ async def update_text_unit(
 
     await db.flush()
     db.add(AuditLog(admin_id=admin.id, action="update", entity_type="text_unit", entity_id=unit_id))
+    background_tasks.add_task(invalidate_page_cache)
     return unit
 
 
 @router.delete("/units/{unit_id}")
 async def delete_text_unit(
     unit_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -702,8 +805,12 @@ async def delete_text_unit(
     unit = result.scalar_one_or_none()
     if not unit:
         raise HTTPException(status_code=404, detail="Birlik topilmadi")
+    page = await db.get(Page, unit.page_id)
+    removed_segments = await count_published_mappings(db, [unit_id])
     await db.delete(unit)
+    await adjust_manifest_stats(db, page.book_id, units=-1, segments=-removed_segments)
     db.add(AuditLog(admin_id=admin.id, action="delete", entity_type="text_unit", entity_id=unit_id))
+    background_tasks.add_task(invalidate_page_cache)
     return {"message": "Birlik o'chirildi"}
 
 
@@ -749,6 +856,7 @@ async def import_pdf(
 @router.post("/units/{unit_id}/split")
 async def split_unit(
     unit_id: int,
+    background_tasks: BackgroundTasks,
     separator: Optional[str] = Body(None, embed=True),
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
@@ -829,9 +937,14 @@ async def split_unit(
         new_units.append(new_unit)
 
     # Delete the original unit
+    removed_segments = await count_published_mappings(db, [unit_id])
     await db.execute(delete(TextUnit).where(TextUnit.id == unit_id))
 
     await db.flush()
+    page = await db.get(Page, unit.page_id)
+    await adjust_manifest_stats(
+        db, page.book_id, units=len(parts) - 1, segments=-removed_segments
+    )
 
     # Audit log
     db.add(AuditLog(
@@ -842,6 +955,8 @@ async def split_unit(
         details={"parts": len(parts), "page_id": unit.page_id},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {
         "message": f"Unit {len(parts)} qismga bo'lindi",
         "parts": [{"id": u.id, "text": u.text_content} for u in new_units],
@@ -860,6 +975,7 @@ from app.services.sectioning import auto_section_page
 @router.post("/pages/{page_id}/auto-section")
 async def auto_section(
     page_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -938,6 +1054,8 @@ async def auto_section(
         details={"sections_created": len(created_sections)},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {
         "message": f"{len(created_sections)} bo'lim yaratildi",
         "sections": [
@@ -992,6 +1110,7 @@ async def get_page_sections(
 async def update_section(
     section_id: int,
     data: SectionUpdate,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -1019,12 +1138,15 @@ async def update_section(
         entity_id=section_id,
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {"message": "Bo'lim yangilandi", "id": section.id}
 
 
 @router.delete("/sections/{section_id}")
 async def delete_section(
     section_id: int,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -1044,12 +1166,15 @@ async def delete_section(
         entity_id=section_id,
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {"message": "Bo'lim o'chirildi"}
 
 
 @router.post("/sections/merge")
 async def merge_sections(
     data: SectionMerge,
+    background_tasks: BackgroundTasks,
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -1096,6 +1221,8 @@ async def merge_sections(
         details={"merged_ids": data.section_ids},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {
         "message": f"{len(data.section_ids)} bo'lim birlashtirildi",
         "section_id": primary.id,
@@ -1105,6 +1232,7 @@ async def merge_sections(
 @router.post("/sections/{section_id}/split")
 async def split_section(
     section_id: int,
+    background_tasks: BackgroundTasks,
     split_after_unit_id: int = Body(..., embed=True),
     admin: AdminUser = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db),
@@ -1166,6 +1294,8 @@ async def split_section(
         details={"new_section_id": new_section.id},
     ))
 
+    background_tasks.add_task(invalidate_page_cache)
+
     return {
         "message": "Bo'lim ikkiga bo'lindi",
         "original_id": section.id,
@@ -0,0 +1,41 @@
+"""Admin background task status (Celery result backend)."""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api.deps import get_current_admin
+from app.models.admin import AdminUser
+
+router = APIRouter(prefix="/tasks", tags=["Admin Tasks"])
+
+
+def _task_status(task_id: str) -> dict:
+    from app.tasks.celery_app import celery_app
+
+    result = celery_app.AsyncResult(task_id)
+    status = {"task_id": task_id, "state": result.state, "progress": None, "result": None, "error": None}
+    if result.state == "PROGRESS":
+        status["progress"] = result.info
+    elif result.state == "SUCCESS":
+        status["result"] = result.result
+    elif result.state == "FAILURE":
+        status["error"] = str(result.result)
+    return status
+
+
+@router.get("/{task_id}")
+async def get_task_status(
+    task_id: str,
+    admin: AdminUser = Depends(get_current_admin),
+):
+    """State of a queued job (PENDING, STARTED, PROGRESS, SUCCESS, FAILURE, RETRY).
+
+    ``progress`` holds the ``done``/``total`` reported by long jobs (PDF
+    import, batch analysis, segment cutting). Unknown IDs also read as
+    PENDING, as Celery cannot tell them apart.
+    """
+    try:
+        return await asyncio.to_thread(_task_status, task_id)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Fon vazifalar xizmati mavjud emas")
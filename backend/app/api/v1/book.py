@@ -1,53 +1,76 @@
-"""Public book API endpoints."""
+"""Public book API endpoints.
 
-from typing import List
+Every endpoint supports conditional GET (see app/api/conditional.py).
+"""
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from typing import List, Optional
 
-from app.models.section import Section
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.book import Book, Chapter, Page, TextUnit
-from app.models.audio import AudioFile, UnitSegmentMapping, AudioSegment
+from app.models.book import Book, Chapter, Page
 from app.config import get_settings
-from app.schemas import BookOut, BookSummary, PageOut, TextUnitOut, ChapterOut
+from app.schemas import BookSummary, ChapterOut
+from app.api.conditional import (
+    compute_etag, conditional_json_response, etag_matches,
+    not_modified_response, versioned_etag,
+)
 from app.api.deps import get_published_book
+from app.cache import cache_get, cache_set, get_content_revision
+from app.services import bundle as bundles
+from app.services.page_cache import dump_payload, get_page_json
 
 router = APIRouter(prefix="/book", tags=["Book"])
 settings = get_settings()
 
 
 @router.get("", response_model=BookSummary)
-async def get_book(book: Book = Depends(get_published_book)):
+async def get_book(request: Request, book: Book = Depends(get_published_book)):
     """Get the book summary (single book app)."""
-    return book
+    summary = BookSummary.model_validate(book).model_dump(mode="json")
+    etag = compute_etag("book", *summary.values())
+    return conditional_json_response(request, dump_payload(summary), etag)
 
 
 @router.get("/chapters", response_model=List[ChapterOut])
 async def get_chapters(
+    request: Request,
     book: Book = Depends(get_published_book),
     db: AsyncSession = Depends(get_db),
 ):
     """Get table of contents (chapters)."""
+    etag = await versioned_etag("chapters", book.id, book.manifest_version)
+    if etag and etag_matches(request, etag):
+        return not_modified_response(etag)
+
     result = await db.execute(
         select(Chapter)
         .where(Chapter.book_id == book.id)
         .order_by(Chapter.sort_order)
     )
-    return result.scalars().all()
+    chapters = [
+        ChapterOut.model_validate(ch).model_dump(mode="json")
+        for ch in result.scalars().all()
+    ]
+    return conditional_json_response(request, dump_payload(chapters), etag)
 
 
 @router.get("/pages", response_model=List[dict])
 async def get_pages_list(
+    request: Request,
     book: Book = Depends(get_published_book),
     db: AsyncSession = Depends(get_db),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
 ):
     """Get paginated list of pages (summaries)."""
+    etag = await versioned_etag("pages", book.id, book.manifest_version, offset, limit)
+    if etag and etag_matches(request, etag):
+        return not_modified_response(etag)
+
     result = await db.execute(
         select(Page)
         .where(Page.book_id == book.id)
@@ -57,7 +80,7 @@ async def get_pages_list(
     )
     pages = result.scalars().all()
 
-    return [
+    summaries = [
         {
             "id": p.id,
             "page_number": p.page_number,
@@ -67,109 +90,74 @@ async def get_pages_list(
         }
         for p in pages
     ]
+    return conditional_json_response(request, dump_payload(summaries), etag)
 
 
 @router.get("/pages/{page_number}", response_model=dict)
 async def get_page(
     page_number: int,
+    request: Request,
     book: Book = Depends(get_published_book),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get a single page with all text units and their audio mappings."""
-
-    result = await db.execute(
-        select(Page)
-        .options(
-            selectinload(Page.text_units),
-            selectinload(Page.sections),
-        )
-        .where(Page.book_id == book.id, Page.page_number == page_number)
-    )
-    page = result.scalar_one_or_none()
-    if not page:
+    """Get a single page with all text units and their audio mappings.
+
+    Served from the materialized payload cache (see app/services/page_cache.py).
+    The content revision is read once and used for both the ETag and the
+    cache key, so a 304 or an in-process cache hit costs one Redis round trip.
+    """
+    revision = await get_content_revision()
+    etag = None
+    if revision is not None:
+        etag = compute_etag("page", book.id, book.manifest_version, page_number, revision)
+    # Only an ETag this page was served with proves it exists; "*" waits for the lookup
+    if etag and etag_matches(request, etag, allow_wildcard=False):
+        return not_modified_response(etag)
+
+    data = await get_page_json(db, book, page_number, revision)
+    if data is None:
         raise HTTPException(status_code=404, detail="Sahifa topilmadi")
+    return conditional_json_response(request, data, etag)
+
+
+BUNDLE_TASK_TTL_SECONDS = 600
+
 
-    # Sahifaga tegishli audio fayllarni topish
-    audio_result = await db.execute(
-        select(AudioFile)
-        .where(
-            AudioFile.book_id == book.id,
-            AudioFile.page_start <= page_number,
-            AudioFile.page_end >= page_number,
-            AudioFile.status == "ready",
-        )
-        .order_by(AudioFile.id)
+@router.get("/bundle", response_model=dict)
+async def get_bundle(
+    book: Book = Depends(get_published_book),
+    since: Optional[int] = Query(None, ge=1),
+):
+    """Offline bundle of the whole book (delta when ``since`` is given).
+
+    Returns the bundle URL when it is already built; otherwise schedules the
+    build and answers 202 so the client can poll again.
+    """
+    version = book.manifest_version
+    if since is not None and since >= version:
+        return {"status": "up_to_date", "manifest_version": version}
+
+    if since is not None and not bundles.index_exists(since):
+        since = None
+    if bundles.bundle_exists(version, since):
+        return bundles.bundle_info(version, since)
+
+    task_key = f"bundle_task:{version}:{since or 0}"
+    task_id = await cache_get(task_key)
+    if task_id is None:
+        task_id = bundles.schedule_bundle_build(since)
+        if task_id is None:
+            raise HTTPException(status_code=503, detail="Paket hozircha tayyor emas")
+        await cache_set(task_key, task_id.encode(), BUNDLE_TASK_TTL_SECONDS)
+    elif isinstance(task_id, bytes):
+        task_id = task_id.decode()
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "building",
+            "manifest_version": version,
+            "base_version": since,
+            "task_id": task_id,
+        },
     )
-    audio_files = audio_result.scalars().all()
-    # Sahifaga tegishli audio URL'larning ro'yxati
-    audio_urls = [
-        f"{settings.MEDIA_BASE_URL}/{af.file_path}"
-        for af in audio_files
-        if af.file_path
-    ]
-    # Birinchi audio URL (asosiy)
-    page_audio_url = audio_urls[0] if audio_urls else None
-
-    # Build text units with audio URLs
-    units = []
-    for unit in sorted(page.text_units, key=lambda u: u.sort_order):
-        # Get published audio mapping
-        mapping_result = await db.execute(
-            select(UnitSegmentMapping)
-            .options(selectinload(UnitSegmentMapping.audio_segment))
-            .where(
-                UnitSegmentMapping.text_unit_id == unit.id,
-                UnitSegmentMapping.is_published == True,
-            )
-            .limit(1)
-        )
-        mapping = mapping_result.scalar_one_or_none()
-        audio_url = None
-        if mapping and mapping.audio_segment and mapping.audio_segment.file_path:
-            audio_url = f"{settings.MEDIA_BASE_URL}/{mapping.audio_segment.file_path}"
-
-        units.append({
-            "id": unit.id,
-            "unit_type": unit.unit_type.value if hasattr(unit.unit_type, 'value') else unit.unit_type,
-            "text_content": unit.text_content,
-            "bbox_x": unit.bbox_x,
-            "bbox_y": unit.bbox_y,
-            "bbox_w": unit.bbox_w,
-            "bbox_h": unit.bbox_h,
-            "sort_order": unit.sort_order,
-            "is_manual": unit.is_manual,
-            "audio_segment_url": audio_url,
-            "metadata": unit.metadata_ or {},
-        })
-
-    # Build sections
-    sections = []
-    for sec in sorted(page.sections, key=lambda s: s.sort_order):
-        sections.append({
-            "id": sec.id,
-            "section_type": sec.section_type.value if hasattr(sec.section_type, 'value') else sec.section_type,
-            "target_letter": sec.target_letter,
-            "title_ar": sec.title_ar,
-            "title_uz": sec.title_uz,
-            "sort_order": sec.sort_order,
-            "unit_ids": sec.unit_ids or [],
-            "bbox_y_start": sec.bbox_y_start,
-            "bbox_y_end": sec.bbox_y_end,
-            "is_manual": sec.is_manual,
-        })
-
-    return {
-        "id": page.id,
-        "page_number": page.page_number,
-        "layout_type": getattr(page, 'layout_type', 'pdf') or 'pdf',
-        "image_url": f"{settings.MEDIA_BASE_URL}/{page.image_path}" if page.image_path else None,
-        "image_2x_url": f"{settings.MEDIA_BASE_URL}/{page.image_2x_path}" if page.image_2x_path else None,
-        "image_width": page.image_width,
-        "image_height": page.image_height,
-        "has_text_data": page.has_text_data,
-        "is_annotated": page.is_annotated,
-        "text_units": units,
-        "sections": sections,
-        "audio_url": page_audio_url,
-        "audio_urls": audio_urls,
-    }
@@ -1,15 +1,16 @@
 """Manifest endpoint with ETag support."""
 
-import hashlib
-from fastapi import APIRouter, Depends, Request, Response
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.book import Book, Page, TextUnit
-from app.models.audio import UnitSegmentMapping
-from app.models.system import ManifestVersion
+from app.models.book import Book
+from app.models.system import ManifestStats
 from app.config import get_settings
+from app.api.conditional import conditional_json_response, etag_matches, not_modified_response
+from app.services.manifest_stats import refresh_manifest_stats
+from app.services.page_cache import dump_payload
 
 router = APIRouter(tags=["Manifest"])
 settings = get_settings()
@@ -17,57 +18,32 @@ settings = get_settings()
 
 @router.get("/manifest")
 async def get_manifest(request: Request, db: AsyncSession = Depends(get_db)):
-    """Get current content manifest with ETag caching."""
-    # Get book
-    result = await db.execute(select(Book).limit(1))
-    book = result.scalar_one_or_none()
+    """Get current content manifest with ETag caching.
 
-    if not book:
-        return {"version": 0, "book_id": 0, "total_pages": 0, "total_units": 0, "total_segments": 0}
-
-    # Count entities
-    pages_count = await db.scalar(
-        select(func.count(Page.id)).where(Page.book_id == book.id)
-    )
-    units_count = await db.scalar(
-        select(func.count(TextUnit.id)).join(Page).where(Page.book_id == book.id)
-    )
-    segments_count = await db.scalar(
-        select(func.count(UnitSegmentMapping.id)).where(
-            UnitSegmentMapping.is_published == True
-        )
+    Served from the ``manifest_stats`` row (see app/services/manifest_stats.py);
+    the row is created on first use.
+    """
+    result = await db.execute(
+        select(ManifestStats).order_by(ManifestStats.book_id).limit(1)
     )
+    stats = result.scalar_one_or_none()
 
-    # Latest manifest version
-    mv_result = await db.execute(
-        select(ManifestVersion).order_by(ManifestVersion.version.desc()).limit(1)
-    )
-    mv = mv_result.scalar_one_or_none()
+    if not stats:
+        book = await db.scalar(select(Book).limit(1))
+        if not book:
+            return {"version": 0, "book_id": 0, "total_pages": 0, "total_units": 0, "total_segments": 0}
+        stats = await refresh_manifest_stats(db, book.id)
+
+    if etag_matches(request, stats.etag):
+        return not_modified_response(stats.etag, cache_control="no-cache")
 
     manifest = {
-        "version": book.manifest_version,
-        "book_id": book.id,
-        "total_pages": pages_count or 0,
-        "total_units": units_count or 0,
-        "total_segments": segments_count or 0,
-        "published_at": mv.published_at.isoformat() if mv else None,
+        "version": stats.version,
+        "book_id": stats.book_id,
+        "total_pages": stats.total_pages,
+        "total_units": stats.total_units,
+        "total_segments": stats.total_segments,
+        "published_at": stats.published_at.isoformat() if stats.published_at else None,
         "media_base_url": settings.MEDIA_BASE_URL,
     }
-
-    # Generate ETag
-    etag_content = f"v{book.manifest_version}-p{pages_count}-u{units_count}-s{segments_count}"
-    etag = hashlib.md5(etag_content.encode()).hexdigest()
-
-    # Check If-None-Match
-    if_none_match = request.headers.get("If-None-Match")
-    if if_none_match and if_none_match.strip('"') == etag:
-        return Response(status_code=304, headers={"ETag": f'"{etag}"'})
-
-    return Response(
-        content=__import__("json").dumps(manifest),
-        media_type="application/json",
-        headers={
-            "ETag": f'"{etag}"',
-            "Cache-Control": "no-cache",
-        },
-    )
+    return conditional_json_response(request, dump_payload(manifest), stats.etag, cache_control="no-cache")
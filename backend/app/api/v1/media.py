@@ -0,0 +1,123 @@
+"""Public media endpoints: virtual audio segments served as byte ranges.
+
+A virtual segment (``AUDIO_VIRTUAL_SEGMENTS``) has no file of its own; its
+bytes are ``[byte_start, byte_end)`` of the normalized MP3 of its audio
+file (see app/services/mp3_frames.py). This endpoint serves that slice as
+a standalone MP3, with HTTP Range requests resolved inside the slice so
+players can seek.
+"""
+
+import asyncio
+import os
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.conditional import compute_etag, etag_matches, not_modified_response
+from app.config import get_settings
+from app.database import get_db
+from app.models.audio import AudioFile, AudioSegment
+
+router = APIRouter(prefix="/media", tags=["Media"])
+settings = get_settings()
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Resolve a single ``Range: bytes=`` spec to ``(start, end)`` (inclusive).
+
+    Returns None when there is no usable Range header (serve everything);
+    raises 416 when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # multi-range or malformed: ignore, as the RFC allows
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _read_slice(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+@router.get("/segments/{segment_id}")
+async def get_segment_audio(
+    segment_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """Audio of one segment: the cut file, or the byte range of a virtual segment."""
+    row = (await db.execute(
+        select(
+            AudioSegment.file_path,
+            AudioSegment.byte_start,
+            AudioSegment.byte_end,
+            AudioSegment.version,
+            AudioFile.normalized_path,
+            AudioFile.file_path,
+        )
+        .join(AudioFile, AudioFile.id == AudioSegment.audio_file_id)
+        .where(AudioSegment.id == segment_id)
+    )).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Segment topilmadi")
+    seg_file, byte_start, byte_end, version, normalized_path, source_file = row
+
+    if seg_file:
+        path = os.path.join(settings.MEDIA_DIR, seg_file)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Segment fayli topilmadi")
+        return FileResponse(path, media_type="audio/mpeg")
+
+    if byte_start is None or byte_end is None:
+        raise HTTPException(status_code=404, detail="Segment hali kesilmagan")
+
+    source_path = os.path.join(settings.MEDIA_DIR, normalized_path or source_file)
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio fayl topilmadi")
+
+    # The source file may be re-normalized in place with the same offsets
+    etag = compute_etag(
+        "segment", segment_id, version, byte_start, byte_end, stat.st_mtime_ns, stat.st_size,
+    )
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": settings.PUBLIC_CACHE_CONTROL,
+    }
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+
+    size = byte_end - byte_start
+    byte_range = parse_range(request.headers.get("range"), size)
+    start, end = byte_range or (0, size - 1)
+    data = await asyncio.to_thread(_read_slice, source_path, byte_start + start, end - start + 1)
+
+    if byte_range is None:
+        return Response(content=data, media_type="audio/mpeg", headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(content=data, status_code=206, media_type="audio/mpeg", headers=headers)
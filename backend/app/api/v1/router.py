@@ -5,10 +5,12 @@ from fastapi import APIRouter
 from app.api.v1.book import router as book_router
 from app.api.v1.manifest import router as manifest_router
 from app.api.v1.feedback import router as feedback_router
+from app.api.v1.media import router as media_router
 from app.api.v1.admin.auth import router as admin_auth_router
 from app.api.v1.admin.book import router as admin_book_router
 from app.api.v1.admin.audio import router as admin_audio_router
 from app.api.v1.admin.settings import router as admin_settings_router
+from app.api.v1.admin.tasks import router as admin_tasks_router
 
 router = APIRouter(prefix="/api/v1")
 
@@ -16,6 +18,7 @@ router = APIRouter(prefix="/api/v1")
 router.include_router(book_router)
 router.include_router(manifest_router)
 router.include_router(feedback_router)
+router.include_router(media_router)
 
 # Admin endpoints
 admin_router = APIRouter(prefix="/admin")
@@ -23,5 +26,6 @@ admin_router.include_router(admin_auth_router)
 admin_router.include_router(admin_book_router)
 admin_router.include_router(admin_audio_router)
 admin_router.include_router(admin_settings_router)
+admin_router.include_router(admin_tasks_router)
 
 router.include_router(admin_router)
@@ -0,0 +1,174 @@
+"""One-shot database init: schema, upgrades and seed content.
+
+Runs once per deploy (``python -m app.bootstrap``, the ``init`` compose
+service) instead of in every gunicorn worker. On success it records
+``SCHEMA_VERSION`` in ``system_settings``; the API lifespan only reads that
+marker and skips all of this when it is current.
+
+There are no alembic migrations: tables come from ``create_all`` and columns
+added to existing tables go into ``SCHEMA_UPGRADES`` as idempotent DDL.
+Bump ``SCHEMA_VERSION`` whenever that list (or the seed) changes.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import select, text
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, Base, engine
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+SCHEMA_VERSION = 6
+SCHEMA_VERSION_KEY = "schema_version"
+
+# Advisory lock ID so concurrent init runs (init job + worker fallback) serialize
+INIT_LOCK_ID = 192837465
+
+# Idempotent DDL for columns added to existing tables (applied in order)
+SCHEMA_UPGRADES: list[str] = [
+    "ALTER TABLE audio_segments ADD COLUMN IF NOT EXISTS byte_start INTEGER",
+    "ALTER TABLE audio_segments ADD COLUMN IF NOT EXISTS byte_end INTEGER",
+    "ALTER TABLE unit_segment_mappings ADD COLUMN IF NOT EXISTS confidence DOUBLE PRECISION",
+    "ALTER TABLE pages ADD COLUMN IF NOT EXISTS image_variants JSON",
+    "ALTER TABLE page_versions ADD COLUMN IF NOT EXISTS kind VARCHAR(10) NOT NULL DEFAULT 'full'",
+    "ALTER TABLE page_versions ADD COLUMN IF NOT EXISTS unit_count INTEGER",
+]
+
+
+async def get_schema_version() -> Optional[int]:
+    """Version recorded by the last successful init, or None."""
+    from app.models.system import SystemSettings
+
+    try:
+        async with AsyncSessionLocal() as db:
+            value = await db.scalar(
+                select(SystemSettings.value).where(SystemSettings.key == SCHEMA_VERSION_KEY)
+            )
+    except Exception:
+        # Table does not exist yet
+        return None
+    return int(value) if value and value.isdigit() else None
+
+
+async def _set_schema_version(version: int) -> None:
+    from app.models.system import SystemSettings
+
+    async with AsyncSessionLocal() as db:
+        row = await db.scalar(
+            select(SystemSettings).where(SystemSettings.key == SCHEMA_VERSION_KEY)
+        )
+        if row is None:
+            db.add(SystemSettings(key=SCHEMA_VERSION_KEY, value=str(version)))
+        else:
+            row.value = str(version)
+        await db.commit()
+
+
+async def _create_schema() -> None:
+    import app.models  # noqa: F401 — registers every table on Base.metadata
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+
+
+async def _seed() -> None:
+    # Seed failures are logged, not fatal (same as the old startup behaviour)
+    try:
+        from app.seed import ensure_admin_user
+        await ensure_admin_user()
+    except Exception as e:
+        logger.warning(f"Seed error (non-fatal): {e}")
+
+    try:
+        from app.seed_book import seed_book
+        await seed_book()
+    except Exception as e:
+        logger.warning(f"Book seed error (non-fatal): {e}")
+
+    try:
+        from app.seed_audio import seed_audio
+        await seed_audio()
+    except Exception as e:
+        logger.warning(f"Audio seed error (non-fatal): {e}")
+
+
+async def run_init() -> int:
+    """Create/upgrade the schema, seed content and record the marker.
+
+    Holds a Postgres advisory lock for the whole run; a second caller waits
+    and then finds the marker current. Returns the schema version.
+    """
+    started = time.perf_counter()
+    use_lock = engine.dialect.name == "postgresql"
+
+    async with engine.connect() as lock_conn:
+        if use_lock:
+            await lock_conn.execute(text(f"SELECT pg_advisory_lock({INIT_LOCK_ID})"))
+        try:
+            if await get_schema_version() == SCHEMA_VERSION:
+                logger.info(f"Schema v{SCHEMA_VERSION} already initialized")
+                return SCHEMA_VERSION
+
+            stage = time.perf_counter()
+            await _create_schema()
+            logger.info(
+                f"Database tables ensured ({len(SCHEMA_UPGRADES)} upgrades) "
+                f"in {(time.perf_counter() - stage) * 1000:.0f} ms"
+            )
+
+            stage = time.perf_counter()
+            await _seed()
+            logger.info(f"Seed finished in {(time.perf_counter() - stage) * 1000:.0f} ms")
+
+            await _set_schema_version(SCHEMA_VERSION)
+        finally:
+            if use_lock:
+                await lock_conn.execute(text(f"SELECT pg_advisory_unlock({INIT_LOCK_ID})"))
+
+    logger.info(
+        f"Init complete: schema v{SCHEMA_VERSION} "
+        f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+    return SCHEMA_VERSION
+
+
+async def ensure_initialized() -> None:
+    """Lifespan fast path: one marker lookup, full init only if it is stale."""
+    current = await get_schema_version()
+    if current == SCHEMA_VERSION:
+        logger.info(f"Schema v{current} is current, skipping init")
+        return
+
+    if not settings.INIT_ON_STARTUP:
+        logger.warning(
+            f"Schema marker is v{current}, expected v{SCHEMA_VERSION}. "
+            f"Run `python -m app.bootstrap`."
+        )
+        return
+
+    logger.info(f"Schema marker is v{current}, running init in-process")
+    await run_init()
+
+
+async def main() -> int:
+    try:
+        await run_init()
+    except Exception as e:
+        logger.error(f"Init failed: {e}")
+        return 1
+    finally:
+        await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,117 @@
+"""Shared Redis client and content revision counter.
+
+Redis is optional for the API: every helper here degrades to a no-op (or
+``None``) when Redis is unreachable, and retries only after a short backoff
+so a dead Redis never adds a connect timeout to each request.
+"""
+
+import logging
+import time
+from typing import Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+# Har qanday kontent o'zgarishida oshiriladigan hisoblagich
+CONTENT_REVISION_KEY = "content_rev"
+
+# Redis xatosidan keyin qayta urinishgacha kutish (sekund)
+REDIS_RETRY_SECONDS = 30
+
+_redis = None
+_redis_down_until = 0.0
+
+
+def get_redis():
+    """Return the shared async Redis client, or None while Redis is marked down."""
+    global _redis
+    if time.monotonic() < _redis_down_until:
+        return None
+    if _redis is None:
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            logger.warning("redis package not installed, caching disabled")
+            return None
+        _redis = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5,
+        )
+    return _redis
+
+
+def mark_redis_down(error: Exception) -> None:
+    """Stop using Redis for ``REDIS_RETRY_SECONDS`` after a connection error."""
+    global _redis_down_until
+    if time.monotonic() >= _redis_down_until:
+        logger.warning(f"Redis unavailable, retrying in {REDIS_RETRY_SECONDS}s: {error}")
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except Exception as e:
+        mark_redis_down(e)
+        return None
+
+
+async def cache_set(key: str, value: bytes, ttl_seconds: int) -> None:
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ttl_seconds)
+    except Exception as e:
+        mark_redis_down(e)
+
+
+async def get_content_revision() -> Optional[str]:
+    """Current content revision, or None when Redis is unavailable.
+
+    The counter is seeded with a nanosecond timestamp so a revision lost to
+    eviction or a Redis restart never repeats an earlier value.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        value = await client.get(CONTENT_REVISION_KEY)
+        if value is None:
+            await client.set(CONTENT_REVISION_KEY, time.time_ns(), nx=True)
+            value = await client.get(CONTENT_REVISION_KEY)
+        return value.decode() if value is not None else None
+    except Exception as e:
+        mark_redis_down(e)
+        return None
+
+
+async def bump_content_revision() -> None:
+    """Invalidate everything derived from book content (call after commit)."""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(CONTENT_REVISION_KEY, time.time_ns(), nx=True)
+        await client.incr(CONTENT_REVISION_KEY)
+    except Exception as e:
+        mark_redis_down(e)
+
+
+def bump_content_revision_sync() -> None:
+    """Synchronous variant of ``bump_content_revision`` for Celery tasks."""
+    try:
+        import redis
+
+        client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+        client.set(CONTENT_REVISION_KEY, time.time_ns(), nx=True)
+        client.incr(CONTENT_REVISION_KEY)
+        client.close()
+    except Exception as e:
+        logger.warning(f"Content revision bump failed: {e}")
@@ -0,0 +1,102 @@
+"""Import-time profile of the application.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+summarizes the per-module cost, so regressions in API/worker boot time (a
+heavy library imported at module level instead of on first use) are easy to
+spot:
+
+    python -m app.importtime                      # profile app.main
+    python -m app.importtime app.tasks.celery_app --top 15
+
+Times are microseconds as reported by CPython, shown here in milliseconds.
+"""
+
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """Parse the stderr of ``-X importtime`` into records (in import order)."""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        module = name.lstrip()
+        records.append(ImportRecord(
+            module=module,
+            self_us=int(parts[0]),
+            cumulative_us=int(parts[1]),
+            depth=(len(name) - len(module)) // 2,
+        ))
+    return records
+
+
+def profile_imports(module: str = "app.main") -> List[ImportRecord]:
+    """Import ``module`` in a child interpreter and return its import profile."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def format_report(records: List[ImportRecord], module: str, top: int = 25) -> str:
+    total = next((r.cumulative_us for r in records if r.module == module), 0)
+    by_package = defaultdict(int)
+    for r in records:
+        by_package[r.module.split(".")[0]] += r.self_us
+
+    lines = [f"import {module}: {total / 1000:.1f} ms, {len(records)} modules", ""]
+    lines.append(f"Top {top} packages (self time summed):")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]:
+        lines.append(f"  {us / 1000:9.1f} ms  {package}")
+
+    lines.append("")
+    lines.append(f"Top {top} modules by self time:")
+    for r in sorted(records, key=lambda r: -r.self_us)[:top]:
+        lines.append(f"  {r.self_us / 1000:9.1f} ms  {r.module}")
+
+    lines.append("")
+    lines.append(f"Top {top} app modules by cumulative time:")
+    app_records = [r for r in records if r.module.startswith("app.") or r.module == "app"]
+    for r in sorted(app_records, key=lambda r: -r.cumulative_us)[:top]:
+        lines.append(f"  {r.cumulative_us / 1000:9.1f} ms  {r.module}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-module import cost of the app")
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    try:
+        records = profile_imports(args.module)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(format_report(records, args.module, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,11 @@
 """FastAPI application entry point."""
 
+import time
+
+_import_started = time.perf_counter()
+
 import logging
+import sys
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -18,44 +23,25 @@ settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application startup and shutdown events."""
-    # Startup: run seed if needed
-    logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION} ({settings.ENVIRONMENT})")
+    """Application startup and shutdown events.
 
-    # Create tables if they don't exist
-    try:
-        from app.database import engine, Base
-        from app.models.book import Book, Chapter, Page, TextUnit
-        from app.models.admin import AdminUser
-        from app.models.feedback import FeedbackSubmission
-        from app.models.audio import AudioFile, AudioSegment, UnitSegmentMapping
-        from app.models.system import SystemSettings, AuditLog, ManifestVersion
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables ensured")
-    except Exception as e:
-        logger.warning(f"Table creation error (non-fatal): {e}")
-
-    # Ensure admin user exists
-    try:
-        from app.seed import ensure_admin_user
-        await ensure_admin_user()
-    except Exception as e:
-        logger.warning(f"Seed error (non-fatal): {e}")
+    Schema creation and seeding live in app/bootstrap.py and run once per
+    deploy; here we only check the schema marker.
+    """
+    started = time.perf_counter()
+    logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION} ({settings.ENVIRONMENT})")
+    logger.info(
+        f"App import took {IMPORT_MS:.0f} ms ({len(sys.modules)} modules loaded; "
+        f"details: python -m app.importtime)"
+    )
 
-    # Seed book content if needed
     try:
-        from app.seed_book import seed_book
-        await seed_book()
+        from app.bootstrap import ensure_initialized
+        await ensure_initialized()
     except Exception as e:
-        logger.warning(f"Book seed error (non-fatal): {e}")
+        logger.warning(f"Init error (non-fatal): {e}")
 
-    # Audio fayllarni seed qilish
-    try:
-        from app.seed_audio import seed_audio
-        await seed_audio()
-    except Exception as e:
-        logger.warning(f"Audio seed error (non-fatal): {e}")
+    logger.info(f"Startup complete in {(time.perf_counter() - started) * 1000:.0f} ms")
 
     yield
 
@@ -108,3 +94,7 @@ async def global_exception_handler(request, exc):
         status_code=500,
         content={"detail": "Ichki server xatosi. Iltimos, keyinroq urinib ko'ring."},
     )
+
+
+# Measured from the top of this module (see app/importtime.py for a breakdown)
+IMPORT_MS = (time.perf_counter() - _import_started) * 1000
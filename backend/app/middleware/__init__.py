@@ -3,10 +3,9 @@
 import logging
 import time
 import uuid
-from typing import Callable
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from pythonjsonlogger import jsonlogger
 
 # Configure JSON logger
@@ -21,32 +20,51 @@ logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log every request with structured JSON."""
+class RequestLoggingMiddleware:
+    """Log every request with structured JSON.
+
+    Plain ASGI middleware: the response is streamed straight through (no
+    extra task/stream per request as with ``BaseHTTPMiddleware``); the
+    X-Request-ID header is added to the ``http.response.start`` message.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
         request_id = str(uuid.uuid4())[:8]
         start_time = time.time()
+        status_code = None
 
-        # Add request_id to state for downstream use
-        request.state.request_id = request_id
+        # Add request_id to state for downstream use (request.state.request_id)
+        scope.setdefault("state", {})["request_id"] = request_id
 
-        response = await call_next(request)
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
 
         duration_ms = round((time.time() - start_time) * 1000, 2)
+        headers = Headers(scope=scope)
+        client = scope.get("client")
 
         logger.info(
             "request",
             extra={
                 "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status_code": status_code,
                 "duration_ms": duration_ms,
-                "client_ip": request.client.host if request.client else None,
-                "user_agent": request.headers.get("user-agent", "")[:200],
+                "client_ip": client[0] if client else None,
+                "user_agent": headers.get("user-agent", "")[:200],
             },
         )
-
-        response.headers["X-Request-ID"] = request_id
-        return response
@@ -1,54 +1,153 @@
-"""Rate limiting middleware using Redis."""
+"""Rate limiting middleware using Redis.
 
+Sliding-window log per (route, client IP): a Redis sorted set of request
+timestamps, trimmed and checked atomically by a Lua script, so the limit is
+shared by all gunicorn workers. While Redis is unavailable (see
+``app.cache.get_redis``) a per-process fallback with the same semantics is
+used; it keeps at most ``RATE_LIMIT_FALLBACK_MAX_KEYS`` clients and evicts
+the least recently seen ones.
+"""
+
+import itertools
+import os
 import time
-from typing import Optional
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.cache import get_redis, mark_redis_down
+from app.config import get_settings
 
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+settings = get_settings()
+
+# KEYS[1] = window key; ARGV = now_ms, window_ms, limit, member
+# Returns {allowed (1/0), retry_after_ms}
+SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    return {0, tonumber(oldest[2]) + window - now}
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return {1, 0}
+"""
 
 # In-memory fallback rate limiter (used when Redis is unavailable)
-_rate_limit_store: dict[str, list] = {}
+_rate_limit_store: "OrderedDict[str, deque]" = OrderedDict()
+
+_member_ids = itertools.count()
+_script = None
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse ``"/path=max/window,..."`` into ``{path: (max_requests, window_seconds)}``."""
+    limits = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        path, _, rule = entry.partition("=")
+        max_requests, _, window = rule.partition("/")
+        limits[path.strip()] = (int(max_requests), int(window))
+    return limits
+
+
+def client_ip(scope: Scope) -> str:
+    """Client address; nginx overwrites X-Real-IP with the real peer address."""
+    real_ip = Headers(scope=scope).get("x-real-ip")
+    if real_ip:
+        return real_ip.strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple rate limiter for specific endpoints."""
+def check_memory(key: str, max_requests: int, window: int, now: float) -> Optional[float]:
+    """Fallback check. Returns None if allowed, else seconds until retry."""
+    hits = _rate_limit_store.get(key)
+    if hits is None:
+        hits = _rate_limit_store[key] = deque()
+        while len(_rate_limit_store) > settings.RATE_LIMIT_FALLBACK_MAX_KEYS:
+            _rate_limit_store.popitem(last=False)
+    else:
+        _rate_limit_store.move_to_end(key)
+
+    while hits and hits[0] <= now - window:
+        hits.popleft()
+    if len(hits) >= max_requests:
+        return hits[0] + window - now
+    hits.append(now)
+    return None
+
+
+async def check_redis(client, key: str, max_requests: int, window: int, now: float) -> Optional[float]:
+    """Atomic sliding-window check in Redis. Same return value as ``check_memory``."""
+    global _script
+    if _script is None or _script.registered_client is not client:
+        # EVALSHA with automatic reload on NOSCRIPT
+        _script = client.register_script(SLIDING_WINDOW_LUA)
+
+    now_ms = int(now * 1000)
+    allowed, retry_ms = await _script(
+        keys=[key],
+        args=[now_ms, window * 1000, max_requests, f"{now_ms}:{os.getpid()}:{next(_member_ids)}"],
+    )
+    if int(allowed):
+        return None
+    return int(retry_ms) / 1000
+
+
+class RateLimitMiddleware:
+    """Per-route, per-IP rate limiter for POST endpoints (plain ASGI)."""
 
     # Endpoint-specific limits: (max_requests, window_seconds)
-    LIMITS = {
-        "/api/v1/feedback": (5, 60),        # 5 per minute
-        "/api/v1/admin/auth/login": (10, 300),  # 10 per 5 min
-    }
+    LIMITS = parse_limits(settings.RATE_LIMITS)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        path = request.url.path
-        limit_config = None
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
+    def _match(self, scope: Scope) -> Optional[Tuple[str, Tuple[int, int]]]:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return None
+        path = scope["path"]
         for pattern, config in self.LIMITS.items():
-            if path.startswith(pattern) and request.method == "POST":
-                limit_config = config
-                break
+            if path.startswith(pattern):
+                return pattern, config
+        return None
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit_config = self._match(scope)
         if limit_config:
-            max_requests, window = limit_config
-            client_ip = request.client.host if request.client else "unknown"
-            key = f"rl:{path}:{client_ip}"
-
+            pattern, (max_requests, window) = limit_config
+            key = f"rl:{pattern}:{client_ip(scope)}"
             now = time.time()
-            if key not in _rate_limit_store:
-                _rate_limit_store[key] = []
 
-            # Clean old entries
-            _rate_limit_store[key] = [
-                t for t in _rate_limit_store[key] if t > now - window
-            ]
+            retry_after = None
+            client = get_redis()
+            if client is not None:
+                try:
+                    retry_after = await check_redis(client, key, max_requests, window, now)
+                except Exception as e:
+                    mark_redis_down(e)
+                    client = None
+            if client is None:
+                retry_after = check_memory(key, max_requests, window, now)
 
-            if len(_rate_limit_store[key]) >= max_requests:
-                raise HTTPException(
+            if retry_after is not None:
+                response = JSONResponse(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Juda ko'p so'rovlar. Biroz kuting.",
+                    content={"detail": "Juda ko'p so'rovlar. Biroz kuting."},
+                    headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
                 )
+                await response(scope, receive, send)
+                return
 
-            _rate_limit_store[key].append(now)
-
-        return await call_next(request)
+        await self.app(scope, receive, send)
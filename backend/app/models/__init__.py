@@ -1,10 +1,10 @@
 """Database models package."""
 
-from app.models.book import Book, Chapter, Page, TextUnit, PageStatus, PageVersion
+from app.models.book import Book, Chapter, Page, TextUnit, PageStatus, PageVersion, PageQACache
 from app.models.audio import AudioFile, AudioSegment, UnitSegmentMapping
 from app.models.admin import AdminUser
 from app.models.feedback import FeedbackSubmission
-from app.models.system import AuditLog, SystemSettings, ManifestVersion
+from app.models.system import AuditLog, SystemSettings, ManifestVersion, ManifestStats
 from app.models.section import Section, SectionType
 
 __all__ = [
@@ -12,6 +12,6 @@ __all__ = [
     "AudioFile", "AudioSegment", "UnitSegmentMapping",
     "AdminUser",
     "FeedbackSubmission",
-    "AuditLog", "SystemSettings", "ManifestVersion",
+    "AuditLog", "SystemSettings", "ManifestVersion", "ManifestStats",
     "Section", "SectionType",
 ]
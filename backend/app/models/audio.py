@@ -53,6 +53,9 @@ class AudioSegment(Base):
     file_path = Column(String(500), nullable=True)  # Path to cut segment file
     start_ms = Column(Integer, nullable=False)
     end_ms = Column(Integer, nullable=False)
+    # Virtual segment: frame-aligned byte range into the audio file's normalized MP3
+    byte_start = Column(Integer, nullable=True)
+    byte_end = Column(Integer, nullable=True)  # exclusive
     duration_ms = Column(Integer, nullable=False)
     waveform_peaks = Column(JSON, nullable=True)
     is_silence = Column(Boolean, default=False)
@@ -72,6 +75,7 @@ class UnitSegmentMapping(Base):
     audio_segment_id = Column(Integer, ForeignKey("audio_segments.id", ondelete="CASCADE"), nullable=False)
     version = Column(Integer, default=1)
     is_published = Column(Boolean, default=False)
+    confidence = Column(Float, nullable=True)  # Auto-alignment score (0.0 - 1.0), NULL if manual
     published_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
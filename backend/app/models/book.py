@@ -78,6 +78,7 @@ class Page(Base):
     source_image_path = Column(String(500), nullable=True) # Original uploaded image
     image_width = Column(Integer, nullable=True)
     image_height = Column(Integer, nullable=True)
+    image_variants = Column(JSON, nullable=True)           # Responsive derivatives (services/image_variants.py)
 
     # Status
     has_text_data = Column(Boolean, default=False)
@@ -125,15 +126,27 @@ class TextUnit(Base):
 
 
 class PageVersion(Base):
-    """Snapshot of a page's text_units at publish time for rollback."""
+    """Snapshot of a page's text_units at publish time for rollback (see services/page_versions.py)."""
     __tablename__ = "page_versions"
 
     id = Column(Integer, primary_key=True, index=True)
     page_id = Column(Integer, ForeignKey("pages.id", ondelete="CASCADE"), nullable=False)
     version = Column(Integer, nullable=False)  # 1, 2, 3...
-    snapshot = Column(JSON, nullable=False)     # List of text_unit dicts
+    kind = Column(String(10), nullable=False, default="full", server_default="full")  # "full" | "delta"
+    snapshot = Column(JSON, nullable=False)     # full: list of unit dicts; delta: {"set", "delete"}
+    unit_count = Column(Integer, nullable=True)
     qa_report = Column(JSON, nullable=True)     # QA result at publish time
     published_by = Column(Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     page = relationship("Page", back_populates="versions")
+
+
+class PageQACache(Base):
+    """Last QA result of a page's current units (see services/qa_report.py)."""
+    __tablename__ = "page_qa_cache"
+
+    page_id = Column(Integer, ForeignKey("pages.id", ondelete="CASCADE"), primary_key=True)
+    units_hash = Column(String(64), nullable=False)  # SHA-256 of the QA input
+    report = Column(JSON, nullable=False)            # QAResult.to_dict()
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
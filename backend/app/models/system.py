@@ -1,4 +1,4 @@
-"""System models: audit log, settings, manifest versioning."""
+"""System models: audit log, settings, manifest versioning and stats."""
 
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, ForeignKey, JSON
@@ -39,3 +39,17 @@ class ManifestVersion(Base):
     changelog = Column(Text, nullable=True)
     published_by = Column(Integer, ForeignKey("admin_users.id", ondelete="SET NULL"), nullable=True)
     published_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ManifestStats(Base):
+    """Precomputed manifest totals, maintained by admin writes (one row per book)."""
+    __tablename__ = "manifest_stats"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    total_pages = Column(Integer, nullable=False, default=0)
+    total_units = Column(Integer, nullable=False, default=0)
+    total_segments = Column(Integer, nullable=False, default=0)
+    published_at = Column(DateTime(timezone=True), nullable=True)
+    etag = Column(String(64), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
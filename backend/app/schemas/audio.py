@@ -58,6 +58,7 @@ class SegmentMappingOut(BaseModel):
     audio_segment_id: int
     version: int
     is_published: bool
+    confidence: Optional[float] = None
     published_at: Optional[datetime] = None
 
     class Config:
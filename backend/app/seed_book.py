@@ -5,6 +5,7 @@ import logging
 from sqlalchemy import select, delete, text
 from app.database import AsyncSessionLocal
 from app.models.book import Book, Chapter, Page, TextUnit, UnitType
+from app.services.manifest_stats import refresh_manifest_stats
 from app.seed_book_data import PAGES
 
 logger = logging.getLogger("muallimi")
@@ -161,6 +162,7 @@ async def seed_book():
 
                 logger.info(f"  Page {pn}: {len(content)} units created")
 
+            await refresh_manifest_stats(db, book.id)
             await db.commit()
             logger.info(f"Book seeding complete! {total_pages} pages created.")
 
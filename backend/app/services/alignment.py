@@ -0,0 +1,291 @@
+"""Automatic text ↔ audio alignment for draft UnitSegmentMappings.
+
+A page's units, in reading order (sections by ``sort_order``, then the
+order inside each section), are aligned to the non-silence segments of the
+audio files covering the page, in playback order. A file spanning several
+pages is aligned against the units of all its pages in one pass, and only
+the page's mappings are kept. Both sequences are
+monotonic, so the best assignment is found with dynamic programming over
+(units consumed, segments consumed), where each step is one of:
+
+  - match: a run of 1..``MAX_GROUP`` units is read in one segment; the
+    cost is how far the segment duration is from the expected duration of
+    the run (``|log(actual / expected)|``), plus a penalty per extra unit,
+  - skip segment: speech that belongs to no unit (instructions, repeats),
+  - skip unit: a unit that is not read aloud.
+
+Expected duration is the unit weight (Arabic letters, plus a constant for
+the per-item pause) times the speaking rate. The rate is first estimated
+from the totals, then re-estimated from the matched pairs and the
+alignment is run again.
+
+Each mapping gets a confidence in (0, 1]: 1 when the segment is exactly as
+long as expected, lower for poorer duration fits and grouped units.
+"""
+
+import math
+from statistics import median
+from typing import List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.audio import AudioFile, AudioSegment, AudioStatus
+from app.models.book import Page, TextUnit
+from app.models.section import Section
+from app.services.sectioning import count_chars
+
+MAX_GROUP = 4
+BASE_UNIT_WEIGHT = 1.0
+SKIP_SEGMENT_COST = 1.0
+SKIP_UNIT_COST = 1.5
+GROUP_COST = 0.3
+
+# DP search band around the diagonal: half-width as a share of the longer
+# sequence, at least MIN_BAND cells
+BAND_RATIO = 0.05
+MIN_BAND = 30
+# Larger inputs are rejected rather than aligned on an API worker
+MAX_ALIGN_UNITS = 1000
+MAX_ALIGN_SEGMENTS = 2000
+
+_MATCH, _SKIP_SEGMENT, _SKIP_UNIT = 0, 1, 2
+
+
+def unit_weight(text: str) -> float:
+    return BASE_UNIT_WEIGHT + count_chars(text or "")
+
+
+def order_units(units: Sequence[TextUnit], sections: Sequence[Section]) -> List[TextUnit]:
+    """Reading order: section by section, then units outside any section.
+
+    Units not listed in a section keep their ``sort_order`` position
+    relative to the sectioned units.
+    """
+    by_id = {u.id: u for u in units}
+    ordered: List[TextUnit] = []
+    seen = set()
+    for section in sorted(sections, key=lambda s: (s.sort_order, s.id)):
+        for unit_id in section.unit_ids or []:
+            unit = by_id.get(unit_id)
+            if unit is not None and unit_id not in seen:
+                ordered.append(unit)
+                seen.add(unit_id)
+
+    for unit in sorted(units, key=lambda u: (u.sort_order, u.id)):
+        if unit.id in seen:
+            continue
+        position = next(
+            (i for i, placed in enumerate(ordered) if placed.sort_order > unit.sort_order),
+            len(ordered),
+        )
+        ordered.insert(position, unit)
+    return ordered
+
+
+def _band(n: int, m: int):
+    """Per unit row, the segment columns ``[lo, hi]`` the DP visits.
+
+    At least one diagonal step wide, so consecutive rows always overlap and
+    ``(n, m)`` stays reachable from ``(0, 0)``.
+    """
+    width = max(MIN_BAND, math.ceil(BAND_RATIO * max(n, m)), math.ceil(m / n) if n else m)
+    rows = []
+    for i in range(n + 1):
+        center = i * m / n if n else 0
+        rows.append((max(0, math.floor(center - width)), min(m, math.ceil(center + width))))
+    return rows
+
+
+def _align(weights: Sequence[float], durations: Sequence[int], rate: float):
+    """DP core. Returns ``[(first_unit, last_unit_exclusive, segment_index, cost)]``.
+
+    Only cells within a diagonal band (``_band``) are visited, so the work
+    is O(units × band) rather than O(units × segments).
+    """
+    n, m = len(weights), len(durations)
+    prefix = [0.0]
+    for w in weights:
+        prefix.append(prefix[-1] + w)
+
+    inf = float("inf")
+    band = _band(n, m)
+    cost = [[inf] * (hi - lo + 1) for lo, hi in band]
+    back = [[None] * (hi - lo + 1) for lo, hi in band]
+    cost[0][0] = 0.0
+    log_durations = [math.log(max(d, 1)) for d in durations]
+    log_rate = math.log(rate)
+
+    def at(i, j):
+        lo, hi = band[i]
+        return cost[i][j - lo] if lo <= j <= hi else inf
+
+    for i in range(n + 1):
+        lo, hi = band[i]
+        row = cost[i]
+        for j in range(lo, hi + 1):
+            best = row[j - lo]
+            step = back[i][j - lo]
+            if j > lo and row[j - lo - 1] + SKIP_SEGMENT_COST < best:
+                best, step = row[j - lo - 1] + SKIP_SEGMENT_COST, (_SKIP_SEGMENT, 0, 0.0)
+            if i and at(i - 1, j) + SKIP_UNIT_COST < best:
+                best, step = at(i - 1, j) + SKIP_UNIT_COST, (_SKIP_UNIT, 0, 0.0)
+            if i and j:
+                for k in range(1, min(MAX_GROUP, i) + 1):
+                    prev = at(i - k, j - 1)
+                    if prev == inf:
+                        continue
+                    fit = abs(log_durations[j - 1] - log_rate - math.log(prefix[i] - prefix[i - k]))
+                    total = prev + fit + GROUP_COST * (k - 1)
+                    if total < best:
+                        best, step = total, (_MATCH, k, fit)
+            row[j - lo] = best
+            back[i][j - lo] = step
+
+    matches = []
+    i, j = n, m
+    while i or j:
+        kind, k, fit = back[i][j - band[i][0]]
+        if kind == _MATCH:
+            matches.append((i - k, i, j - 1, fit))
+            i, j = i - k, j - 1
+        elif kind == _SKIP_SEGMENT:
+            j -= 1
+        else:
+            i -= 1
+    matches.reverse()
+    return matches
+
+
+def align_units_to_segments(
+    units: Sequence[dict],
+    segments: Sequence[dict],
+) -> List[dict]:
+    """Best monotonic assignment of ``units`` to ``segments``.
+
+    ``units``: ``{"id", "text_content"}`` in reading order;
+    ``segments``: ``{"id", "duration_ms"}`` in playback order.
+    Returns ``{"text_unit_id", "audio_segment_id", "confidence"}`` for every
+    unit that got a segment, in unit order.
+    """
+    if not units or not segments:
+        return []
+    if len(units) > MAX_ALIGN_UNITS or len(segments) > MAX_ALIGN_SEGMENTS:
+        raise ValueError(
+            f"Too large to align: {len(units)} units x {len(segments)} segments "
+            f"(max {MAX_ALIGN_UNITS} x {MAX_ALIGN_SEGMENTS})"
+        )
+    weights = [unit_weight(u["text_content"]) for u in units]
+    durations = [max(int(s["duration_ms"]), 1) for s in segments]
+
+    rate = sum(durations) / sum(weights)
+    matches = _align(weights, durations, rate)
+    if matches:
+        # refine the speaking rate from what actually matched
+        rate = median(durations[j] / sum(weights[a:b]) for a, b, j, _fit in matches)
+        matches = _align(weights, durations, rate)
+
+    mappings = []
+    for first, last, j, fit in matches:
+        confidence = round(math.exp(-fit) / (1 + GROUP_COST * (last - first - 1)), 3)
+        for unit in units[first:last]:
+            mappings.append({
+                "text_unit_id": unit["id"],
+                "audio_segment_id": segments[j]["id"],
+                "confidence": confidence,
+            })
+    return mappings
+
+
+def load_page_alignment_input(db: Session, page_id: int) -> Optional[dict]:
+    """Units and segments to align for a page (DB reads only).
+
+    Audio files often span several pages, so the input covers the whole
+    page range of the files covering the page (extended by any other file
+    overlapping it): units of every page in that range in reading order,
+    and the segments of those files in playback order. Returns None if the
+    page does not exist.
+    """
+    page = db.get(Page, page_id)
+    if page is None:
+        return None
+
+    files = db.execute(
+        select(AudioFile.id, AudioFile.page_start, AudioFile.page_end)
+        .where(
+            AudioFile.book_id == page.book_id,
+            AudioFile.page_start.isnot(None),
+            AudioFile.page_end.isnot(None),
+            AudioFile.status.in_([AudioStatus.SEGMENTED, AudioStatus.READY]),
+        )
+    ).all()
+    first = last = page.page_number
+    while True:
+        covering = [f for f in files if f.page_start <= last and f.page_end >= first]
+        span = (
+            min([first] + [f.page_start for f in covering]),
+            max([last] + [f.page_end for f in covering]),
+        )
+        if span == (first, last):
+            break
+        first, last = span
+    covering.sort(key=lambda f: (f.page_start, f.page_end, f.id))
+
+    pages = db.execute(
+        select(Page.id, Page.page_number)
+        .where(Page.book_id == page.book_id, Page.page_number.between(first, last))
+        .order_by(Page.page_number)
+    ).all()
+    page_ids = [p.id for p in pages]
+    units = db.execute(select(TextUnit).where(TextUnit.page_id.in_(page_ids))).scalars().all()
+    sections = db.execute(select(Section).where(Section.page_id.in_(page_ids))).scalars().all()
+    ordered = []
+    for p in pages:
+        ordered += order_units(
+            [u for u in units if u.page_id == p.id],
+            [s for s in sections if s.page_id == p.id],
+        )
+
+    segments = []
+    if covering:
+        rows = db.execute(
+            select(AudioSegment.id, AudioSegment.audio_file_id, AudioSegment.duration_ms)
+            .where(
+                AudioSegment.audio_file_id.in_([f.id for f in covering]),
+                AudioSegment.is_silence == False,
+            )
+            .order_by(AudioSegment.segment_index)
+        ).all()
+        file_order = {f.id: i for i, f in enumerate(covering)}
+        segments = [
+            {"id": seg_id, "duration_ms": duration}
+            for seg_id, _file_id, duration in sorted(rows, key=lambda r: file_order[r.audio_file_id])
+        ]
+
+    return {
+        "page_id": page_id,
+        "page_range": [first, last],
+        "units": [
+            {"id": u.id, "page_id": u.page_id, "text_content": u.text_content} for u in ordered
+        ],
+        "segments": segments,
+    }
+
+
+def plan_page_alignment(alignment_input: dict) -> dict:
+    """Align the loaded range and keep the page's mappings (nothing is written).
+
+    CPU-bound and independent of the database: API code runs it in an
+    executor, after ``load_page_alignment_input`` through ``run_sync``.
+    """
+    page_id = alignment_input["page_id"]
+    units = alignment_input["units"]
+    mappings = align_units_to_segments(units, alignment_input["segments"])
+    page_unit_ids = {u["id"] for u in units if u["page_id"] == page_id}
+    return {
+        "page_id": page_id,
+        "page_range": alignment_input["page_range"],
+        "unit_count": len(page_unit_ids),
+        "segment_count": len(alignment_input["segments"]),
+        "mappings": [m for m in mappings if m["text_unit_id"] in page_unit_ids],
+    }
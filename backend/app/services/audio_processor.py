@@ -4,8 +4,11 @@ import json
 import logging
 import os
 import subprocess
-import re
-from typing import List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 from app.config import get_settings
 
@@ -33,13 +36,18 @@ def get_audio_duration_ms(file_path: str) -> int:
 
 
 def normalize_audio(input_path: str, output_path: str) -> bool:
-    """Normalize audio to consistent format: 44.1kHz, mono, 128kbps MP3."""
+    """Normalize audio to consistent format: 44.1kHz, mono, 128kbps MP3.
+
+    The bit reservoir is disabled, so every frame carries its own data and
+    virtual segments can be byte slices of this file (see mp3_frames.py).
+    """
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         result = subprocess.run(
             [
                 "ffmpeg", "-y", "-i", input_path,
                 "-ar", "44100", "-ac", "1", "-b:a", "128k",
+                "-c:a", "libmp3lame", "-reservoir", "0",
                 "-f", "mp3", output_path,
             ],
             capture_output=True, text=True, timeout=300,
@@ -53,95 +61,196 @@ def normalize_audio(input_path: str, output_path: str) -> bool:
         return False
 
 
-def generate_waveform_peaks(file_path: str, num_samples: int = 1000) -> List[float]:
-    """Generate waveform peak data for visualization using FFmpeg."""
+def segment_source_path(audio_file) -> str:
+    """Media-relative file that segments are cut from (or point into, when virtual)."""
+    return audio_file.normalized_path or audio_file.file_path
+
+
+def assign_segment_byte_ranges(frame_index, segments) -> None:
+    """Turn ``segments`` into virtual segments of the indexed source file.
+
+    Sets ``byte_start``/``byte_end`` from the MP3 frame index (see
+    app/services/mp3_frames.py) and clears ``file_path``.
+    """
+    for seg in segments:
+        seg.byte_start, seg.byte_end = frame_index.byte_range(seg.start_ms, seg.end_ms)
+        seg.file_path = None
+
+
+def waveform_path(audio_file_id: int) -> str:
+    """Media-relative path of the binary peak pyramid of an audio file."""
+    return f"waveforms/audio_{audio_file_id}.peaks"
+
+
+def envelope_path(audio_file_id: int) -> str:
+    """Media-relative path of the cached energy envelope of an audio file."""
+    return f"waveforms/audio_{audio_file_id}.env"
+
+
+def _write_file_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def generate_waveform_peaks(
+    file_path: str,
+    num_samples: int = 1000,
+    output_path: Optional[str] = None,
+) -> List[float]:
+    """Generate waveform peak data for visualization using FFmpeg.
+
+    Returns ``num_samples`` normalized peaks (the ``waveform_peaks`` JSON);
+    with ``output_path`` the full multi-resolution pyramid is also written
+    there (see app/services/waveform.py).
+    """
+    from app.services.waveform import PEAK_LEVELS, compute_peak_pyramid, encode_peak_pyramid
+
     try:
-        # Get raw audio samples
-        result = subprocess.run(
-            [
-                "ffmpeg", "-i", file_path,
-                "-f", "s16le", "-ac", "1", "-ar", "8000",
-                "-",
-            ],
-            capture_output=True, timeout=120,
-        )
-        if result.returncode != 0:
+        levels = tuple(sorted(set(PEAK_LEVELS) | {num_samples}))
+        pyramid = compute_peak_pyramid(file_path, levels)
+        if pyramid is None or not pyramid.levels:
             logger.error("Waveform generation failed")
             return []
 
-        raw_data = result.stdout
-        if not raw_data:
-            return []
-
-        # Convert raw bytes to samples
-        import struct
-        sample_count = len(raw_data) // 2
-        samples = struct.unpack(f"<{sample_count}h", raw_data[:sample_count * 2])
+        if output_path:
+            _write_file_atomic(output_path, encode_peak_pyramid(pyramid))
 
-        # Downsample to num_samples peaks
-        chunk_size = max(1, sample_count // num_samples)
-        peaks = []
-        for i in range(0, sample_count, chunk_size):
-            chunk = samples[i:i + chunk_size]
-            if chunk:
-                peak = max(abs(s) for s in chunk) / 32768.0
-                peaks.append(round(peak, 4))
-
-        return peaks[:num_samples]
+        return pyramid.normalized_peaks(num_samples)
 
     except Exception as e:
         logger.error(f"Waveform error: {e}")
         return []
 
 
-def detect_silence_boundaries(
-    file_path: str,
+@dataclass
+class AudioAnalysis:
+    """Everything the processing pipeline needs from one decode of a file."""
+    duration_ms: int
+    peaks: List[float]
+    silences: List[Tuple[float, float]]
+    # stage name -> wall time in ms
+    timings_ms: Dict[str, int] = field(default_factory=dict)
+
+
+def analyze_audio(
+    input_path: str,
+    normalized_path: Optional[str] = None,
+    peaks_path: Optional[str] = None,
+    envelope_path: Optional[str] = None,
+    num_samples: int = 1000,
     silence_threshold: str = "-30dB",
     min_silence_duration: float = 0.3,
-) -> List[Tuple[float, float]]:
-    """
-    Use FFmpeg silencedetect to find silence regions.
-    Returns list of (start_ms, end_ms) silence boundaries.
+) -> Optional[AudioAnalysis]:
+    """Decode ``input_path`` once and derive everything processing needs.
+
+    A single ffmpeg process writes two outputs:
+      - the normalized MP3 (same settings as ``normalize_audio``), when
+        ``normalized_path`` is given,
+      - 8 kHz mono s16le PCM on stdout.
+    The PCM stream is reduced as it arrives to the peak pyramid (see
+    app/services/waveform.py) and to the 10 ms energy envelope that silence
+    detection runs on (see app/services/silence.py); both are cached next
+    to each other when paths are given. Duration is taken from the decoded
+    sample count, so no ffprobe run is needed either.
+
+    Returns None if ffmpeg fails.
     """
-    try:
-        result = subprocess.run(
-            [
-                "ffmpeg", "-i", file_path,
-                "-af", f"silencedetect=noise={silence_threshold}:d={min_silence_duration}",
-                "-f", "null", "-",
-            ],
-            capture_output=True, text=True, timeout=120,
-        )
+    from app.services.silence import EnvelopeReducer, detect_silences, encode_envelope
+    from app.services.waveform import (
+        PEAK_LEVELS, PEAKS_SAMPLE_RATE, encode_peak_pyramid, peak_pyramid_from_stream,
+    )
+
+    started = time.perf_counter()
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats", "-v", "error", "-i", input_path]
+    if normalized_path:
+        os.makedirs(os.path.dirname(normalized_path), exist_ok=True)
+        cmd += [
+            "-map", "0:a:0",
+            "-ar", "44100", "-ac", "1", "-b:a", "128k",
+            "-c:a", "libmp3lame", "-reservoir", "0",
+            "-f", "mp3", normalized_path,
+        ]
+    cmd += [
+        "-map", "0:a:0",
+        "-ac", "1", "-ar", str(PEAKS_SAMPLE_RATE),
+        "-f", "s16le", "-",
+    ]
 
-        silences = []
-        start_pattern = re.compile(r"silence_start: ([\d.]+)")
-        end_pattern = re.compile(r"silence_end: ([\d.]+)")
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        logger.error(f"Audio analysis error: {e}")
+        return None
 
-        starts = start_pattern.findall(result.stderr)
-        ends = end_pattern.findall(result.stderr)
+    # ffmpeg blocks once the stderr pipe buffer fills, so read it concurrently
+    stderr_chunks: List[bytes] = []
 
-        for s, e in zip(starts, ends):
-            silences.append((float(s) * 1000, float(e) * 1000))
+    def drain_stderr():
+        for chunk in iter(lambda: proc.stderr.read(8192), b""):
+            stderr_chunks.append(chunk)
 
-        return silences
+    stderr_reader = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_reader.start()
 
+    levels = tuple(sorted(set(PEAK_LEVELS) | {num_samples}))
+    envelope_reducer = EnvelopeReducer(PEAKS_SAMPLE_RATE)
+    try:
+        pyramid = peak_pyramid_from_stream(
+            proc.stdout, levels, PEAKS_SAMPLE_RATE, on_chunk=envelope_reducer.feed,
+        )
+        returncode = proc.wait(timeout=300)
     except Exception as e:
-        logger.error(f"Silence detect error: {e}")
-        return []
-
-
-def auto_segment(
-    file_path: str,
-    duration_ms: int,
-    silence_threshold: str = "-30dB",
-    min_silence_duration: float = 0.3,
-) -> List[dict]:
+        logger.error(f"Audio analysis error: {e}")
+        returncode = None
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr_reader.join(timeout=5)
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if returncode != 0:
+        stderr = b"".join(stderr_chunks).decode("utf-8", errors="replace")
+        logger.error(f"FFmpeg analysis error (exit {returncode}): {stderr[-2000:]}")
+        return None
+
+    envelope = envelope_reducer.envelope()
+    timings = {"decode": int((time.perf_counter() - started) * 1000)}
+
+    stage = time.perf_counter()
+    peaks: List[float] = []
+    if pyramid.levels:
+        peaks = pyramid.normalized_peaks(num_samples)
+        if peaks_path:
+            _write_file_atomic(peaks_path, encode_peak_pyramid(pyramid))
+    if envelope_path:
+        _write_file_atomic(envelope_path, encode_envelope(envelope))
+    timings["cache_write"] = int((time.perf_counter() - stage) * 1000)
+
+    stage = time.perf_counter()
+    silences = detect_silences(envelope, silence_threshold, min_silence_duration)
+    timings["silence_detect"] = int((time.perf_counter() - stage) * 1000)
+
+    return AudioAnalysis(
+        duration_ms=pyramid.duration_ms,
+        peaks=peaks,
+        silences=silences,
+        timings_ms=timings,
+    )
+
+
+def auto_segment(duration_ms: int, silences: List[Tuple[float, float]]) -> List[dict]:
     """
     Auto-segment audio based on silence detection.
     Returns list of segment dicts with start_ms, end_ms, is_silence.
-    """
-    silences = detect_silence_boundaries(file_path, silence_threshold, min_silence_duration)
 
+    ``silences`` are (start_ms, end_ms) pairs from the energy envelope
+    (``analyze_audio`` or ``silence.detect_silences``).
+    """
     segments = []
     current_pos = 0
     seg_index = 0
@@ -213,3 +322,71 @@ def cut_segment_file(
     except Exception as e:
         logger.error(f"Cut segment error: {e}")
         return False
+
+
+def _cut_batch(source_path: str, cuts: Sequence[Tuple[int, int, str]]) -> List[bool]:
+    """Cut several segments with one ffmpeg run (one stream-copy output each).
+
+    The source is demuxed once; every output keeps only the packets of its
+    own window. If the run fails, the batch is retried one segment at a
+    time so a single bad cut does not fail its neighbours.
+    """
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", source_path]
+    for start_ms, end_ms, output_path in cuts:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        cmd += [
+            "-map", "0:a:0",
+            "-ss", str(start_ms / 1000.0),
+            "-t", str((end_ms - start_ms) / 1000.0),
+            "-c", "copy", output_path,
+        ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60 + 5 * len(cuts))
+        if result.returncode == 0:
+            return [
+                os.path.exists(path) and os.path.getsize(path) > 0
+                for _, _, path in cuts
+            ]
+        logger.warning(f"Batch cut failed, retrying per segment: {result.stderr[-500:]}")
+    except Exception as e:
+        logger.warning(f"Batch cut error, retrying per segment: {e}")
+
+    return [cut_segment_file(source_path, path, start_ms, end_ms) for start_ms, end_ms, path in cuts]
+
+
+def cut_segment_files(
+    source_path: str,
+    cuts: Sequence[Tuple[int, int, str]],
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[bool]:
+    """Cut many ``(start_ms, end_ms, output_path)`` segments from one source.
+
+    Cuts are grouped into batches of ``AUDIO_CUT_BATCH_SIZE`` outputs per
+    ffmpeg run, and up to ``AUDIO_CUT_WORKERS`` runs go in parallel.
+    ``progress(done, total)`` is called as batches finish. Returns one
+    success flag per cut, in input order.
+    """
+    batch_size = batch_size or settings.AUDIO_CUT_BATCH_SIZE
+    max_workers = max_workers or settings.AUDIO_CUT_WORKERS
+    total = len(cuts)
+    results: List[bool] = [False] * total
+    if not cuts:
+        return results
+
+    batches = [range(i, min(i + batch_size, total)) for i in range(0, total, batch_size)]
+    done = 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        futures = {
+            pool.submit(_cut_batch, source_path, [cuts[i] for i in batch]): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            for i, ok in zip(batch, future.result()):
+                results[i] = ok
+            done += len(batch)
+            if progress:
+                progress(done, total)
+    return results
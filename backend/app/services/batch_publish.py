@@ -0,0 +1,208 @@
+"""Book-wide batch publishing.
+
+Publishes a set of pages (or every DRAFT page) in one transaction:
+
+1. pages, all their units and their audio mappings are loaded with three
+   queries,
+2. QA runs for all pages in a process pool (``QA_WORKERS``),
+3. versions of the passing pages are recorded in bulk
+   (``record_page_versions``), page rows and audit rows are written with
+   one executemany / multi-row insert each,
+4. ``Book.manifest_version`` is bumped once, with one ``ManifestVersion``
+   row, and the manifest stats are recounted.
+
+Pages that fail QA keep their status and get their ``qa_report`` updated,
+as with the single-page endpoint. The result is one consolidated report.
+
+The pool is billiard's when available (it ships with Celery and, unlike
+``multiprocessing``, may be started from a daemonic prefork child); small
+batches are checked in-process.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.book import Book, Page, PageStatus, PageVersion, TextUnit
+from app.models.system import AuditLog, ManifestVersion
+from app.services.manifest_stats import recount_manifest_stats
+from app.services.page_payload import load_audio_urls
+from app.services.page_versions import compact_page_versions, record_page_versions
+from app.services.qa_checker import qa_input, run_qa_checks
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+# Below this many pages, starting worker processes costs more than it saves
+MIN_PARALLEL_PAGES = 8
+
+
+def _qa_page(item: Tuple[int, List[dict]]) -> Tuple[int, dict]:
+    page_id, units = item
+    return page_id, run_qa_checks(units).to_dict()
+
+
+def run_qa_parallel(units_by_page: Dict[int, List[dict]], workers: Optional[int] = None) -> Dict[int, dict]:
+    """QA reports (``QAResult.to_dict()``) for many pages, using a process pool for large batches."""
+    items = list(units_by_page.items())
+    workers = min(workers or settings.QA_WORKERS or os.cpu_count() or 1, len(items))
+    if workers <= 1 or len(items) < MIN_PARALLEL_PAGES:
+        return dict(map(_qa_page, items))
+
+    try:
+        from billiard import Pool
+    except ImportError:
+        from multiprocessing import Pool
+
+    pool = Pool(workers)
+    try:
+        results = pool.map(_qa_page, items, chunksize=max(1, len(items) // (workers * 4)))
+    finally:
+        pool.close()
+        pool.join()
+    return dict(results)
+
+
+def publish_pages(
+    db: Session,
+    book_id: int,
+    page_ids: Optional[Sequence[int]] = None,
+    admin_id: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> dict:
+    """Run QA for the given pages (default: all DRAFT pages of the book) and publish those that pass.
+
+    Writes everything in the session without committing. Returns the report:
+    ``published`` / ``failed`` counts, ``manifest_version`` (None if
+    nothing was published), per-page results and stage timings.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    query = select(Page).where(Page.book_id == book_id)
+    if page_ids is None:
+        query = query.where(Page.analysis_status == PageStatus.DRAFT)
+    else:
+        query = query.where(Page.id.in_(list(page_ids)))
+    pages = {p.id: p for p in db.execute(query.order_by(Page.page_number)).scalars()}
+
+    units_by_page: Dict[int, list] = {page_id: [] for page_id in pages}
+    audio_urls = load_audio_urls(db, pages)
+    if pages:
+        units = db.execute(
+            select(TextUnit)
+            .where(TextUnit.page_id.in_(list(pages)))
+            .order_by(TextUnit.page_id, TextUnit.sort_order, TextUnit.id)
+        ).scalars()
+        for unit in units:
+            units_by_page[unit.page_id].append(unit)
+    timings["load"] = round((time.perf_counter() - started) * 1000, 1)
+
+    stage = time.perf_counter()
+    reports = run_qa_parallel(
+        {page_id: qa_input(units, audio_urls) for page_id, units in units_by_page.items()}, workers
+    )
+    timings["qa"] = round((time.perf_counter() - stage) * 1000, 1)
+
+    stage = time.perf_counter()
+    passed = [page_id for page_id in pages if reports[page_id]["passed"]]
+    versions = record_page_versions(db, passed, reports, admin_id)
+
+    now = datetime.utcnow()
+    if pages:
+        db.execute(update(Page), [
+            {
+                "id": page_id,
+                "qa_report": reports[page_id],
+                **({
+                    "analysis_status": PageStatus.PUBLISHED,
+                    "published_at": now,
+                    "is_annotated": True,
+                } if page_id in versions else {}),
+            }
+            for page_id in pages
+        ])
+
+    manifest_version = None
+    if passed:
+        book = db.get(Book, book_id)
+        book.manifest_version += 1
+        manifest_version = book.manifest_version
+        db.add(ManifestVersion(
+            version=manifest_version,
+            published_by=admin_id,
+            changelog=f"Batch publish: {len(passed)} pages",
+        ))
+        db.execute(insert(AuditLog), [
+            {
+                "admin_id": admin_id,
+                "action": "publish_page",
+                "entity_type": "page",
+                "entity_id": page_id,
+                "details": {
+                    "qa_score": reports[page_id]["score"],
+                    "version": versions[page_id],
+                    "batch": True,
+                },
+            }
+            for page_id in passed
+        ])
+
+        # Bounded history: only pages over the limit need compaction
+        keep = settings.PAGE_VERSIONS_KEEP
+        if keep > 0:
+            crowded = db.execute(
+                select(PageVersion.page_id)
+                .where(PageVersion.page_id.in_(passed))
+                .group_by(PageVersion.page_id)
+                .having(func.count(PageVersion.id) > keep)
+            ).scalars().all()
+            for page_id in crowded:
+                compact_page_versions(db, page_id, keep)
+
+    db.add(AuditLog(
+        admin_id=admin_id,
+        action="batch_publish",
+        entity_type="book",
+        entity_id=book_id,
+        details={
+            "requested": len(pages),
+            "published": len(passed),
+            "manifest_version": manifest_version,
+        },
+    ))
+    db.flush()
+    recount_manifest_stats(db, book_id)
+    timings["write"] = round((time.perf_counter() - stage) * 1000, 1)
+
+    results = []
+    for page_id, page in pages.items():
+        report = reports[page_id]
+        results.append({
+            "page_id": page_id,
+            "page_number": page.page_number,
+            "published": page_id in versions,
+            "version": versions.get(page_id),
+            "qa_score": report["score"],
+            "failed_checks": [c["name"] for c in report["checks"] if not c["passed"]],
+        })
+
+    logger.info(
+        f"Batch publish: {len(passed)}/{len(pages)} pages published "
+        f"(manifest v{manifest_version}) timings={timings}"
+    )
+    return {
+        "book_id": book_id,
+        "requested": len(pages),
+        "published": len(passed),
+        "failed": len(pages) - len(passed),
+        "manifest_version": manifest_version,
+        "pages": results,
+        "timings_ms": timings,
+    }
@@ -0,0 +1,263 @@
+"""Offline book bundles: the whole book as one compressed archive.
+
+A bundle is a ZIP stored under ``MEDIA_DIR/bundles`` (served by nginx like
+any other media file) containing:
+
+    manifest.json      book summary, chapters, bundle versions, page index
+    pages/NNN.json     public page payloads (text units + sections)
+    audio_index.json   audio files and the published segment of every unit
+
+Full bundles are named ``book_v{version}.zip``. Each full build also writes
+``book_v{version}.index.json`` with a content hash per page; the index files
+are kept forever (they are tiny) so a delta bundle
+``book_v{base}_to_v{version}.zip`` can be produced later, containing only the
+pages whose payload changed since ``base`` plus the list of removed pages.
+
+Bundles snapshot the content at build time; publishing the book (which bumps
+``manifest_version``) is what ships new content to offline clients.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.audio import AudioFile, AudioSegment, AudioStatus, UnitSegmentMapping
+from app.models.book import Book, Chapter, Page, TextUnit
+from app.services.page_payload import assemble_page_payload, segment_url
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+BUNDLE_FORMAT = 1
+BUNDLE_DIR = "bundles"
+
+
+def bundle_filename(version: int, base_version: Optional[int] = None) -> str:
+    if base_version is None:
+        return f"{BUNDLE_DIR}/book_v{version}.zip"
+    return f"{BUNDLE_DIR}/book_v{base_version}_to_v{version}.zip"
+
+
+def index_filename(version: int) -> str:
+    return f"{BUNDLE_DIR}/book_v{version}.index.json"
+
+
+def _abs(rel_path: str) -> str:
+    return os.path.join(settings.MEDIA_DIR, rel_path)
+
+
+def bundle_exists(version: int, base_version: Optional[int] = None) -> bool:
+    return os.path.exists(_abs(bundle_filename(version, base_version)))
+
+
+def index_exists(version: int) -> bool:
+    return os.path.exists(_abs(index_filename(version)))
+
+
+def bundle_info(version: int, base_version: Optional[int] = None) -> dict:
+    """Public description of an already built bundle."""
+    rel_path = bundle_filename(version, base_version)
+    return {
+        "status": "ready",
+        "manifest_version": version,
+        "base_version": base_version,
+        "url": f"{settings.MEDIA_BASE_URL}/{rel_path}",
+        "size_bytes": os.path.getsize(_abs(rel_path)),
+    }
+
+
+def _dump(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_atomic(rel_path: str, write) -> None:
+    path = _abs(rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def collect_audio_index(db: Session, book_id: int) -> dict:
+    """Audio files of the book plus the published segment of every mapped unit."""
+    files = db.execute(
+        select(AudioFile)
+        .where(AudioFile.book_id == book_id, AudioFile.status == AudioStatus.READY)
+        .order_by(AudioFile.id)
+    ).scalars().all()
+
+    rows = db.execute(
+        select(
+            Page.page_number,
+            UnitSegmentMapping.text_unit_id,
+            AudioSegment.id,
+            AudioSegment.audio_file_id,
+            AudioSegment.file_path,
+            AudioSegment.start_ms,
+            AudioSegment.end_ms,
+            AudioSegment.byte_start,
+            AudioSegment.byte_end,
+        )
+        .join(AudioSegment, AudioSegment.id == UnitSegmentMapping.audio_segment_id)
+        .join(TextUnit, TextUnit.id == UnitSegmentMapping.text_unit_id)
+        .join(Page, Page.id == TextUnit.page_id)
+        .where(Page.book_id == book_id, UnitSegmentMapping.is_published == True)
+        .order_by(UnitSegmentMapping.id)
+    ).all()
+
+    units = {}
+    for page_number, unit_id, seg_id, file_id, file_path, start_ms, end_ms, byte_start, byte_end in rows:
+        if unit_id in units:
+            continue
+        units[unit_id] = {
+            "page_number": page_number,
+            "text_unit_id": unit_id,
+            "segment_id": seg_id,
+            "audio_file_id": file_id,
+            "url": segment_url(seg_id, file_path, byte_start),
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            # virtual segments: byte range into the audio file's segment_source_url
+            "byte_start": None if file_path else byte_start,
+            "byte_end": None if file_path else byte_end,
+        }
+
+    return {
+        "audio_files": [
+            {
+                "id": af.id,
+                "url": f"{settings.MEDIA_BASE_URL}/{af.file_path}",
+                "segment_source_url": f"{settings.MEDIA_BASE_URL}/{af.normalized_path or af.file_path}",
+                "duration_ms": af.duration_ms,
+                "page_start": af.page_start,
+                "page_end": af.page_end,
+            }
+            for af in files
+        ],
+        "units": list(units.values()),
+    }
+
+
+def build_bundle(db: Session, base_version: Optional[int] = None) -> dict:
+    """Build the bundle for the current manifest version (delta if ``base_version``).
+
+    Falls back to a full bundle when no index exists for ``base_version``.
+    Returns ``bundle_info`` of the written archive.
+    """
+    import zipfile
+    book = db.execute(select(Book).where(Book.is_published == True).limit(1)).scalar_one_or_none()
+    if not book:
+        raise ValueError("Kitob topilmadi")
+    version = book.manifest_version
+
+    if base_version is not None and (base_version >= version or not index_exists(base_version)):
+        base_version = None
+
+    page_numbers = db.execute(
+        select(Page.page_number).where(Page.book_id == book.id).order_by(Page.page_number)
+    ).scalars().all()
+
+    pages = {}
+    for page_number in page_numbers:
+        payload = assemble_page_payload(db, book.id, page_number)
+        if payload is not None:
+            data = _dump(payload)
+            pages[page_number] = (data, hashlib.sha256(data).hexdigest())
+
+    page_index = {str(n): sha for n, (_, sha) in pages.items()}
+    included = list(pages)
+    removed = []
+    if base_version is not None:
+        with open(_abs(index_filename(base_version))) as f:
+            base_index = json.load(f)["pages"]
+        included = [n for n in pages if base_index.get(str(n)) != page_index[str(n)]]
+        removed = sorted(int(n) for n in base_index if n not in page_index)
+
+    chapters = db.execute(
+        select(Chapter).where(Chapter.book_id == book.id).order_by(Chapter.sort_order)
+    ).scalars().all()
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "manifest_version": version,
+        "base_version": base_version,
+        "book": {
+            "id": book.id,
+            "title": book.title,
+            "total_pages": book.total_pages,
+            "manifest_version": version,
+        },
+        "chapters": [
+            {
+                "id": ch.id,
+                "title": ch.title,
+                "title_ar": ch.title_ar,
+                "sort_order": ch.sort_order,
+                "start_page": ch.start_page,
+                "end_page": ch.end_page,
+            }
+            for ch in chapters
+        ],
+        "pages": [
+            {"page_number": n, "sha256": pages[n][1], "path": f"pages/{n:03d}.json"}
+            for n in included
+        ],
+        "removed_pages": removed,
+        "media_base_url": settings.MEDIA_BASE_URL,
+    }
+    audio_index = collect_audio_index(db, book.id)
+
+    def write_zip(path):
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+            zf.writestr("manifest.json", _dump(manifest))
+            zf.writestr("audio_index.json", _dump(audio_index))
+            for n in included:
+                zf.writestr(f"pages/{n:03d}.json", pages[n][0])
+
+    _write_atomic(bundle_filename(version, base_version), write_zip)
+
+    if base_version is None:
+        def write_index(path):
+            with open(path, "w") as f:
+                json.dump({"manifest_version": version, "pages": page_index}, f)
+
+        _write_atomic(index_filename(version), write_index)
+        prune_bundles(version)
+
+    logger.info(
+        f"Bundle v{version} built"
+        + (f" (delta from v{base_version})" if base_version is not None else "")
+        + f": {len(included)} pages"
+    )
+    return bundle_info(version, base_version)
+
+
+def prune_bundles(current_version: int) -> None:
+    """Delete archives of older versions; page indexes are kept for deltas."""
+    bundle_dir = _abs(BUNDLE_DIR)
+    for name in os.listdir(bundle_dir):
+        if not name.endswith(".zip"):
+            continue
+        target = name.rsplit("_v", 1)[-1].removesuffix(".zip")
+        if target.isdigit() and int(target) < current_version:
+            os.remove(os.path.join(bundle_dir, name))
+
+
+def schedule_bundle_build(since: Optional[int] = None) -> Optional[str]:
+    """Enqueue ``build_bundle_task``; returns the task id, or None if Celery is down."""
+    try:
+        from app.tasks.bundle_tasks import build_bundle_task
+        return build_bundle_task.delay(since).id
+    except Exception as e:
+        logger.warning(f"Could not schedule bundle build (since={since}): {e}")
+        return None
@@ -7,17 +7,28 @@ Uses Tesseract for OCR with Arabic language support.
 Designed to be swappable with Google Cloud Vision later.
 """
 
+import hashlib
+import io
 import os
 import re
 import logging
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Iterator, List, Optional, Sequence, Tuple
 from dataclasses import dataclass, asdict
 
 from app.config import get_settings
+from app.services.ocr_cache import cache_key, get_ocr_cache
 
 logger = logging.getLogger("muallimi")
 settings = get_settings()
 
+# Tesseract with Arabic language
+# PSM 6 = Assume a single uniform block of text
+# OEM 3 = Default (LSTM + Legacy)
+TESSERACT_LANG = "ara"
+TESSERACT_CONFIG = "--psm 6 --oem 3"
+
 # Arabic diacritics (tashkeel) Unicode range
 ARABIC_DIACRITICS = set([
     '\u064B',  # FATHATAN (tanwin fatha)
@@ -97,110 +108,173 @@ def classify_unit_type(text: str, word_count: int) -> str:
         return "sentence"
 
 
-def analyze_image_tesseract(image_path: str) -> List[AnalyzedUnit]:
-    """Analyze a page image using Tesseract OCR.
-
-    Returns list of AnalyzedUnit with text, bounding boxes, and types.
-    Requires pytesseract and Pillow to be installed.
-    """
+@lru_cache(maxsize=1)
+def _tesseract_available() -> bool:
+    """Import the OCR stack once per process and check the Arabic model is installed."""
     try:
         import pytesseract
-        from PIL import Image
+        from PIL import Image  # noqa: F401
     except ImportError:
         logger.error("pytesseract or Pillow not installed. Install with: pip install pytesseract Pillow")
-        return []
+        return False
+    try:
+        if "ara" not in pytesseract.get_languages(config=""):
+            logger.warning("Tesseract 'ara' language data not found; OCR results will be poor")
+    except Exception as e:
+        logger.error(f"Tesseract is not usable: {e}")
+        return False
+    return True
 
-    if not os.path.exists(image_path):
-        logger.error(f"Image not found: {image_path}")
-        return []
+
+@lru_cache(maxsize=1)
+def _tesseract_version() -> str:
+    import pytesseract
 
     try:
-        img = Image.open(image_path)
-        img_width, img_height = img.size
-
-        # Run Tesseract with Arabic language
-        # PSM 6 = Assume a single uniform block of text
-        # OEM 3 = Default (LSTM + Legacy)
-        data = pytesseract.image_to_data(
-            img,
-            lang='ara',
-            config='--psm 6 --oem 3',
-            output_type=pytesseract.Output.DICT
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+
+def ocr_words_tesseract(image_path: str) -> Optional[dict]:
+    """Raw Tesseract output for an image: ``{"width", "height", "words": [...]}``.
+
+    Each word has ``text``, ``line_num``, ``left``, ``top``, ``width``,
+    ``height`` (pixels) and ``conf`` (0-100, -1 when unknown). Results are
+    cached by image content, engine version and config (see
+    app/services/ocr_cache.py). Returns None if OCR is unavailable or the
+    image is missing.
+    """
+    if not _tesseract_available():
+        return None
+    import pytesseract
+    from PIL import Image
+
+    if not os.path.exists(image_path):
+        logger.error(f"Image not found: {image_path}")
+        return None
+
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    cache = get_ocr_cache()
+    key = cache_key(
+        hashlib.sha256(image_bytes).hexdigest(),
+        f"tesseract {_tesseract_version()}",
+        f"{TESSERACT_LANG} {TESSERACT_CONFIG}",
+    )
+    raw = cache.get(key)
+    if raw is not None:
+        logger.info(f"OCR cache hit for {image_path}")
+        return raw
+
+    img = Image.open(io.BytesIO(image_bytes))
+    img_width, img_height = img.size
+
+    data = pytesseract.image_to_data(
+        img,
+        lang=TESSERACT_LANG,
+        config=TESSERACT_CONFIG,
+        output_type=pytesseract.Output.DICT
+    )
+
+    words = []
+    for i in range(len(data['text'])):
+        text = data['text'][i].strip()
+        if not text:
+            continue
+        words.append({
+            'text': text,
+            'line_num': data['line_num'][i],
+            'left': data['left'][i],
+            'top': data['top'][i],
+            'width': data['width'][i],
+            'height': data['height'][i],
+            'conf': float(data['conf'][i]),
+        })
+
+    raw = {"width": img_width, "height": img_height, "words": words}
+    cache.put(key, raw)
+    return raw
+
+
+def units_from_ocr_words(raw: dict) -> List[AnalyzedUnit]:
+    """Group raw OCR words into lines and turn each line into an AnalyzedUnit."""
+    img_width = raw["width"]
+    img_height = raw["height"]
+    units = []
+    sort_idx = 0
+
+    # Group words by line
+    lines = {}
+    for word in raw["words"]:
+        conf = word['conf'] / 100.0  # Normalize to 0-1
+        lines.setdefault(word['line_num'], []).append({
+            'text': word['text'],
+            'left': word['left'],
+            'top': word['top'],
+            'width': word['width'],
+            'height': word['height'],
+            'conf': max(0, conf),
+        })
+
+    # Process each line
+    for line_num in sorted(lines.keys()):
+        words = lines[line_num]
+        if not words:
+            continue
+
+        # Calculate line bounding box
+        min_left = min(w['left'] for w in words)
+        min_top = min(w['top'] for w in words)
+        max_right = max(w['left'] + w['width'] for w in words)
+        max_bottom = max(w['top'] + w['height'] for w in words)
+        avg_conf = sum(w['conf'] for w in words) / len(words)
+
+        line_text = ' '.join(w['text'] for w in words)
+        word_count = len(words)
+
+        # Classify unit type
+        unit_type = classify_unit_type(line_text, word_count)
+
+        # Convert to percentages
+        bbox_x = (min_left / img_width) * 100
+        bbox_y = (min_top / img_height) * 100
+        bbox_w = ((max_right - min_left) / img_width) * 100
+        bbox_h = ((max_bottom - min_top) / img_height) * 100
+
+        unit = AnalyzedUnit(
+            text=line_text,
+            unit_type=unit_type,
+            bbox_x=round(bbox_x, 2),
+            bbox_y=round(bbox_y, 2),
+            bbox_w=round(bbox_w, 2),
+            bbox_h=round(bbox_h, 2),
+            confidence=round(avg_conf, 3),
+            sort_order=sort_idx,
+            metadata={
+                'word_count': word_count,
+                'has_diacritics': has_arabic_diacritics(line_text),
+                'diacritics_count': count_diacritics(line_text),
+                'source': 'tesseract',
+            },
         )
+        units.append(unit)
+        sort_idx += 1
 
-        units = []
-        current_line = []
-        current_line_num = -1
-        sort_idx = 0
-
-        n_boxes = len(data['text'])
-
-        # Group words by line
-        lines = {}
-        for i in range(n_boxes):
-            text = data['text'][i].strip()
-            if not text:
-                continue
-
-            line_num = data['line_num'][i]
-            conf = float(data['conf'][i]) / 100.0  # Normalize to 0-1
-
-            if line_num not in lines:
-                lines[line_num] = []
-
-            lines[line_num].append({
-                'text': text,
-                'left': data['left'][i],
-                'top': data['top'][i],
-                'width': data['width'][i],
-                'height': data['height'][i],
-                'conf': max(0, conf),
-            })
-
-        # Process each line
-        for line_num in sorted(lines.keys()):
-            words = lines[line_num]
-            if not words:
-                continue
-
-            # Calculate line bounding box
-            min_left = min(w['left'] for w in words)
-            min_top = min(w['top'] for w in words)
-            max_right = max(w['left'] + w['width'] for w in words)
-            max_bottom = max(w['top'] + w['height'] for w in words)
-            avg_conf = sum(w['conf'] for w in words) / len(words)
-
-            line_text = ' '.join(w['text'] for w in words)
-            word_count = len(words)
-
-            # Classify unit type
-            unit_type = classify_unit_type(line_text, word_count)
-
-            # Convert to percentages
-            bbox_x = (min_left / img_width) * 100
-            bbox_y = (min_top / img_height) * 100
-            bbox_w = ((max_right - min_left) / img_width) * 100
-            bbox_h = ((max_bottom - min_top) / img_height) * 100
-
-            unit = AnalyzedUnit(
-                text=line_text,
-                unit_type=unit_type,
-                bbox_x=round(bbox_x, 2),
-                bbox_y=round(bbox_y, 2),
-                bbox_w=round(bbox_w, 2),
-                bbox_h=round(bbox_h, 2),
-                confidence=round(avg_conf, 3),
-                sort_order=sort_idx,
-                metadata={
-                    'word_count': word_count,
-                    'has_diacritics': has_arabic_diacritics(line_text),
-                    'diacritics_count': count_diacritics(line_text),
-                    'source': 'tesseract',
-                },
-            )
-            units.append(unit)
-            sort_idx += 1
+    return units
+
+
+def analyze_image_tesseract(image_path: str) -> List[AnalyzedUnit]:
+    """Analyze a page image using Tesseract OCR.
 
+    Returns list of AnalyzedUnit with text, bounding boxes, and types.
+    Requires pytesseract and Pillow to be installed.
+    """
+    try:
+        raw = ocr_words_tesseract(image_path)
+        if raw is None:
+            return []
+        units = units_from_ocr_words(raw)
         logger.info(f"Tesseract analysis: {len(units)} units extracted from {image_path}")
         return units
 
@@ -228,3 +302,26 @@ def analyze_image(image_path: str, engine: str = "tesseract") -> List[AnalyzedUn
     else:
         logger.error(f"Unknown OCR engine: {engine}")
         return []
+
+
+def analyze_images(
+    image_paths: Sequence[str],
+    engine: str = "tesseract",
+    workers: Optional[int] = None,
+) -> Iterator[Tuple[str, List[AnalyzedUnit]]]:
+    """Analyze many images in parallel, yielding ``(path, units)`` as each finishes.
+
+    pytesseract runs the ``tesseract`` binary in a subprocess per image, so
+    a thread pool gives one OCR process per worker, and it also works inside
+    Celery's daemonic prefork children (which cannot start a process pool).
+    Each tesseract run is limited to one OpenMP thread, which is faster than
+    letting ``workers`` runs compete for all cores.
+    """
+    workers = max(1, min(workers or settings.OCR_WORKERS, len(image_paths) or 1))
+    if workers > 1:
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_image, path, engine): path for path in image_paths}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
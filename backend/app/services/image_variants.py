@@ -0,0 +1,199 @@
+"""Responsive page image derivatives.
+
+From a page's best source image (uploaded original or the high-DPI PDF
+render) a worker writes a resized copy per width in ``PAGE_IMAGE_WIDTHS``
+(the reader's 1x/2x/3x), in WEBP and, when Pillow can encode it, AVIF,
+plus a tiny blurred placeholder inlined as a data URI.
+
+File names carry a hash of the source bytes and the variant settings
+(``pages/variants/page_007.3f9a1c0b2e4d.960w.webp``). ``/media`` is served
+with ``immutable`` caching, so a changed source must get new names rather
+than overwrite old ones. Old names must also keep working while cached
+payloads and bundles still point at them: after the new value is
+committed, only generations older than the previous one are deleted
+(``previous_hash`` records the one kept).
+
+The result is stored in ``Page.image_variants``; ``variants_payload`` turns
+it into the ``srcset`` lists of the page API.
+"""
+
+import base64
+import glob
+import hashlib
+import io
+import logging
+import os
+from typing import List, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+VARIANTS_DIR = "pages/variants"
+
+# Bump when the encoding below changes, so every page gets new file names
+VARIANTS_FORMAT = 1
+
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+PLACEHOLDER_WIDTH = 16
+
+_MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def variant_widths() -> List[int]:
+    """Target widths (ascending) from ``PAGE_IMAGE_WIDTHS``."""
+    return sorted({int(w) for w in settings.PAGE_IMAGE_WIDTHS.split(",") if w.strip()})
+
+
+def avif_supported() -> bool:
+    """Pillow can write AVIF (native since Pillow 11.2, or the pillow-avif-plugin)."""
+    try:
+        from PIL import features
+
+        if features.check("avif"):
+            return True
+    except Exception:
+        pass
+    try:
+        import pillow_avif  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _source_hash(source_path: str, widths: List[int], formats: List[str]) -> str:
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(f"{VARIANTS_FORMAT}:{widths}:{formats}".encode())
+    return digest.hexdigest()[:12]
+
+
+def _placeholder(img) -> str:
+    from PIL import Image, ImageFilter
+
+    height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+    tiny = img.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buf = io.BytesIO()
+    tiny.save(buf, "WEBP", quality=30)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def remove_stale_variants(page_number: int, keep_hashes) -> int:
+    """Delete a page's variant files of every generation not in ``keep_hashes``; returns how many.
+
+    Call only after the new ``Page.image_variants`` is committed: cached
+    payloads and offline bundles may still reference the previous
+    generation, so callers keep it too.
+    """
+    keep = {h for h in keep_hashes if h}
+    output_dir = os.path.join(settings.MEDIA_DIR, VARIANTS_DIR)
+    removed = 0
+    for path in glob.glob(os.path.join(output_dir, f"page_{page_number:03d}.*")):
+        parts = os.path.basename(path).split(".")
+        if len(parts) > 1 and parts[1] in keep:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def generate_image_variants(source_path: str, page_number: int) -> Optional[dict]:
+    """Write the derivatives of one page image; returns the ``Page.image_variants`` value.
+
+    Existing files with the same hash are reused, so re-running on an
+    unchanged source only re-reads it. Files of older generations are left
+    in place (see ``remove_stale_variants``). Widths above the source width are
+    not upscaled: they collapse to one variant at the source width.
+    Returns None if the source is missing.
+    """
+    from PIL import Image
+
+    if not os.path.exists(source_path):
+        logger.error(f"Image variants: source not found: {source_path}")
+        return None
+
+    formats = (["avif"] if avif_supported() else []) + ["webp"]
+    widths = variant_widths()
+    source_hash = _source_hash(source_path, widths, formats)
+    output_dir = os.path.join(settings.MEDIA_DIR, VARIANTS_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with Image.open(source_path) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        src_width, src_height = img.size
+
+        result = {
+            "hash": source_hash,
+            "width": src_width,
+            "height": src_height,
+            "placeholder": _placeholder(img),
+            "formats": {fmt: [] for fmt in formats},
+        }
+        for width in sorted({min(w, src_width) for w in widths}):
+            height = max(1, round(src_height * width / src_width))
+            resized = None
+            for fmt in formats:
+                filename = f"page_{page_number:03d}.{source_hash}.{width}w.{fmt}"
+                path = os.path.join(output_dir, filename)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = img if width == src_width else img.resize((width, height), Image.LANCZOS)
+                    tmp_path = f"{path}.tmp"
+                    if fmt == "avif":
+                        resized.save(tmp_path, "AVIF", quality=AVIF_QUALITY)
+                    else:
+                        resized.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=6)
+                    os.replace(tmp_path, path)
+                result["formats"][fmt].append({
+                    "path": f"{VARIANTS_DIR}/{filename}",
+                    "width": width,
+                    "height": height,
+                })
+
+    logger.info(
+        f"Image variants for page {page_number}: "
+        f"{sum(len(v) for v in result['formats'].values())} files ({', '.join(formats)})"
+    )
+    return result
+
+
+def variants_payload(variants: Optional[dict]) -> Optional[dict]:
+    """Public form of ``Page.image_variants``: placeholder plus a ``srcset`` per format.
+
+    Sources are listed best format first, as ``<picture>`` expects.
+    """
+    if not variants or not variants.get("formats"):
+        return None
+    sources = []
+    for fmt, items in variants["formats"].items():
+        if not items:
+            continue
+        sources.append({
+            "type": _MIME_TYPES.get(fmt, f"image/{fmt}"),
+            "srcset": ", ".join(
+                f"{settings.MEDIA_BASE_URL}/{item['path']} {item['width']}w" for item in items
+            ),
+            "images": [
+                {
+                    "url": f"{settings.MEDIA_BASE_URL}/{item['path']}",
+                    "width": item["width"],
+                    "height": item["height"],
+                }
+                for item in items
+            ],
+        })
+    return {
+        "width": variants.get("width"),
+        "height": variants.get("height"),
+        "placeholder": variants.get("placeholder"),
+        "sources": sources,
+    }
@@ -0,0 +1,140 @@
+"""Manifest totals kept in the ``manifest_stats`` summary row.
+
+``GET /manifest`` is polled on every app launch, so instead of counting pages,
+units and published mappings on each request the totals are maintained at
+write time:
+
+* ``adjust_manifest_stats`` applies a delta in a single UPDATE (unit and
+  mapping CRUD, bulk edits);
+* ``refresh_manifest_stats`` recounts everything (publish, rollback, imports,
+  audio processing — anything that rewrites content wholesale).
+
+Both run inside the caller's transaction and store the ETag next to the
+totals, so the manifest is answered from one row.
+"""
+
+import hashlib
+from typing import Iterable, Optional
+
+from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.audio import UnitSegmentMapping
+from app.models.book import Book, Page, TextUnit
+from app.models.system import ManifestStats, ManifestVersion
+
+
+def manifest_etag(version: int, pages: int, units: int, segments: int) -> str:
+    """Quoted ETag of the manifest (same value the endpoint always returned)."""
+    raw = f"v{version}-p{pages}-u{units}-s{segments}"
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def recount_manifest_stats(db: Session, book_id: int) -> Optional[ManifestStats]:
+    """Recount all totals of a book and store them (sync core)."""
+    book = db.get(Book, book_id)
+    if not book:
+        return None
+
+    pages = db.scalar(
+        select(func.count(Page.id)).where(Page.book_id == book_id)
+    ) or 0
+    units = db.scalar(
+        select(func.count(TextUnit.id)).join(Page).where(Page.book_id == book_id)
+    ) or 0
+    segments = db.scalar(
+        select(func.count(UnitSegmentMapping.id)).where(
+            UnitSegmentMapping.is_published == True
+        )
+    ) or 0
+    published_at = db.scalar(
+        select(ManifestVersion.published_at).order_by(ManifestVersion.version.desc()).limit(1)
+    )
+
+    stats = db.get(ManifestStats, book_id)
+    if stats is None:
+        stats = ManifestStats(book_id=book_id)
+        db.add(stats)
+    stats.version = book.manifest_version
+    stats.total_pages = pages
+    stats.total_units = units
+    stats.total_segments = segments
+    stats.published_at = published_at
+    stats.etag = manifest_etag(book.manifest_version, pages, units, segments)
+    db.flush()
+    return stats
+
+
+async def refresh_manifest_stats(db: AsyncSession, book_id: int) -> Optional[ManifestStats]:
+    """Recount all totals of a book and store them."""
+    return await db.run_sync(recount_manifest_stats, book_id)
+
+
+async def adjust_manifest_stats(
+    db: AsyncSession,
+    book_id: Optional[int],
+    pages: int = 0,
+    units: int = 0,
+    segments: int = 0,
+) -> None:
+    """Apply count deltas to the summary row and re-derive its ETag.
+
+    ``book_id=None`` adjusts every row; the published segment total is not
+    scoped to a book, so mapping/segment changes use that. Missing rows are
+    left alone: the manifest endpoint recounts on first use.
+    """
+    if not (pages or units or segments):
+        return
+    query = update(ManifestStats).values(
+        total_pages=ManifestStats.total_pages + pages,
+        total_units=ManifestStats.total_units + units,
+        total_segments=ManifestStats.total_segments + segments,
+    )
+    if book_id is not None:
+        query = query.where(ManifestStats.book_id == book_id)
+    result = await db.execute(
+        query.returning(
+            ManifestStats.book_id,
+            ManifestStats.version,
+            ManifestStats.total_pages,
+            ManifestStats.total_units,
+            ManifestStats.total_segments,
+        ).execution_options(synchronize_session=False)
+    )
+    for row_book_id, *totals in result.all():
+        await db.execute(
+            update(ManifestStats)
+            .where(ManifestStats.book_id == row_book_id)
+            .values(etag=manifest_etag(*totals))
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def count_published_mappings(
+    db: AsyncSession,
+    unit_ids: Iterable[int] = (),
+    page_id: Optional[int] = None,
+    segment_id: Optional[int] = None,
+) -> int:
+    """Published mappings that will disappear with the given units or segment.
+
+    Deleting units or segments cascades to their mappings, so callers count
+    them before the delete and pass the result to ``adjust_manifest_stats``.
+    ``page_id`` restricts ``unit_ids`` to units that actually live on the page.
+    """
+    query = select(func.count(UnitSegmentMapping.id)).where(
+        UnitSegmentMapping.is_published == True
+    )
+    unit_ids = list(unit_ids)
+    if unit_ids:
+        query = query.where(UnitSegmentMapping.text_unit_id.in_(unit_ids))
+        if page_id is not None:
+            query = query.join(TextUnit, TextUnit.id == UnitSegmentMapping.text_unit_id).where(
+                TextUnit.page_id == page_id
+            )
+    elif segment_id is not None:
+        query = query.where(UnitSegmentMapping.audio_segment_id == segment_id)
+    else:
+        return 0
+    return await db.scalar(query) or 0
@@ -0,0 +1,157 @@
+"""MP3 frame index: map segment times to frame-aligned byte ranges.
+
+Virtual segments (``AUDIO_VIRTUAL_SEGMENTS``) are not cut into files; each
+``AudioSegment`` stores ``byte_start``/``byte_end`` into the normalized MP3
+of its audio file instead. Layer III frames are only self-contained when
+the encoder's bit reservoir is off (a frame may otherwise start its data in
+earlier frames), so the normalized MP3 is written with ``-reservoir 0``;
+then a byte slice made of whole frames is a valid MP3 stream on its own.
+The first frame of a slice still lacks the previous frame's MDCT overlap,
+which decoders render as a short (one granule, ~13 ms) fade-in.
+Files normalized before the reservoir was disabled should be reprocessed.
+
+The index is the byte offset of every audio frame, found by walking the
+frame headers (an ID3v2 tag and a Xing/Info frame at the start are
+skipped). Boundaries are rounded outwards to whole frames: 26 ms at
+44.1 kHz for MPEG-1 Layer III, which is what ``normalize_audio`` writes.
+"""
+
+import logging
+from array import array
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger("muallimi")
+
+# kbps by bitrate index, Layer III
+_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+# version bits -> sample rates by index (1 is reserved)
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+
+@dataclass
+class FrameIndex:
+    sample_rate: int
+    samples_per_frame: int
+    # byte offset of every audio frame, in order
+    offsets: array
+    # end of the last frame (exclusive)
+    data_end: int
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def duration_ms(self) -> int:
+        return self.frame_count * self.samples_per_frame * 1000 // self.sample_rate
+
+    def byte_range(self, start_ms: int, end_ms: int) -> Tuple[int, int]:
+        """``(byte_start, byte_end)`` of the whole frames covering ``[start_ms, end_ms)``.
+
+        ``byte_end`` is exclusive.
+        """
+        frame_ms = self.samples_per_frame * 1000 / self.sample_rate
+        first = max(0, min(int(start_ms / frame_ms), self.frame_count - 1))
+        last = max(first + 1, min(-int(-end_ms // frame_ms), self.frame_count))
+        byte_end = self.offsets[last] if last < self.frame_count else self.data_end
+        return self.offsets[first], byte_end
+
+
+def _parse_header(data: bytes, pos: int) -> Optional[Tuple[int, int, int]]:
+    """``(frame_length, sample_rate, samples_per_frame)`` of a Layer III header at ``pos``."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2 = data[pos + 1], data[pos + 2]
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    if version == 3:
+        bitrate = _BITRATES_V1[bitrate_index] * 1000
+        return 144 * bitrate // sample_rate + padding, sample_rate, 1152
+    bitrate = _BITRATES_V2[bitrate_index] * 1000
+    return 72 * bitrate // sample_rate + padding, sample_rate, 576
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _find_first_frame(data: bytes, pos: int) -> Optional[int]:
+    """First offset from ``pos`` holding two consecutive valid headers."""
+    while True:
+        pos = data.find(b"\xff", pos)
+        if pos < 0:
+            return None
+        header = _parse_header(data, pos)
+        if header and _parse_header(data, pos + header[0]):
+            return pos
+        pos += 1
+
+
+def _is_info_frame(data: bytes, pos: int, length: int) -> bool:
+    """LAME/Xing header frame: carries stream info, not audio."""
+    frame = data[pos:pos + min(length, 64)]
+    return b"Xing" in frame or b"Info" in frame
+
+
+def index_frames(data: bytes) -> Optional[FrameIndex]:
+    """Frame index of an in-memory MP3, or None if no MPEG Layer III stream is found."""
+    pos = _find_first_frame(data, _skip_id3v2(data))
+    if pos is None:
+        return None
+
+    first = _parse_header(data, pos)
+    sample_rate, samples_per_frame = first[1], first[2]
+    if _is_info_frame(data, pos, first[0]):
+        pos += first[0]
+
+    offsets = array("Q")
+    while True:
+        header = _parse_header(data, pos)
+        if header is None or header[1] != sample_rate or pos + header[0] > len(data):
+            # ID3v1 tag, trailing garbage or a truncated last frame
+            break
+        offsets.append(pos)
+        pos += header[0]
+
+    if not offsets:
+        return None
+    return FrameIndex(
+        sample_rate=sample_rate,
+        samples_per_frame=samples_per_frame,
+        offsets=offsets,
+        data_end=pos,
+    )
+
+
+def build_frame_index(file_path: str) -> Optional[FrameIndex]:
+    """Frame index of an MP3 file, or None if it cannot be indexed."""
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.error(f"Frame index error: {e}")
+        return None
+    index = index_frames(data)
+    if index is None:
+        logger.warning(f"No MPEG Layer III frames found in {file_path}")
+    return index
@@ -0,0 +1,137 @@
+"""Content-addressed on-disk cache of raw OCR output.
+
+Raw OCR (word boxes and confidences, before line grouping and unit
+classification) depends only on the image pixels, the engine and its
+configuration, so it is stored under a key derived from the image SHA-256
+and those settings. Re-uploading the same image or re-running analysis
+then only redoes the cheap post-processing in app/services/image_analyzer.py.
+
+Entries are zlib-compressed JSON files (``<key[:2]>/<key>.json.z``) in
+``OCR_CACHE_DIR``, shared by the API and the workers through the media
+volume. The store is bounded to ``OCR_CACHE_MAX_MB``: reads refresh an
+entry's mtime and writes evict the least recently used entries beyond the
+bound. Each process keeps a running estimate of the store size and only
+scans the directory when the estimate goes over the bound, or every
+``RESCAN_EVERY`` writes to pick up what other processes wrote. Any I/O
+problem is treated as a miss, never as an error.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from typing import Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+_SUFFIX = ".json.z"
+# Writes between full scans of the store, even if the estimate stays below the bound
+RESCAN_EVERY = 256
+# Eviction trims the store to this share of the bound, leaving room for new writes
+EVICT_TO = 0.9
+
+
+def cache_key(image_sha256: str, engine: str, config: str) -> str:
+    """Key of one OCR run: image content plus everything that changes the engine output."""
+    return hashlib.sha256(f"{image_sha256}\0{engine}\0{config}".encode()).hexdigest()
+
+
+class OcrCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Estimated store size (None: not scanned yet) and writes since the last scan
+        self._size: Optional[int] = None
+        self._puts = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _SUFFIX)
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = json.loads(zlib.decompress(f.read()))
+            os.utime(path)  # LRU: mtime is the last access
+            return value
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def put(self, key: str, value: dict) -> None:
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        data = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode(), 6)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"OCR cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._puts += 1
+            if self._size is not None:
+                self._size += len(data)
+            scan = self._size is None or self._size > self.max_bytes or self._puts >= RESCAN_EVERY
+        if scan:
+            self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries once the store is over the bound; returns how many.
+
+        Entries are removed until the store is down to ``EVICT_TO`` of the bound.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _dirs, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith(_SUFFIX):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+            self._puts = 0
+            if total <= self.max_bytes:
+                self._size = total
+                return 0
+
+            removed = 0
+            for _mtime, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+            self._size = total
+            logger.info(f"OCR cache: evicted {removed} entries")
+            return removed
+
+
+_cache: Optional[OcrCache] = None
+
+
+def get_ocr_cache() -> OcrCache:
+    global _cache
+    if _cache is None:
+        directory = settings.OCR_CACHE_DIR or os.path.join(settings.MEDIA_DIR, "cache", "ocr")
+        _cache = OcrCache(directory, settings.OCR_CACHE_MAX_MB * 1024 * 1024)
+    return _cache
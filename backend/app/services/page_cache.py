@@ -0,0 +1,112 @@
+"""Materialized public page payloads.
+
+The JSON served by ``GET /book/pages/{page_number}`` only changes when admins
+edit content, so it is stored fully serialized and keyed by
+``(book_id, manifest_version, content revision, page_number)``:
+
+    in-process LRU  →  Redis  →  build_page_payload (ORM)
+
+Admin writes bump the content revision after their transaction commits
+(``invalidate_page_cache``), which retires every old key at once; stale
+entries simply age out of the LRU and expire from Redis.
+"""
+
+import json
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import cache_get, cache_set, get_content_revision, bump_content_revision
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.book import Book
+from app.services.page_payload import build_page_payload
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+_lru: "OrderedDict[str, bytes]" = OrderedDict()
+
+
+def dump_payload(payload: dict) -> bytes:
+    """Serialize exactly like FastAPI's JSONResponse."""
+    return json.dumps(
+        payload,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def page_cache_key(book_id: int, manifest_version: int, revision: str, page_number: int) -> str:
+    return f"page_payload:{book_id}:{manifest_version}:{revision}:{page_number}"
+
+
+def _lru_get(key: str) -> Optional[bytes]:
+    data = _lru.get(key)
+    if data is not None:
+        _lru.move_to_end(key)
+    return data
+
+
+def _lru_put(key: str, data: bytes) -> None:
+    _lru[key] = data
+    _lru.move_to_end(key)
+    while len(_lru) > settings.PAGE_CACHE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+async def get_page_json(
+    db: AsyncSession, book: Book, page_number: int, revision: Optional[str],
+) -> Optional[bytes]:
+    """Serialized page payload, or None if the page does not exist.
+
+    ``revision`` is the current content revision (``get_content_revision``),
+    read by the caller so one request does not fetch it twice. Without Redis
+    (None) there is no shared revision to validate against, so the payload
+    is rebuilt on every call rather than risk serving stale bytes.
+    """
+    if revision is None:
+        payload = await build_page_payload(db, book.id, page_number)
+        return dump_payload(payload) if payload is not None else None
+
+    key = page_cache_key(book.id, book.manifest_version, revision, page_number)
+    data = _lru_get(key)
+    if data is not None:
+        return data
+
+    data = await cache_get(key)
+    if data is None:
+        payload = await build_page_payload(db, book.id, page_number)
+        if payload is None:
+            return None
+        data = dump_payload(payload)
+        await cache_set(key, data, settings.PAGE_CACHE_TTL_SECONDS)
+
+    _lru_put(key, data)
+    return data
+
+
+async def invalidate_page_cache() -> None:
+    """Retire all cached page payloads. Run after the admin transaction commits."""
+    _lru.clear()
+    await bump_content_revision()
+
+
+async def warm_page_cache(page_number: int) -> None:
+    """Invalidate, then rebuild and store one page (used right after publish)."""
+    await invalidate_page_cache()
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Book).where(Book.is_published == True).limit(1)
+            )
+            book = result.scalar_one_or_none()
+            if book:
+                await get_page_json(db, book, page_number, await get_content_revision())
+    except Exception as e:
+        logger.warning(f"Page cache warm-up failed for page {page_number}: {e}")
@@ -0,0 +1,224 @@
+"""Public page payload assembly.
+
+Builds the JSON-ready dict served by ``GET /book/pages/{page_number}`` with a
+fixed number of set-based queries, independent of how many text units the
+page has:
+
+1. page row
+2. text units
+3. sections
+4. published unit → segment mappings (joined with segment files / byte ranges)
+5. ready audio files covering the page
+
+The assembly itself is synchronous (``assemble_page_payload``) so Celery
+tasks can reuse it with a plain ``Session``; API code awaits
+``build_page_payload``, which runs it through ``AsyncSession.run_sync``.
+"""
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.audio import AudioFile, AudioSegment, AudioStatus, UnitSegmentMapping
+from app.models.book import Page, TextUnit
+from app.models.section import Section
+from app.services.image_variants import variants_payload
+
+settings = get_settings()
+
+
+def _enum_value(value):
+    return value.value if hasattr(value, "value") else value
+
+
+def _media_url(path: Optional[str]) -> Optional[str]:
+    return f"{settings.MEDIA_BASE_URL}/{path}" if path else None
+
+
+def segment_url(segment_id: int, file_path: Optional[str], byte_start: Optional[int]) -> Optional[str]:
+    """Playable URL of a segment: its cut file, or the byte-range endpoint if virtual."""
+    if file_path:
+        return _media_url(file_path)
+    if byte_start is not None:
+        return f"{settings.SEGMENT_URL_BASE}/{segment_id}"
+    return None
+
+
+def load_unit_audio(db: Session, page_id: int) -> Dict[int, dict]:
+    """Return ``{text_unit_id: segment info}`` for published mappings of a page.
+
+    One query for the whole page. When a unit has several published mappings
+    the oldest one wins. Virtual segments (no cut file) also carry their
+    frame-aligned byte range into the normalized source.
+    """
+    result = db.execute(
+        select(
+            UnitSegmentMapping.text_unit_id,
+            AudioSegment.id,
+            AudioSegment.file_path,
+            AudioSegment.start_ms,
+            AudioSegment.end_ms,
+            AudioSegment.byte_start,
+            AudioSegment.byte_end,
+            func.coalesce(AudioFile.normalized_path, AudioFile.file_path),
+        )
+        .join(AudioSegment, AudioSegment.id == UnitSegmentMapping.audio_segment_id)
+        .join(AudioFile, AudioFile.id == AudioSegment.audio_file_id)
+        .join(TextUnit, TextUnit.id == UnitSegmentMapping.text_unit_id)
+        .where(
+            TextUnit.page_id == page_id,
+            UnitSegmentMapping.is_published == True,
+        )
+        .order_by(UnitSegmentMapping.id)
+    )
+    audio: Dict[int, dict] = {}
+    for unit_id, seg_id, file_path, start_ms, end_ms, byte_start, byte_end, source in result.all():
+        if unit_id in audio:
+            continue
+        virtual = not file_path and byte_start is not None
+        audio[unit_id] = {
+            "url": segment_url(seg_id, file_path, byte_start),
+            "range": {
+                "source_url": _media_url(source),
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "byte_start": byte_start,
+                "byte_end": byte_end,
+            } if virtual else None,
+        }
+    return audio
+
+
+def load_audio_urls(db: Session, page_ids: Iterable[int]) -> Dict[int, str]:
+    """Return ``{text_unit_id: segment URL}`` for published mappings of many pages.
+
+    One query; as in ``load_unit_audio``, the oldest mapping of a unit wins
+    and units whose segment is not playable are left out.
+    """
+    page_ids = list(page_ids)
+    if not page_ids:
+        return {}
+    result = db.execute(
+        select(
+            UnitSegmentMapping.text_unit_id,
+            AudioSegment.id,
+            AudioSegment.file_path,
+            AudioSegment.byte_start,
+        )
+        .join(AudioSegment, AudioSegment.id == UnitSegmentMapping.audio_segment_id)
+        .join(TextUnit, TextUnit.id == UnitSegmentMapping.text_unit_id)
+        .where(
+            TextUnit.page_id.in_(page_ids),
+            UnitSegmentMapping.is_published == True,
+        )
+        .order_by(UnitSegmentMapping.id)
+    )
+    urls: Dict[int, str] = {}
+    seen = set()
+    for unit_id, seg_id, file_path, byte_start in result.all():
+        if unit_id in seen:
+            continue
+        seen.add(unit_id)
+        url = segment_url(seg_id, file_path, byte_start)
+        if url:
+            urls[unit_id] = url
+    return urls
+
+
+async def build_page_payload(db: AsyncSession, book_id: int, page_number: int) -> Optional[dict]:
+    """Assemble the public payload of a page, or ``None`` if the page does not exist."""
+    return await db.run_sync(assemble_page_payload, book_id, page_number)
+
+
+def assemble_page_payload(db: Session, book_id: int, page_number: int) -> Optional[dict]:
+    """Synchronous core of ``build_page_payload``."""
+    result = db.execute(
+        select(Page).where(Page.book_id == book_id, Page.page_number == page_number)
+    )
+    page = result.scalar_one_or_none()
+    if not page:
+        return None
+
+    units_result = db.execute(
+        select(TextUnit)
+        .where(TextUnit.page_id == page.id)
+        .order_by(TextUnit.sort_order, TextUnit.id)
+    )
+    text_units = units_result.scalars().all()
+
+    sections_result = db.execute(
+        select(Section)
+        .where(Section.page_id == page.id)
+        .order_by(Section.sort_order, Section.id)
+    )
+    page_sections = sections_result.scalars().all()
+
+    unit_audio = load_unit_audio(db, page.id)
+
+    # Sahifaga tegishli audio fayllarni topish
+    audio_result = db.execute(
+        select(AudioFile.file_path)
+        .where(
+            AudioFile.book_id == book_id,
+            AudioFile.page_start <= page_number,
+            AudioFile.page_end >= page_number,
+            AudioFile.status == AudioStatus.READY,
+        )
+        .order_by(AudioFile.id)
+    )
+    audio_urls = [_media_url(path) for path in audio_result.scalars().all() if path]
+
+    units = [
+        {
+            "id": unit.id,
+            "unit_type": _enum_value(unit.unit_type),
+            "text_content": unit.text_content,
+            "bbox_x": unit.bbox_x,
+            "bbox_y": unit.bbox_y,
+            "bbox_w": unit.bbox_w,
+            "bbox_h": unit.bbox_h,
+            "sort_order": unit.sort_order,
+            "is_manual": unit.is_manual,
+            "audio_segment_url": unit_audio.get(unit.id, {}).get("url"),
+            "audio_segment_range": unit_audio.get(unit.id, {}).get("range"),
+            "metadata": unit.metadata_ or {},
+        }
+        for unit in text_units
+    ]
+
+    sections = [
+        {
+            "id": sec.id,
+            "section_type": _enum_value(sec.section_type),
+            "target_letter": sec.target_letter,
+            "title_ar": sec.title_ar,
+            "title_uz": sec.title_uz,
+            "sort_order": sec.sort_order,
+            "unit_ids": sec.unit_ids or [],
+            "bbox_y_start": sec.bbox_y_start,
+            "bbox_y_end": sec.bbox_y_end,
+            "is_manual": sec.is_manual,
+        }
+        for sec in page_sections
+    ]
+
+    return {
+        "id": page.id,
+        "page_number": page.page_number,
+        "layout_type": getattr(page, 'layout_type', 'pdf') or 'pdf',
+        "image_url": _media_url(page.image_path),
+        "image_2x_url": _media_url(page.image_2x_path),
+        "image_width": page.image_width,
+        "image_height": page.image_height,
+        "image_variants": variants_payload(page.image_variants),
+        "has_text_data": page.has_text_data,
+        "is_annotated": page.is_annotated,
+        "text_units": units,
+        "sections": sections,
+        # Birinchi audio URL (asosiy)
+        "audio_url": audio_urls[0] if audio_urls else None,
+        "audio_urls": audio_urls,
+    }
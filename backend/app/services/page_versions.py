@@ -0,0 +1,345 @@
+"""Delta-encoded page version history.
+
+Every publish records a ``PageVersion`` of the page's text units. Units are
+keyed by their ID, which stays stable across edits, so a version is stored
+either as
+
+  - ``full``: ``[unit, ...]``, each unit with its ``id`` and fields, or
+  - ``delta``: ``{"set": [...], "delete": [ids]}`` against the previous
+    version, where ``set`` holds new units in full and, for changed units,
+    the ``id`` plus the changed fields only.
+
+A version is materialized from the latest ``full`` at or below it plus the
+deltas after it. A full snapshot is written instead of a delta for the first
+version, after ``PAGE_VERSION_FULL_EVERY`` versions in a chain, or when the
+delta would not be smaller. Snapshots written before deltas existed are
+lists without unit IDs; they still load as ``full``.
+
+Rollback applies the difference between the current units and the target
+version in place: unchanged units are untouched, changed ones are updated,
+missing ones re-inserted under their old IDs, so ``Section.unit_ids`` and
+audio mappings of surviving units stay valid.
+
+``compact_page_versions`` keeps the newest ``PAGE_VERSIONS_KEEP`` versions
+of a page, rewriting the oldest kept one as ``full``.
+
+``record_page_versions`` records many pages at once (batch publish) with a
+fixed number of statements.
+
+Synchronous so Celery tasks can reuse it; API code runs it through
+``AsyncSession.run_sync``.
+"""
+
+import json
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.book import PageVersion, TextUnit, UnitType
+
+settings = get_settings()
+
+FULL = "full"
+DELTA = "delta"
+
+SNAPSHOT_FIELDS = (
+    "unit_type", "text_content", "bbox_x", "bbox_y", "bbox_w", "bbox_h",
+    "sort_order", "is_manual", "confidence", "metadata",
+)
+
+
+def unit_state(unit: TextUnit) -> dict:
+    """Snapshot form of a text unit."""
+    return {
+        "id": unit.id,
+        "unit_type": unit.unit_type.value if hasattr(unit.unit_type, "value") else str(unit.unit_type),
+        "text_content": unit.text_content,
+        "bbox_x": unit.bbox_x,
+        "bbox_y": unit.bbox_y,
+        "bbox_w": unit.bbox_w,
+        "bbox_h": unit.bbox_h,
+        "sort_order": unit.sort_order,
+        "is_manual": unit.is_manual,
+        "confidence": unit.confidence,
+        "metadata": unit.metadata_,
+    }
+
+
+def _state_from_full(snapshot: List[dict]) -> Dict[object, dict]:
+    # Legacy entries have no ID; key them so they survive delta application
+    return {u.get("id") or ("legacy", i): dict(u) for i, u in enumerate(snapshot)}
+
+
+def _apply_delta(state: Dict[object, dict], delta: dict) -> None:
+    for unit_id in delta.get("delete", []):
+        state.pop(unit_id, None)
+    for change in delta.get("set", []):
+        state.setdefault(change["id"], {}).update(change)
+
+
+def diff_states(previous: Dict[object, dict], current: Dict[int, dict]) -> dict:
+    """Delta turning ``previous`` into ``current`` (both keyed by unit ID)."""
+    changes = []
+    for unit_id, unit in current.items():
+        before = previous.get(unit_id)
+        if before is None:
+            changes.append(unit)
+            continue
+        changed = {k: v for k, v in unit.items() if k != "id" and before.get(k) != v}
+        if changed:
+            changes.append({"id": unit_id, **changed})
+    deleted = [unit_id for unit_id in previous if unit_id not in current]
+    return {"set": changes, "delete": deleted}
+
+
+def _ordered(state: Dict[object, dict]) -> List[dict]:
+    return sorted(state.values(), key=lambda u: (u.get("sort_order") or 0, u.get("id") or 0))
+
+
+def _load_chain(db: Session, page_id: int, version: int):
+    """Rows from the latest full version at or below ``version`` up to it (ascending)."""
+    base = db.execute(
+        select(func.max(PageVersion.version)).where(
+            PageVersion.page_id == page_id,
+            PageVersion.kind == FULL,
+            PageVersion.version <= version,
+        )
+    ).scalar()
+    if base is None:
+        return []
+    return db.execute(
+        select(PageVersion.version, PageVersion.kind, PageVersion.snapshot)
+        .where(
+            PageVersion.page_id == page_id,
+            PageVersion.version >= base,
+            PageVersion.version <= version,
+        )
+        .order_by(PageVersion.version)
+    ).all()
+
+
+def _state_from_chain(chain) -> Dict[object, dict]:
+    state = _state_from_full(chain[0].snapshot or [])
+    for row in chain[1:]:
+        _apply_delta(state, row.snapshot or {})
+    return state
+
+
+def _materialize_state(db: Session, page_id: int, version: int) -> Optional[Dict[object, dict]]:
+    chain = _load_chain(db, page_id, version)
+    if not chain or chain[-1].version != version:
+        return None
+    return _state_from_chain(chain)
+
+
+def materialize_version(db: Session, page_id: int, version: int) -> Optional[List[dict]]:
+    """Units of a page at ``version`` in reading order, or None if it does not exist."""
+    state = _materialize_state(db, page_id, version)
+    return None if state is None else _ordered(state)
+
+
+def _load_latest_chains(db: Session, page_ids: Sequence[int]) -> Dict[int, list]:
+    """Per page, the rows from its latest full version to its newest version (ascending)."""
+    bases = (
+        select(PageVersion.page_id, func.max(PageVersion.version).label("base"))
+        .where(PageVersion.page_id.in_(page_ids), PageVersion.kind == FULL)
+        .group_by(PageVersion.page_id)
+        .subquery()
+    )
+    chains: Dict[int, list] = {}
+    rows = db.execute(
+        select(PageVersion.page_id, PageVersion.version, PageVersion.kind, PageVersion.snapshot)
+        .join(bases, and_(bases.c.page_id == PageVersion.page_id, PageVersion.version >= bases.c.base))
+        .order_by(PageVersion.page_id, PageVersion.version)
+    )
+    for row in rows:
+        chains.setdefault(row.page_id, []).append(row)
+    return chains
+
+
+def record_page_versions(
+    db: Session,
+    page_ids: Sequence[int],
+    qa_reports: Optional[Dict[int, dict]] = None,
+    published_by: Optional[int] = None,
+) -> Dict[int, int]:
+    """Store the current units of each page as its next version (no commit).
+
+    Uses a fixed number of statements for any number of pages. Returns
+    ``{page_id: version}``.
+    """
+    page_ids = list(page_ids)
+    if not page_ids:
+        return {}
+    qa_reports = qa_reports or {}
+
+    current: Dict[int, Dict[int, dict]] = {page_id: {} for page_id in page_ids}
+    units = db.execute(
+        select(TextUnit)
+        .where(TextUnit.page_id.in_(page_ids))
+        .order_by(TextUnit.page_id, TextUnit.sort_order, TextUnit.id)
+    ).scalars()
+    for unit in units:
+        current[unit.page_id][unit.id] = unit_state(unit)
+
+    previous = dict(db.execute(
+        select(PageVersion.page_id, func.max(PageVersion.version))
+        .where(PageVersion.page_id.in_(page_ids))
+        .group_by(PageVersion.page_id)
+    ).all())
+    chains = _load_latest_chains(db, [p for p in page_ids if p in previous]) if previous else {}
+
+    rows = []
+    versions = {}
+    for page_id in page_ids:
+        page_units = current[page_id]
+        full_snapshot = list(page_units.values())
+        kind, snapshot = FULL, full_snapshot
+
+        chain = chains.get(page_id)
+        usable = (
+            chain
+            and len(chain) < settings.PAGE_VERSION_FULL_EVERY
+            and all("id" in u for u in chain[0].snapshot or [])  # legacy bases have no IDs
+        )
+        if usable:
+            delta = diff_states(_state_from_chain(chain), page_units)
+            if len(json.dumps(delta)) < len(json.dumps(full_snapshot)):
+                kind, snapshot = DELTA, delta
+
+        versions[page_id] = previous.get(page_id, 0) + 1
+        rows.append({
+            "page_id": page_id,
+            "version": versions[page_id],
+            "kind": kind,
+            "snapshot": snapshot,
+            "unit_count": len(page_units),
+            "qa_report": qa_reports.get(page_id),
+            "published_by": published_by,
+        })
+
+    db.execute(insert(PageVersion), rows)
+    return versions
+
+
+def record_page_version(
+    db: Session,
+    page_id: int,
+    qa_report: Optional[dict] = None,
+    published_by: Optional[int] = None,
+) -> int:
+    """Store the page's current units as its next version (no commit); returns the version number."""
+    return record_page_versions(db, [page_id], {page_id: qa_report}, published_by)[page_id]
+
+
+def rollback_page_units(db: Session, page_id: int, version: int) -> Optional[dict]:
+    """Make the page's units equal to ``version`` in place (no commit).
+
+    Returns ``unit_count``, ``updated``, ``inserted`` and ``deleted``, or
+    None if the version does not exist. Units of legacy snapshots (no IDs)
+    are inserted as new units.
+    """
+    target = materialize_version(db, page_id, version)
+    if target is None:
+        return None
+
+    current = {
+        u.id: unit_state(u)
+        for u in db.execute(select(TextUnit).where(TextUnit.page_id == page_id)).scalars()
+    }
+    target_ids = {u["id"] for u in target if u.get("id") is not None}
+
+    # Missing units come back under their old ID unless it was reused elsewhere
+    restore_ids = [u["id"] for u in target if u.get("id") is not None and u["id"] not in current]
+    taken = set(db.execute(
+        select(TextUnit.id).where(TextUnit.id.in_(restore_ids))
+    ).scalars()) if restore_ids else set()
+
+    def row(u: dict) -> dict:
+        try:
+            unit_type = UnitType(u.get("unit_type", "letter"))
+        except ValueError:
+            unit_type = UnitType.LETTER
+        return {
+            "page_id": page_id,
+            "unit_type": unit_type,
+            "text_content": u.get("text_content", ""),
+            "bbox_x": u.get("bbox_x", 0),
+            "bbox_y": u.get("bbox_y", 0),
+            "bbox_w": u.get("bbox_w", 0),
+            "bbox_h": u.get("bbox_h", 0),
+            "sort_order": u.get("sort_order", 0),
+            "is_manual": u.get("is_manual", False),
+            "confidence": u.get("confidence"),
+            "metadata_": u.get("metadata"),
+        }
+
+    updates, inserts = [], []
+    for u in target:
+        unit_id = u.get("id")
+        if unit_id in current:
+            before = current[unit_id]
+            if any(before.get(f) != u.get(f) for f in SNAPSHOT_FIELDS):
+                updates.append({"id": unit_id, **row(u)})
+        elif unit_id is not None and unit_id not in taken:
+            inserts.append({"id": unit_id, **row(u)})
+        else:
+            inserts.append(row(u))
+
+    stale = [unit_id for unit_id in current if unit_id not in target_ids]
+    if stale:
+        db.execute(delete(TextUnit).where(TextUnit.id.in_(stale)))
+    if updates:
+        db.execute(update(TextUnit), updates)
+    # With and without explicit IDs: separate statements, same column set each
+    with_id = [r for r in inserts if "id" in r]
+    without_id = [r for r in inserts if "id" not in r]
+    for rows in (with_id, without_id):
+        if rows:
+            db.execute(insert(TextUnit), rows)
+
+    return {
+        "unit_count": len(target),
+        "updated": len(updates),
+        "inserted": len(inserts),
+        "deleted": len(stale),
+    }
+
+
+def compact_page_versions(db: Session, page_id: int, keep: Optional[int] = None) -> int:
+    """Drop all but the newest ``keep`` versions of a page (no commit); returns how many were removed.
+
+    ``keep`` defaults to ``PAGE_VERSIONS_KEEP``; 0 keeps everything.
+    """
+    keep = settings.PAGE_VERSIONS_KEEP if keep is None else keep
+    if keep <= 0:
+        return 0
+    versions = db.execute(
+        select(PageVersion.id, PageVersion.version, PageVersion.kind)
+        .where(PageVersion.page_id == page_id)
+        .order_by(PageVersion.version.desc())
+    ).all()
+    if len(versions) <= keep:
+        return 0
+
+    oldest_kept = versions[keep - 1]
+    if oldest_kept.kind != FULL:
+        # Rebase: the oldest kept version becomes the chain's full snapshot
+        state = _materialize_state(db, page_id, oldest_kept.version)
+        if state is None:
+            return 0
+        db.execute(
+            update(PageVersion)
+            .where(PageVersion.id == oldest_kept.id)
+            .values(kind=FULL, snapshot=_ordered(state))
+        )
+
+    result = db.execute(
+        delete(PageVersion).where(
+            PageVersion.page_id == page_id,
+            PageVersion.version < oldest_kept.version,
+        )
+    )
+    return result.rowcount
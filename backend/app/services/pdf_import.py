@@ -2,7 +2,8 @@
 
 import os
 import logging
-from typing import List, Tuple, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Iterator, List, Optional
 
 from app.config import get_settings
 
@@ -10,28 +11,36 @@ logger = logging.getLogger("muallimi")
 settings = get_settings()
 
 
-def render_pdf_pages(pdf_path: str, output_dir: str, dpi: int = 300) -> List[dict]:
-    """
-    Render each PDF page to an image file.
-    Returns list of dicts with page_number, image_path, width, height.
+def pdf_page_count(pdf_path: str) -> int:
+    """Number of pages, from poppler's pdfinfo (nothing is rendered)."""
+    from pdf2image import pdfinfo_from_path
+
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def render_pdf_page_range(
+    pdf_path: str,
+    output_dir: str,
+    first_page: int,
+    last_page: int,
+    dpi: int = 300,
+) -> List[dict]:
+    """Render pages ``first_page..last_page`` (inclusive) to WEBP files.
+
+    Only this range is held in memory; each bitmap is released once saved.
     """
     from pdf2image import convert_from_path
 
-    os.makedirs(output_dir, exist_ok=True)
-
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
     pages_info = []
-    images = convert_from_path(pdf_path, dpi=dpi)
-
-    for i, img in enumerate(images, start=1):
+    for i, img in enumerate(images, start=first_page):
         # Save standard resolution
         filename = f"page_{i:03d}.webp"
-        filepath = os.path.join(output_dir, filename)
-        img.save(filepath, "WEBP", quality=90)
+        img.save(os.path.join(output_dir, filename), "WEBP", quality=90)
 
         # Save 2x resolution (already at high DPI)
         filename_2x = f"page_{i:03d}_2x.webp"
-        filepath_2x = os.path.join(output_dir, filename_2x)
-        img.save(filepath_2x, "WEBP", quality=95)
+        img.save(os.path.join(output_dir, filename_2x), "WEBP", quality=95)
 
         pages_info.append({
             "page_number": i,
@@ -40,64 +49,135 @@ def render_pdf_pages(pdf_path: str, output_dir: str, dpi: int = 300) -> List[dic
             "width": img.width,
             "height": img.height,
         })
+        img.close()
+    images.clear()
+    return pages_info
+
+
+def iter_render_pdf_pages(
+    pdf_path: str,
+    output_dir: str,
+    dpi: int = 300,
+    page_count: Optional[int] = None,
+    chunk_pages: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Iterator[dict]:
+    """Render a PDF in page ranges on a thread pool, yielding page infos as ranges finish.
+
+    poppler (``pdftoppm``) does the rasterizing in its own processes, so
+    threads are enough to use several cores, and they also work inside
+    Celery's daemonic prefork children. At most ``workers`` ranges of
+    ``chunk_pages`` pages are in flight, which bounds memory regardless of
+    the document length.
+    """
+    chunk_pages = chunk_pages or settings.PDF_RENDER_CHUNK_PAGES
+    workers = workers or settings.PDF_RENDER_WORKERS
+    page_count = page_count or pdf_page_count(pdf_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    ranges = [
+        (first, min(first + chunk_pages - 1, page_count))
+        for first in range(1, page_count + 1, chunk_pages)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for first, last in ranges:
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            pending.add(pool.submit(render_pdf_page_range, pdf_path, output_dir, first, last, dpi))
+        for future in as_completed(pending):
+            yield from future.result()
 
-        logger.info(f"Rendered page {i}/{len(images)}")
 
+def render_pdf_pages(pdf_path: str, output_dir: str, dpi: int = 300) -> List[dict]:
+    """
+    Render each PDF page to an image file.
+    Returns list of dicts with page_number, image_path, width, height.
+    """
+    pages_info = sorted(
+        iter_render_pdf_pages(pdf_path, output_dir, dpi),
+        key=lambda info: info["page_number"],
+    )
+    logger.info(f"Rendered {len(pages_info)} pages")
     return pages_info
 
 
+def extract_page_text_units(page) -> List[dict]:
+    """
+    Extract text with bounding boxes from an open pdfplumber page.
+    Returns list of dicts with text_content, bbox_x, bbox_y, bbox_w, bbox_h (percentages).
+    """
+    units = []
+    page_width = page.width
+    page_height = page.height
+
+    # Extract words with bounding boxes
+    words = page.extract_words(
+        x_tolerance=3,
+        y_tolerance=3,
+        keep_blank_chars=False,
+        use_text_flow=True,
+    )
+
+    for idx, word in enumerate(words):
+        if not word.get("text", "").strip():
+            continue
+
+        # Convert absolute coords to percentages
+        x0 = word["x0"]
+        top = word["top"]
+        x1 = word["x1"]
+        bottom = word["bottom"]
+
+        bbox_x = (x0 / page_width) * 100
+        bbox_y = (top / page_height) * 100
+        bbox_w = ((x1 - x0) / page_width) * 100
+        bbox_h = ((bottom - top) / page_height) * 100
+
+        units.append({
+            "text_content": word["text"],
+            "unit_type": "word",
+            "bbox_x": round(bbox_x, 2),
+            "bbox_y": round(bbox_y, 2),
+            "bbox_w": round(bbox_w, 2),
+            "bbox_h": round(bbox_h, 2),
+            "sort_order": idx,
+        })
+
+    return units
+
+
+def extract_pdf_page_units(pdf, page_number: int) -> List[dict]:
+    """Text units of one page of an already open pdfplumber document.
+
+    The page's parsed objects are released afterwards, so walking a long
+    document keeps memory flat.
+    """
+    if page_number < 1 or page_number > len(pdf.pages):
+        return []
+    page = pdf.pages[page_number - 1]
+    try:
+        return extract_page_text_units(page)
+    except Exception as e:
+        logger.error(f"Text extraction failed for page {page_number}: {e}")
+        return []
+    finally:
+        page.close()
+
+
 def extract_text_units(pdf_path: str, page_number: int) -> List[dict]:
     """
     Extract text with bounding boxes from a PDF page using pdfplumber.
-    Returns list of dicts with text_content, bbox_x, bbox_y, bbox_w, bbox_h (percentages).
+    Opens the document for this one page; use ``extract_pdf_page_units``
+    with a single ``pdfplumber.open`` when walking many pages.
     """
     import pdfplumber
 
-    units = []
-
     try:
         with pdfplumber.open(pdf_path) as pdf:
-            if page_number < 1 or page_number > len(pdf.pages):
-                return []
-
-            page = pdf.pages[page_number - 1]
-            page_width = page.width
-            page_height = page.height
-
-            # Extract words with bounding boxes
-            words = page.extract_words(
-                x_tolerance=3,
-                y_tolerance=3,
-                keep_blank_chars=False,
-                use_text_flow=True,
-            )
-
-            for idx, word in enumerate(words):
-                if not word.get("text", "").strip():
-                    continue
-
-                # Convert absolute coords to percentages
-                x0 = word["x0"]
-                top = word["top"]
-                x1 = word["x1"]
-                bottom = word["bottom"]
-
-                bbox_x = (x0 / page_width) * 100
-                bbox_y = (top / page_height) * 100
-                bbox_w = ((x1 - x0) / page_width) * 100
-                bbox_h = ((bottom - top) / page_height) * 100
-
-                units.append({
-                    "text_content": word["text"],
-                    "unit_type": "word",
-                    "bbox_x": round(bbox_x, 2),
-                    "bbox_y": round(bbox_y, 2),
-                    "bbox_w": round(bbox_w, 2),
-                    "bbox_h": round(bbox_h, 2),
-                    "sort_order": idx,
-                })
-
+            return extract_pdf_page_units(pdf, page_number)
     except Exception as e:
         logger.error(f"Text extraction failed for page {page_number}: {e}")
-
-    return units
+        return []
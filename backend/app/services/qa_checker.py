@@ -5,13 +5,20 @@ Checks: unit count, diacritics, overlaps, duplicates, empty hitboxes, audio cove
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import math
+from itertools import combinations
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 
 from app.services.image_analyzer import has_arabic_diacritics, count_diacritics
 
 logger = logging.getLogger("muallimi")
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
 
 @dataclass
 class QAResult:
@@ -81,36 +88,106 @@ def check_diacritics_presence(units: List[dict]) -> dict:
     }
 
 
-def check_overlaps(units: List[dict]) -> dict:
-    """Check for overlapping bounding boxes."""
+# Overlap share of the smaller box above which two units are reported
+OVERLAP_THRESHOLD = 0.3
+
+# Boxes spanning more grid cells than this are compared with every box instead
+MAX_CELLS_PER_BOX = 64
+
+
+def _bbox(u: dict) -> tuple:
+    return u.get("bbox_x", 0), u.get("bbox_y", 0), u.get("bbox_w", 0), u.get("bbox_h", 0)
+
+
+def _overlap_ratio(b1: tuple, b2: tuple) -> float:
+    """Overlap area of two boxes divided by the smaller box's area."""
+    x1, y1, w1, h1 = b1
+    x2, y2, w2, h2 = b2
+    overlap_x = max(0, min(x1 + w1, x2 + w2) - max(x1, x2))
+    overlap_y = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
+    overlap_area = overlap_x * overlap_y
+
+    area1 = w1 * h1
+    area2 = w2 * h2
+    min_area = min(area1, area2) if min(area1, area2) > 0 else 1
+    return overlap_area / min_area
+
+
+def _candidate_pairs(boxes: List[tuple]) -> List[Tuple[int, int]]:
+    """Index pairs ``(i, j)``, ``i < j``, of boxes that may overlap, in ascending order.
+
+    Only boxes with positive width and height can overlap with positive
+    area. Each is put into the cells of a uniform grid (cell size: median box
+    size) it touches; two boxes that overlap share a cell. Boxes spanning
+    many cells are paired with every box instead.
+    """
+    solid = [
+        i for i, (x, y, w, h) in enumerate(boxes)
+        if w > 0 and h > 0 and math.isfinite(x + y + w + h)
+    ]
+    if len(solid) < 2:
+        return []
+
+    cell_w = sorted(boxes[i][2] for i in solid)[len(solid) // 2]
+    cell_h = sorted(boxes[i][3] for i in solid)[len(solid) // 2]
+
+    grid: Dict[Tuple[int, int], List[int]] = {}
+    large: List[int] = []
+    for i in solid:
+        x, y, w, h = boxes[i]
+        col0, col1 = math.floor(x / cell_w), math.floor((x + w) / cell_w)
+        row0, row1 = math.floor(y / cell_h), math.floor((y + h) / cell_h)
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > MAX_CELLS_PER_BOX:
+            large.append(i)
+            continue
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                grid.setdefault((col, row), []).append(i)
+
+    pairs = set()
+    for members in grid.values():
+        pairs.update(combinations(members, 2))  # members are in index order
+    for i in large:
+        pairs.update((min(i, j), max(i, j)) for j in solid if j != i)
+    return sorted(pairs)
+
+
+def find_overlaps(units: List[dict], threshold: float = OVERLAP_THRESHOLD) -> List[dict]:
+    """All pairs of units whose boxes overlap by more than ``threshold`` of the smaller one.
+
+    Pairs come in the order of a pairwise scan over ``units``. Candidates
+    come from a grid index, so dense pages cost close to linear time; their
+    ratios are computed in one vectorized pass when numpy is available.
+    """
+    boxes = [_bbox(u) for u in units]
+    pairs = _candidate_pairs(boxes)
+    if not pairs:
+        return []
+
+    if np is not None:
+        x, y, w, h = np.array(boxes, dtype=np.float64).T
+        a, b = np.array(pairs, dtype=np.intp).T
+        overlap_x = np.maximum(0, np.minimum(x[a] + w[a], x[b] + w[b]) - np.maximum(x[a], x[b]))
+        overlap_y = np.maximum(0, np.minimum(y[a] + h[a], y[b] + h[b]) - np.maximum(y[a], y[b]))
+        min_area = np.minimum(w[a] * h[a], w[b] * h[b])
+        ratios = overlap_x * overlap_y / np.where(min_area > 0, min_area, 1)
+        pairs = [pairs[k] for k in np.flatnonzero(ratios > threshold)]
+
     overlaps = []
+    for i, j in pairs:
+        ratio = _overlap_ratio(boxes[i], boxes[j])
+        if ratio > threshold:
+            overlaps.append({
+                "unit_a": units[i].get("sort_order", i),
+                "unit_b": units[j].get("sort_order", j),
+                "overlap_ratio": round(ratio, 2),
+            })
+    return overlaps
 
-    for i, u1 in enumerate(units):
-        for j, u2 in enumerate(units):
-            if i >= j:
-                continue
-            # Check if boxes overlap significantly (>30% area)
-            x1, y1, w1, h1 = u1.get("bbox_x", 0), u1.get("bbox_y", 0), u1.get("bbox_w", 0), u1.get("bbox_h", 0)
-            x2, y2, w2, h2 = u2.get("bbox_x", 0), u2.get("bbox_y", 0), u2.get("bbox_w", 0), u2.get("bbox_h", 0)
-
-            # Skip if no bbox set
-            if w1 == 0 or w2 == 0:
-                continue
-
-            overlap_x = max(0, min(x1 + w1, x2 + w2) - max(x1, x2))
-            overlap_y = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
-            overlap_area = overlap_x * overlap_y
-
-            area1 = w1 * h1
-            area2 = w2 * h2
-            min_area = min(area1, area2) if min(area1, area2) > 0 else 1
-
-            if overlap_area / min_area > 0.3:
-                overlaps.append({
-                    "unit_a": u1.get("sort_order", i),
-                    "unit_b": u2.get("sort_order", j),
-                    "overlap_ratio": round(overlap_area / min_area, 2),
-                })
+
+def check_overlaps(units: List[dict]) -> dict:
+    """Check for overlapping bounding boxes (>30% of the smaller box)."""
+    overlaps = find_overlaps(units)
 
     passed = len(overlaps) == 0
     return {
@@ -189,6 +266,27 @@ def check_audio_coverage(units: List[dict]) -> dict:
     }
 
 
+def qa_input(units, audio_urls: Optional[Dict[int, str]] = None) -> List[dict]:
+    """QA input dicts from TextUnit rows.
+
+    ``audio_urls`` maps unit IDs to the segment URL of their published
+    mapping (``page_payload.load_audio_urls``).
+    """
+    audio_urls = audio_urls or {}
+    return [
+        {
+            "text_content": u.text_content,
+            "bbox_x": u.bbox_x,
+            "bbox_y": u.bbox_y,
+            "bbox_w": u.bbox_w,
+            "bbox_h": u.bbox_h,
+            "sort_order": u.sort_order,
+            "audio_segment_url": audio_urls.get(u.id),
+        }
+        for u in units
+    ]
+
+
 def run_qa_checks(units: List[dict]) -> QAResult:
     """Run all QA checks on a page's text units.
 
@@ -0,0 +1,149 @@
+"""Book-wide QA report, computed incrementally.
+
+Runs ``run_qa_checks`` for every page of a book and aggregates the results
+(pass/fail counts, average score, failing checks, audio coverage). Audio
+coverage comes from the published unit → segment mappings, as the reader
+sees them.
+
+Each page's result is cached in ``page_qa_cache`` under a SHA-256 of its QA
+input (units, boxes, audio URLs) plus ``QA_CHECKS_VERSION``, so a refresh
+only recomputes pages whose units or mappings changed; those run in a
+process pool (``run_qa_parallel``). Without ``recompute`` the report is
+built from the cache alone and lists the pages whose cached result is
+stale.
+"""
+
+import hashlib
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.book import Page, PageQACache, TextUnit
+from app.services.batch_publish import run_qa_parallel
+from app.services.page_payload import load_audio_urls
+from app.services.qa_checker import qa_input
+
+# Bump when run_qa_checks changes, so cached results are recomputed
+QA_CHECKS_VERSION = 1
+
+
+def units_hash(units: List[dict]) -> str:
+    """Cache key of a page's QA input."""
+    payload = json.dumps(
+        [QA_CHECKS_VERSION, units], sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def build_qa_report(db: Session, book_id: int, recompute: bool = True, workers: Optional[int] = None) -> dict:
+    """QA report of every page of the book.
+
+    With ``recompute``, pages without a current cached result are checked
+    and the cache is updated (no commit). Otherwise they are only listed
+    in ``stale_page_ids``.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    pages = db.execute(
+        select(Page.id, Page.page_number, Page.analysis_status)
+        .where(Page.book_id == book_id)
+        .order_by(Page.page_number)
+    ).all()
+    page_ids = [p.id for p in pages]
+
+    units_by_page: Dict[int, list] = {page_id: [] for page_id in page_ids}
+    if page_ids:
+        units = db.execute(
+            select(TextUnit)
+            .where(TextUnit.page_id.in_(page_ids))
+            .order_by(TextUnit.page_id, TextUnit.sort_order, TextUnit.id)
+        ).scalars()
+        for unit in units:
+            units_by_page[unit.page_id].append(unit)
+    audio_urls = load_audio_urls(db, page_ids)
+    inputs = {page_id: qa_input(units, audio_urls) for page_id, units in units_by_page.items()}
+    hashes = {page_id: units_hash(units) for page_id, units in inputs.items()}
+
+    cached = {
+        row.page_id: row
+        for row in db.execute(
+            select(PageQACache).where(PageQACache.page_id.in_(page_ids))
+        ).scalars()
+    } if page_ids else {}
+    reports = {
+        page_id: row.report
+        for page_id, row in cached.items()
+        if row.units_hash == hashes[page_id]
+    }
+    stale = [page_id for page_id in page_ids if page_id not in reports]
+    timings["load"] = round((time.perf_counter() - started) * 1000, 1)
+
+    recomputed = 0
+    if recompute and stale:
+        stage = time.perf_counter()
+        fresh = run_qa_parallel({page_id: inputs[page_id] for page_id in stale}, workers)
+        now = datetime.utcnow()
+        rows = [
+            {"page_id": page_id, "units_hash": hashes[page_id], "report": report, "computed_at": now}
+            for page_id, report in fresh.items()
+        ]
+        updates = [r for r in rows if r["page_id"] in cached]
+        inserts = [r for r in rows if r["page_id"] not in cached]
+        if updates:
+            db.execute(update(PageQACache), updates)
+        if inserts:
+            db.execute(insert(PageQACache), inserts)
+        reports.update(fresh)
+        recomputed = len(fresh)
+        stale = []
+        timings["qa"] = round((time.perf_counter() - stage) * 1000, 1)
+
+    page_results = []
+    failing_checks: Dict[str, int] = {}
+    total_units = with_audio = 0
+    for page in pages:
+        report = reports.get(page.id)
+        unit_count = len(inputs[page.id])
+        page_audio = sum(1 for u in inputs[page.id] if u["audio_segment_url"])
+        total_units += unit_count
+        with_audio += page_audio
+
+        failed = [c["name"] for c in report["checks"] if not c["passed"]] if report else []
+        for name in failed:
+            failing_checks[name] = failing_checks.get(name, 0) + 1
+        page_results.append({
+            "page_id": page.id,
+            "page_number": page.page_number,
+            "status": page.analysis_status.value if page.analysis_status else "empty",
+            "passed": report["passed"] if report else None,
+            "score": report["score"] if report else None,
+            "failed_checks": failed,
+            "unit_count": unit_count,
+            "with_audio": page_audio,
+        })
+
+    checked = [r for r in page_results if r["score"] is not None]
+    passed = sum(1 for r in checked if r["passed"])
+    return {
+        "book_id": book_id,
+        "pages": len(pages),
+        "checked": len(checked),
+        "recomputed": recomputed,
+        "stale_page_ids": stale,
+        "passed": passed,
+        "failed": len(checked) - passed,
+        "average_score": round(sum(r["score"] for r in checked) / len(checked), 2) if checked else None,
+        "failing_checks": dict(sorted(failing_checks.items(), key=lambda item: -item[1])),
+        "audio_coverage": {
+            "total_units": total_units,
+            "with_audio": with_audio,
+            "ratio": round(with_audio / total_units, 2) if total_units else 0,
+        },
+        "page_results": page_results,
+        "timings_ms": timings,
+    }
@@ -0,0 +1,145 @@
+"""Native silence detection on a cached energy envelope.
+
+While ``analyze_audio`` streams the decoded 8 kHz PCM (see
+app/services/audio_processor.py), the RMS level of every 10 ms frame is
+collected into an energy envelope and stored next to the waveform pyramid
+(``waveforms/audio_{id}.env``). Silence detection is then a threshold and
+run-length pass over that envelope, so trying other ``silence_threshold`` /
+``min_silence_duration`` values takes milliseconds instead of a decode.
+
+File format (little-endian):
+
+    header   "MSEN", format u16, frame ms u16, frame count u32
+    data     int16 RMS level per frame in hundredths of a dBFS
+
+The envelope is computed and scanned with NumPy.
+"""
+
+import math
+import struct
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+ENVELOPE_MAGIC = b"MSEN"
+ENVELOPE_FORMAT = 1
+ENVELOPE_FRAME_MS = 10
+
+# Level of digital silence (and the floor of every frame)
+FLOOR_DB = -120.0
+
+_HEADER = struct.Struct("<4sHHI")
+
+@dataclass
+class EnergyEnvelope:
+    frame_ms: int
+    # RMS level of each frame in dBFS
+    levels: Sequence[float]
+
+    @property
+    def duration_ms(self) -> int:
+        return len(self.levels) * self.frame_ms
+
+
+class EnvelopeReducer:
+    """Accumulates per-frame RMS levels from successive s16le PCM chunks."""
+
+    def __init__(self, sample_rate: int, frame_ms: int = ENVELOPE_FRAME_MS):
+        self.frame_ms = frame_ms
+        self.frame_samples = max(1, sample_rate * frame_ms // 1000)
+        self._tail = b""
+        self._parts: list = []
+
+    def feed(self, data: bytes, final: bool = False) -> None:
+        data = self._tail + data
+        frame_bytes = self.frame_samples * 2
+        usable = len(data) if final else len(data) - len(data) % frame_bytes
+        usable -= usable % 2
+        self._tail = data[usable:]
+        if usable:
+            self._parts.append(_frame_levels(data[:usable], self.frame_samples))
+
+    def envelope(self) -> EnergyEnvelope:
+        self.feed(b"", final=True)
+        levels = np.concatenate(self._parts) if self._parts else np.zeros(0, dtype=np.float32)
+        return EnergyEnvelope(frame_ms=self.frame_ms, levels=levels)
+
+
+def _frame_levels(chunk: bytes, frame_samples: int):
+    """dBFS RMS of each (possibly short, last) frame of a PCM chunk."""
+    samples = np.frombuffer(chunk, dtype="<i2").astype(np.float64)
+    full = len(samples) - len(samples) % frame_samples
+    power = []
+    if full:
+        power.append((samples[:full].reshape(-1, frame_samples) ** 2).mean(axis=1))
+    if full < len(samples):
+        power.append((samples[full:] ** 2).mean(keepdims=True))
+    power = np.concatenate(power)
+    with np.errstate(divide="ignore"):
+        levels = 10 * np.log10(power / (32768.0 ** 2))
+    return np.maximum(levels, FLOOR_DB).astype(np.float32)
+
+
+def parse_threshold_db(threshold: Union[str, float]) -> float:
+    """Threshold in dBFS from ``"-30dB"`` or an amplitude ratio (``0.03``), as silencedetect accepts."""
+    if isinstance(threshold, str):
+        value = threshold.strip()
+        if value.lower().endswith("db"):
+            return float(value[:-2])
+        threshold = float(value)
+    if threshold <= 0:
+        return FLOOR_DB
+    if threshold < 1:
+        return 20 * math.log10(threshold)
+    return float(threshold)
+
+
+def detect_silences(
+    envelope: EnergyEnvelope,
+    silence_threshold: Union[str, float] = "-30dB",
+    min_silence_duration: float = 0.3,
+) -> List[Tuple[float, float]]:
+    """(start_ms, end_ms) of runs of frames below the threshold lasting at least ``min_silence_duration`` s.
+
+    A silence that runs to the end of the audio is closed at its duration.
+    """
+    threshold_db = parse_threshold_db(silence_threshold)
+    min_frames = max(1, math.ceil(min_silence_duration * 1000 / envelope.frame_ms))
+    frame_ms = envelope.frame_ms
+
+    quiet = np.asarray(envelope.levels) < threshold_db
+    if not quiet.any():
+        return []
+    # run boundaries: +1 where a quiet run starts, -1 one past where it ends
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) >= min_frames
+    return [
+        (float(s * frame_ms), float(e * frame_ms))
+        for s, e in zip(starts[keep].tolist(), ends[keep].tolist())
+    ]
+
+
+def encode_envelope(envelope: EnergyEnvelope) -> bytes:
+    header = _HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_FORMAT, envelope.frame_ms, len(envelope.levels))
+    return header + np.round(np.asarray(envelope.levels) * 100).astype("<i2").tobytes()
+
+
+def decode_envelope(data: bytes) -> EnergyEnvelope:
+    magic, version, frame_ms, count = _HEADER.unpack_from(data)
+    if magic != ENVELOPE_MAGIC or version != ENVELOPE_FORMAT:
+        raise ValueError("Not an energy envelope file")
+    body = data[_HEADER.size:_HEADER.size + count * 2]
+    levels = np.frombuffer(body, dtype="<i2").astype(np.float32) / 100
+    return EnergyEnvelope(frame_ms=frame_ms, levels=levels)
+
+
+def load_envelope(path: str) -> Optional[EnergyEnvelope]:
+    """Cached envelope at ``path``, or None if it is missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return decode_envelope(f.read())
+    except (OSError, ValueError, struct.error):
+        return None
@@ -3,7 +3,6 @@
 import logging
 from typing import Tuple
 
-import httpx
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -40,6 +39,7 @@ async def send_feedback_to_telegram(
     db: AsyncSession,
 ) -> bool:
     """Send feedback notification to all configured Telegram chats."""
+    import httpx  # loaded on first send, not at API boot
     token, chat_ids = await _get_telegram_config(db)
 
     if not token or not chat_ids:
@@ -84,6 +84,7 @@ async def send_feedback_to_telegram(
 
 async def test_telegram_connection(db: AsyncSession) -> Tuple[bool, str]:
     """Test Telegram bot connection by sending a test message."""
+    import httpx
     token, chat_ids = await _get_telegram_config(db)
 
     if not token:
@@ -0,0 +1,122 @@
+"""Set-based application of the overlay editor's bulk unit edits.
+
+``PUT /admin/book/pages/{page_id}/units/bulk`` receives a list of
+create/update/delete actions. They are applied with a fixed number of
+statements, independent of how many units the request touches:
+
+1. one ``DELETE ... WHERE id IN (...)`` for all deletes,
+2. one ``SELECT id`` checking which updated units live on the page, then
+   one executemany ``UPDATE`` per distinct set of changed fields (the
+   editor sends the same fields for every unit, so normally one),
+3. one multi-row ``INSERT ... RETURNING id`` for all creates.
+
+Deletes run first, so an update of a unit deleted in the same request is
+skipped. Synchronous so scripts can reuse it; the API runs it through
+``AsyncSession.run_sync``.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.book import TextUnit, UnitType
+
+UPDATABLE_FIELDS = ("text_content", "bbox_x", "bbox_y", "bbox_w", "bbox_h", "sort_order")
+
+
+def _create_unit_type(value: str) -> UnitType:
+    try:
+        return UnitType(value)
+    except ValueError:
+        return UnitType.WORD
+
+
+def _update_values(edit: dict) -> Dict[str, object]:
+    """Column values an update action changes (invalid unit types are ignored)."""
+    values = {field: edit[field] for field in UPDATABLE_FIELDS if field in edit}
+    if "unit_type" in edit:
+        try:
+            values["unit_type"] = UnitType(edit["unit_type"])
+        except ValueError:
+            pass
+    if "metadata" in edit:
+        values["metadata"] = edit["metadata"]
+    return values
+
+
+def apply_unit_edits(db: Session, page_id: int, edits: Sequence[dict]) -> dict:
+    """Apply create/update/delete actions to the units of a page (no commit).
+
+    Returns ``created``, ``updated`` and ``deleted`` counts (as the endpoint
+    reports them), ``removed_units`` (rows actually deleted) and
+    ``created_ids`` in the order of the create actions.
+    """
+    delete_ids = [e["id"] for e in edits if e.get("action") == "delete" and e.get("id")]
+    updates = [e for e in edits if e.get("action", "update") == "update" and e.get("id")]
+    creates = [e for e in edits if e.get("action") == "create"]
+
+    removed_units = 0
+    if delete_ids:
+        result = db.execute(
+            delete(TextUnit).where(TextUnit.id.in_(delete_ids), TextUnit.page_id == page_id)
+        )
+        removed_units = result.rowcount
+
+    updated = 0
+    if updates:
+        on_page = set(db.execute(
+            select(TextUnit.id).where(
+                TextUnit.id.in_({e["id"] for e in updates}),
+                TextUnit.page_id == page_id,
+            )
+        ).scalars())
+
+        # Group by the set of changed columns: one executemany per shape
+        shapes: Dict[Tuple[str, ...], List[dict]] = {}
+        for edit in updates:
+            if edit["id"] not in on_page:
+                continue
+            values = _update_values(edit)
+            params = {f"v_{column}": value for column, value in values.items()}
+            params["v_id"] = edit["id"]
+            shapes.setdefault(tuple(sorted(values)), []).append(params)
+            updated += 1
+
+        table = TextUnit.__table__
+        for columns, rows in shapes.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("v_id"))
+                .values(is_manual=True, **{column: bindparam(f"v_{column}") for column in columns})
+            )
+            db.execute(statement, rows)
+
+    created_ids: List[int] = []
+    if creates:
+        created_ids = list(db.execute(
+            insert(TextUnit).returning(TextUnit.id, sort_by_parameter_order=True),
+            [
+                {
+                    "page_id": page_id,
+                    "unit_type": _create_unit_type(e.get("unit_type", "word")),
+                    "text_content": e.get("text_content", ""),
+                    "bbox_x": e.get("bbox_x", 0),
+                    "bbox_y": e.get("bbox_y", 0),
+                    "bbox_w": e.get("bbox_w", 0),
+                    "bbox_h": e.get("bbox_h", 0),
+                    "sort_order": e.get("sort_order", 0),
+                    "is_manual": True,
+                    "metadata_": e.get("metadata", {}),
+                }
+                for e in creates
+            ],
+        ).scalars())
+
+    return {
+        "created": len(creates),
+        "updated": updated,
+        "deleted": len(delete_ids),
+        "removed_units": removed_units,
+        "created_ids": created_ids,
+    }
@@ -0,0 +1,199 @@
+"""Waveform peak pyramid: streaming min/max peaks at several zoom levels.
+
+ffmpeg decodes the audio to 8 kHz mono s16le PCM on stdout; the stream is
+read in chunks and reduced to per-block (``BLOCK_SAMPLES``) min/max pairs
+as it arrives, so memory stays proportional to the block count rather
+than the sample count. When the stream ends, each pyramid level (1k, 8k
+and 64k buckets by default) is a further reduction of the block peaks.
+
+The pyramid is stored as one compact binary file (``.peaks``) so the admin
+waveform editor can switch zoom levels without decoding the audio again:
+
+    header   "MSPK", format u16, level count u16, sample rate u32, samples u64
+    levels   bucket count u32, byte offset u32        (one entry per level)
+    data     int16 (min, max) pairs per bucket, little-endian
+
+The reductions run on NumPy arrays.
+"""
+
+import logging
+import struct
+import subprocess
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("muallimi")
+
+PEAKS_MAGIC = b"MSPK"
+PEAKS_FORMAT = 1
+PEAKS_SAMPLE_RATE = 8000
+PEAK_LEVELS = (1000, 8000, 64000)
+
+# 2 ms at 8 kHz: the finest resolution kept while streaming
+BLOCK_SAMPLES = 16
+READ_CHUNK_BYTES = 256 * 1024
+
+_HEADER = struct.Struct("<4sHHIQ")
+_LEVEL = struct.Struct("<II")
+
+@dataclass
+class PeakPyramid:
+    sample_rate: int
+    sample_count: int
+    # bucket count -> (mins, maxs), int16 sequences of equal length
+    levels: Dict[int, Tuple[Sequence[int], Sequence[int]]] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> int:
+        return int(self.sample_count * 1000 / self.sample_rate) if self.sample_rate else 0
+
+    def normalized_peaks(self, buckets: int) -> List[float]:
+        """``max(|min|, |max|) / 32768`` per bucket, as stored in ``waveform_peaks``."""
+        mins, maxs = self.levels[buckets]
+        return [round(max(-int(lo), int(hi)) / 32768.0, 4) for lo, hi in zip(mins, maxs)]
+
+
+class _BlockReducer:
+    """Accumulates per-block min/max from successive PCM chunks."""
+
+    def __init__(self):
+        self.sample_count = 0
+        self._tail = b""
+        self._mins: list = []
+        self._maxs: list = []
+
+    def feed(self, data: bytes, final: bool = False) -> None:
+        data = self._tail + data
+        block_bytes = BLOCK_SAMPLES * 2
+        usable = len(data) if final else len(data) - len(data) % block_bytes
+        usable -= usable % 2
+        self._tail = data[usable:]
+        if not usable:
+            return
+        chunk = data[:usable]
+        self.sample_count += usable // 2
+
+        samples = np.frombuffer(chunk, dtype="<i2")
+        full = len(samples) - len(samples) % BLOCK_SAMPLES
+        if full:
+            blocks = samples[:full].reshape(-1, BLOCK_SAMPLES)
+            self._mins.append(blocks.min(axis=1))
+            self._maxs.append(blocks.max(axis=1))
+        if full < len(samples):
+            rest = samples[full:]
+            self._mins.append(rest.min(keepdims=True))
+            self._maxs.append(rest.max(keepdims=True))
+
+    def blocks(self):
+        if not self._mins:
+            return np.zeros(0, dtype="<i2"), np.zeros(0, dtype="<i2")
+        return np.concatenate(self._mins), np.concatenate(self._maxs)
+
+
+def _reduce_level(block_mins, block_maxs, buckets: int):
+    """Reduce block peaks to ``buckets`` evenly spread buckets."""
+    count = len(block_mins)
+    buckets = min(buckets, count)
+    edges = (np.arange(buckets, dtype=np.int64) * count) // buckets
+    return np.minimum.reduceat(block_mins, edges), np.maximum.reduceat(block_maxs, edges)
+
+
+def peak_pyramid_from_stream(
+    stream: BinaryIO,
+    levels: Sequence[int] = PEAK_LEVELS,
+    sample_rate: int = PEAKS_SAMPLE_RATE,
+    on_chunk: Optional[Callable[[bytes], None]] = None,
+) -> PeakPyramid:
+    """Build the pyramid from a raw s16le mono PCM stream.
+
+    ``on_chunk`` also receives every chunk read, for other reductions of the
+    same stream.
+    """
+    reducer = _BlockReducer()
+    while True:
+        data = stream.read(READ_CHUNK_BYTES)
+        if not data:
+            break
+        reducer.feed(data)
+        if on_chunk:
+            on_chunk(data)
+    reducer.feed(b"", final=True)
+
+    block_mins, block_maxs = reducer.blocks()
+    pyramid = PeakPyramid(sample_rate=sample_rate, sample_count=reducer.sample_count)
+    if len(block_mins):
+        for buckets in levels:
+            pyramid.levels[buckets] = _reduce_level(block_mins, block_maxs, buckets)
+    return pyramid
+
+
+def compute_peak_pyramid(
+    file_path: str,
+    levels: Sequence[int] = PEAK_LEVELS,
+    sample_rate: int = PEAKS_SAMPLE_RATE,
+) -> Optional[PeakPyramid]:
+    """Decode ``file_path`` with ffmpeg (streamed) and build its peak pyramid."""
+    proc = subprocess.Popen(
+        [
+            "ffmpeg", "-v", "error", "-i", file_path,
+            "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+            "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        pyramid = peak_pyramid_from_stream(proc.stdout, levels, sample_rate)
+        returncode = proc.wait(timeout=120)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+
+    if returncode != 0:
+        logger.error(f"Waveform decode failed for {file_path} (ffmpeg exit {returncode})")
+        return None
+    return pyramid
+
+
+def encode_peak_pyramid(pyramid: PeakPyramid) -> bytes:
+    """Serialize to the ``.peaks`` binary format."""
+    levels = sorted(pyramid.levels.items())
+    header = _HEADER.pack(
+        PEAKS_MAGIC, PEAKS_FORMAT, len(levels), pyramid.sample_rate, pyramid.sample_count
+    )
+    offset = len(header) + _LEVEL.size * len(levels)
+    index = []
+    data = []
+    for _buckets, (mins, maxs) in levels:
+        pairs = np.column_stack((np.asarray(mins), np.asarray(maxs))).astype("<i2").tobytes()
+        index.append(_LEVEL.pack(len(mins), offset))
+        data.append(pairs)
+        offset += len(pairs)
+    return header + b"".join(index) + b"".join(data)
+
+
+def decode_peak_pyramid(data: bytes, buckets: Optional[int] = None) -> PeakPyramid:
+    """Parse a ``.peaks`` file; with ``buckets`` only the closest level is decoded."""
+    magic, version, level_count, sample_rate, sample_count = _HEADER.unpack_from(data)
+    if magic != PEAKS_MAGIC or version != PEAKS_FORMAT:
+        raise ValueError("Not a waveform peaks file")
+
+    index = [
+        _LEVEL.unpack_from(data, _HEADER.size + i * _LEVEL.size) for i in range(level_count)
+    ]
+    if buckets is not None and index:
+        index = [min(index, key=lambda entry: abs(entry[0] - buckets))]
+
+    pyramid = PeakPyramid(sample_rate=sample_rate, sample_count=sample_count)
+    for count, offset in index:
+        pairs = array("h")
+        pairs.frombytes(data[offset:offset + count * 4])
+        if sys.byteorder == "big":
+            pairs.byteswap()
+        pyramid.levels[count] = (pairs[0::2], pairs[1::2])
+    return pyramid
@@ -2,8 +2,11 @@
 
 import logging
 import os
+import time
 
 from app.tasks.celery_app import celery_app
+from app.tasks.db import task_session
+from app.cache import bump_content_revision_sync
 from app.config import get_settings
 
 logger = logging.getLogger("muallimi")
@@ -13,18 +16,13 @@ settings = get_settings()
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
 def process_audio_task(self, audio_file_id: int):
     """Process uploaded audio: normalize, generate waveform, auto-segment."""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import Session
     from app.models.audio import AudioFile, AudioSegment, AudioStatus
     from app.services.audio_processor import (
-        normalize_audio, generate_waveform_peaks,
-        get_audio_duration_ms, auto_segment,
+        analyze_audio, auto_segment, envelope_path, waveform_path,
     )
 
-    engine = create_engine(settings.sync_database_url)
-
     try:
-        with Session(engine) as db:
+        with task_session() as db:
             audio = db.query(AudioFile).get(audio_file_id)
             if not audio:
                 logger.error(f"Audio file {audio_file_id} not found")
@@ -35,29 +33,35 @@ def process_audio_task(self, audio_file_id: int):
 
             source_path = os.path.join(settings.MEDIA_DIR, audio.file_path)
 
-            # 1. Normalize
+            # 1. Normalize, duration, waveform and silences from a single decode
             normalized_path = os.path.join(
                 settings.MEDIA_DIR, "uploads",
                 f"normalized_{audio_file_id}.mp3"
             )
-            if not normalize_audio(source_path, normalized_path):
+            peaks_rel_path = waveform_path(audio.id)
+            analysis = analyze_audio(
+                source_path,
+                normalized_path=normalized_path,
+                peaks_path=os.path.join(settings.MEDIA_DIR, peaks_rel_path),
+                envelope_path=os.path.join(settings.MEDIA_DIR, envelope_path(audio.id)),
+            )
+            if analysis is None:
                 audio.status = AudioStatus.ERROR
-                audio.error_message = "Audio normalization failed"
+                audio.error_message = "Audio analysis failed"
                 db.commit()
                 return {"status": "error"}
 
             audio.normalized_path = f"uploads/normalized_{audio_file_id}.mp3"
-
-            # 2. Get duration
-            duration = get_audio_duration_ms(normalized_path)
+            duration = analysis.duration_ms
+            peaks = analysis.peaks
             audio.duration_ms = duration
-
-            # 3. Generate waveform
-            peaks = generate_waveform_peaks(normalized_path)
             audio.waveform_peaks = peaks
 
-            # 4. Auto-segment
-            segments = auto_segment(normalized_path, duration)
+            # 2. Auto-segment
+            segment_started = time.perf_counter()
+            segments = auto_segment(duration, analysis.silences)
+            timings = dict(analysis.timings_ms)
+            timings["segment"] = int((time.perf_counter() - segment_started) * 1000)
 
             # Save segments to DB
             for seg_info in segments:
@@ -76,8 +80,11 @@ def process_audio_task(self, audio_file_id: int):
                 "segment_count": len(segments),
                 "duration_ms": duration,
                 "peaks_count": len(peaks),
+                "waveform_path": peaks_rel_path if peaks else None,
+                "timings_ms": timings,
             }
             db.commit()
+            bump_content_revision_sync()
 
             logger.info(
                 f"Audio processing complete: {len(segments)} segments, "
@@ -88,7 +95,7 @@ def process_audio_task(self, audio_file_id: int):
 
     except Exception as e:
         logger.error(f"Audio processing failed: {e}")
-        with Session(engine) as db:
+        with task_session() as db:
             audio = db.query(AudioFile).get(audio_file_id)
             if audio:
                 audio.status = AudioStatus.ERROR
@@ -100,20 +107,19 @@ def process_audio_task(self, audio_file_id: int):
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=15)
 def cut_segments_task(self, audio_file_id: int):
     """Cut individual segment files from the source audio."""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import Session
     from app.models.audio import AudioFile, AudioSegment, AudioStatus
-    from app.services.audio_processor import cut_segment_file
-
-    engine = create_engine(settings.sync_database_url)
+    from app.services.audio_processor import (
+        assign_segment_byte_ranges, cut_segment_files, segment_source_path,
+    )
+    from app.services.mp3_frames import build_frame_index
 
     try:
-        with Session(engine) as db:
+        with task_session() as db:
             audio = db.query(AudioFile).get(audio_file_id)
             if not audio:
                 return {"status": "error", "message": "Not found"}
 
-            source_path = os.path.join(settings.MEDIA_DIR, audio.normalized_path or audio.file_path)
+            source_path = os.path.join(settings.MEDIA_DIR, segment_source_path(audio))
             segments_dir = os.path.join(settings.MEDIA_DIR, "segments")
             os.makedirs(segments_dir, exist_ok=True)
 
@@ -127,19 +133,44 @@ def cut_segments_task(self, audio_file_id: int):
                 .all()
             )
 
-            cut_count = 0
-            for seg in segments:
-                filename = f"seg_{audio_file_id}_{seg.segment_index:04d}_v{seg.version}.mp3"
-                output_path = os.path.join(segments_dir, filename)
+            frame_index = build_frame_index(source_path) if settings.AUDIO_VIRTUAL_SEGMENTS else None
+            if frame_index is not None:
+                assign_segment_byte_ranges(frame_index, segments)
+                audio.status = AudioStatus.READY
+                db.commit()
+                bump_content_revision_sync()
+                logger.info(f"Indexed {len(segments)} virtual segments for audio file {audio_file_id}")
+                return {"status": "success", "cut_count": len(segments), "virtual": True}
+
+            filenames = [
+                f"seg_{audio_file_id}_{seg.segment_index:04d}_v{seg.version}.mp3"
+                for seg in segments
+            ]
+
+            def report_progress(done: int, total: int):
+                self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+
+            results = cut_segment_files(
+                source_path,
+                [
+                    (seg.start_ms, seg.end_ms, os.path.join(segments_dir, filename))
+                    for seg, filename in zip(segments, filenames)
+                ],
+                progress=report_progress,
+            )
 
-                if cut_segment_file(source_path, output_path, seg.start_ms, seg.end_ms):
+            cut_count = 0
+            for seg, filename, ok in zip(segments, filenames, results):
+                if ok:
                     seg.file_path = f"segments/{filename}"
+                    seg.byte_start = seg.byte_end = None
                     cut_count += 1
                 else:
                     logger.error(f"Failed to cut segment {seg.segment_index}")
 
             audio.status = AudioStatus.READY
             db.commit()
+            bump_content_revision_sync()
 
             logger.info(f"Cut {cut_count} segments for audio file {audio_file_id}")
 
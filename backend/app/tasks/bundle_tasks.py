@@ -0,0 +1,25 @@
+"""Offline bundle build tasks."""
+
+import logging
+from typing import Optional
+
+from app.tasks.celery_app import celery_app
+from app.tasks.db import task_session
+from app.config import get_settings
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+
+@celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
+def build_bundle_task(self, since: Optional[int] = None):
+    """Build the full bundle (or the delta from ``since``) for the current version."""
+    from app.services.bundle import build_bundle
+
+    try:
+        with task_session() as db:
+            return build_bundle(db, base_version=since)
+    except Exception as e:
+        logger.error(f"Bundle build failed (since={since}): {e}")
+        raise self.retry(exc=e)
+
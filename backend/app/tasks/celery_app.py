@@ -14,6 +14,7 @@ celery_app = Celery(
         "app.tasks.pdf_tasks",
         "app.tasks.audio_tasks",
         "app.tasks.page_tasks",
+        "app.tasks.bundle_tasks",
     ],
 )
 
@@ -31,3 +32,6 @@ celery_app.conf.update(
 
 # Auto-discover tasks
 celery_app.autodiscover_tasks(["app.tasks"])
+
+# Worker DB engine lifecycle (signal handlers)
+import app.tasks.db  # noqa: E402,F401
@@ -0,0 +1,146 @@
+"""Database engine and sessions for Celery workers.
+
+One sync engine per worker process, created on ``worker_process_init``
+(after the prefork fork, so no pooled connection is shared with the
+parent) and disposed on ``worker_process_shutdown``. Tasks open sessions
+with ``task_session()`` instead of building an engine per invocation.
+
+Pool size follows the number of tasks a process runs at once: 1 in a
+prefork child, the worker concurrency for thread/gevent pools (tasks run
+in the main process there), or ``WORKER_DB_POOL_SIZE`` when set.
+
+Per task, the number of new DBAPI connections and pool checkouts is
+counted and logged when the task finishes; a warm worker should report
+0 connections opened. (With thread pools the counters are shared by the
+tasks running at the same time.)
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from celery.signals import (
+    task_postrun, task_prerun, worker_init, worker_process_init,
+    worker_process_shutdown, worker_shutdown,
+)
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import get_settings
+
+logger = logging.getLogger("muallimi")
+settings = get_settings()
+
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_lock = threading.Lock()
+
+# Concurrent tasks per process (see module docstring)
+_task_slots = 1
+
+# Counters since the current task started, and since the process started
+_task_stats: Dict[str, int] = {"connections_opened": 0, "checkouts": 0}
+_process_stats: Dict[str, int] = {"connections_opened": 0, "checkouts": 0, "tasks": 0}
+
+
+def _count(name: str) -> None:
+    _task_stats[name] += 1
+    _process_stats[name] += 1
+
+
+def pool_size() -> int:
+    return settings.WORKER_DB_POOL_SIZE or _task_slots
+
+
+def init_engine() -> Engine:
+    """Create the process engine (idempotent)."""
+    global _engine, _session_factory
+    with _lock:
+        if _engine is None:
+            _engine = create_engine(
+                settings.sync_database_url,
+                pool_size=pool_size(),
+                max_overflow=1,
+                pool_pre_ping=True,
+                pool_recycle=1800,
+            )
+            event.listen(_engine, "connect", lambda *_: _count("connections_opened"))
+            event.listen(_engine, "checkout", lambda *_: _count("checkouts"))
+            _session_factory = sessionmaker(bind=_engine)
+            logger.info(f"Worker DB engine ready (pool_size={pool_size()})")
+        return _engine
+
+
+def dispose_engine(close: bool = True) -> None:
+    """Drop the process engine; ``close=False`` leaves inherited connections to the parent."""
+    global _engine, _session_factory
+    with _lock:
+        if _engine is not None:
+            _engine.dispose(close=close)
+            _engine = None
+            _session_factory = None
+
+
+def get_engine() -> Engine:
+    """The process engine, created on first use outside a worker (scripts, eager tasks)."""
+    return _engine or init_engine()
+
+
+@contextmanager
+def task_session() -> Iterator[Session]:
+    """Session on the worker engine; commits are explicit, as in the tasks."""
+    get_engine()
+    with _session_factory() as db:
+        yield db
+
+
+def connection_stats() -> Dict[str, int]:
+    """Counters for the current task and the process lifetime."""
+    return {
+        "task_connections_opened": _task_stats["connections_opened"],
+        "task_checkouts": _task_stats["checkouts"],
+        **{f"process_{k}": v for k, v in _process_stats.items()},
+    }
+
+
+@worker_init.connect
+def _on_worker_init(sender=None, **kwargs):
+    global _task_slots
+    # Thread/gevent pools run tasks in this process, `concurrency` at a time;
+    # prefork children reset this to 1 in worker_process_init.
+    _task_slots = max(1, getattr(sender, "concurrency", None) or 1)
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs):
+    global _task_slots
+    _task_slots = 1
+    dispose_engine(close=False)  # never reuse a pool inherited from the parent
+    init_engine()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _on_worker_shutdown(**kwargs):
+    dispose_engine()
+
+
+@task_prerun.connect
+def _on_task_prerun(**kwargs):
+    _task_stats["connections_opened"] = 0
+    _task_stats["checkouts"] = 0
+
+
+@task_postrun.connect
+def _on_task_postrun(task=None, **kwargs):
+    _process_stats["tasks"] += 1
+    if not _task_stats["checkouts"]:
+        return
+    logger.info(
+        f"Task {task.name if task else '?'} DB: "
+        f"{_task_stats['connections_opened']} connections opened, "
+        f"{_task_stats['checkouts']} checkouts "
+        f"(process: {_process_stats['connections_opened']} opened in {_process_stats['tasks']} tasks)"
+    )
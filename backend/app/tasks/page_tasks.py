@@ -4,12 +4,63 @@ import logging
 import os
 
 from app.tasks.celery_app import celery_app
+from app.tasks.db import task_session
+from app.cache import bump_content_revision_sync
 from app.config import get_settings
 
 logger = logging.getLogger("muallimi")
 settings = get_settings()
 
 
+def store_page_analysis(db, page, units) -> bool:
+    """Replace a page's OCR (non-manual) units with ``units`` in one bulk insert.
+
+    Sets the page status (DRAFT, or ERROR when nothing was found); the
+    caller commits. Returns whether any unit was written.
+    """
+    from sqlalchemy import insert as sa_insert
+    from app.api.deps import UNIT_TYPE_MAP
+    from app.models.book import PageStatus, TextUnit, UnitType
+
+    if not units:
+        page.analysis_status = PageStatus.ERROR
+        page.analysis_error = "OCR dan hech qanday text topilmadi"
+        return False
+
+    # Delete existing draft units (if re-analyzing)
+    db.query(TextUnit).filter(
+        TextUnit.page_id == page.id,
+        TextUnit.is_manual == False
+    ).delete(synchronize_session=False)
+
+    db.execute(sa_insert(TextUnit), [
+        {
+            "page_id": page.id,
+            "unit_type": UNIT_TYPE_MAP.get(unit_data.unit_type, UnitType.WORD),
+            "text_content": unit_data.text,
+            "bbox_x": unit_data.bbox_x,
+            "bbox_y": unit_data.bbox_y,
+            "bbox_w": unit_data.bbox_w,
+            "bbox_h": unit_data.bbox_h,
+            "sort_order": unit_data.sort_order,
+            "confidence": unit_data.confidence,
+            "is_manual": False,
+            "metadata_": unit_data.metadata or {},
+        }
+        for unit_data in units
+    ])
+
+    page.analysis_status = PageStatus.DRAFT
+    page.has_text_data = True
+    page.analysis_error = None
+    return True
+
+
+def page_image_source(page):
+    """Image OCR reads: the uploaded original, else the rendered page."""
+    return page.source_image_path or page.image_2x_path or page.image_path
+
+
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
 def analyze_page_image_task(self, page_id: int, image_path: str):
     """Analyze a page image: run OCR and create text units.
@@ -17,15 +68,12 @@ def analyze_page_image_task(self, page_id: int, image_path: str):
     This runs in a Celery worker (sync context).
     Uses synchronous DB session.
     """
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import Session
-    from app.models.book import Book, Page, TextUnit, UnitType, PageStatus
+    from app.models.book import Page, PageStatus
     from app.services.image_analyzer import analyze_image
-
-    engine = create_engine(settings.sync_database_url)
+    from app.services.manifest_stats import recount_manifest_stats
 
     try:
-        with Session(engine) as db:
+        with task_session() as db:
             page = db.query(Page).filter(Page.id == page_id).first()
             if not page:
                 logger.error(f"Page {page_id} not found")
@@ -39,40 +87,13 @@ def analyze_page_image_task(self, page_id: int, image_path: str):
             full_image_path = os.path.join(settings.MEDIA_DIR, image_path)
             units = analyze_image(full_image_path)
 
-            if not units:
-                page.analysis_status = PageStatus.ERROR
-                page.analysis_error = "OCR dan hech qanday text topilmadi"
+            if not store_page_analysis(db, page, units):
                 db.commit()
                 return {"status": "error", "message": "No text found"}
 
-            # Delete existing draft units (if re-analyzing)
-            db.query(TextUnit).filter(
-                TextUnit.page_id == page_id,
-                TextUnit.is_manual == False
-            ).delete(synchronize_session='fetch')
-
-            # Create text unit records
-            from app.api.deps import UNIT_TYPE_MAP
-            for unit_data in units:
-                unit = TextUnit(
-                    page_id=page_id,
-                    unit_type=UNIT_TYPE_MAP.get(unit_data.unit_type, UnitType.WORD),
-                    text_content=unit_data.text,
-                    bbox_x=unit_data.bbox_x,
-                    bbox_y=unit_data.bbox_y,
-                    bbox_w=unit_data.bbox_w,
-                    bbox_h=unit_data.bbox_h,
-                    sort_order=unit_data.sort_order,
-                    confidence=unit_data.confidence,
-                    is_manual=False,
-                    metadata_=unit_data.metadata or {},
-                )
-                db.add(unit)
-
-            page.analysis_status = PageStatus.DRAFT
-            page.has_text_data = True
-            page.analysis_error = None
+            recount_manifest_stats(db, page.book_id)
             db.commit()
+            bump_content_revision_sync()
 
             logger.info(f"Page {page_id} analysis complete: {len(units)} units")
             return {
@@ -84,7 +105,7 @@ def analyze_page_image_task(self, page_id: int, image_path: str):
     except Exception as e:
         logger.error(f"Page analysis failed for page {page_id}: {e}")
         try:
-            with Session(engine) as db:
+            with task_session() as db:
                 page = db.query(Page).filter(Page.id == page_id).first()
                 if page:
                     page.analysis_status = PageStatus.ERROR
@@ -93,3 +114,198 @@ def analyze_page_image_task(self, page_id: int, image_path: str):
         except Exception:
             pass
         self.retry(exc=e)
+
+
+@celery_app.task(bind=True)
+def analyze_pages_task(self, book_id: int, page_start: int, page_end: int, include_published: bool = False):
+    """OCR every page of ``page_start..page_end`` that has an image.
+
+    Images are analyzed in parallel (``analyze_images``, ``OCR_WORKERS`` at
+    a time); each page's units are bulk-inserted and committed as soon as
+    its OCR finishes, so a failure affects only that page. Published pages
+    are skipped unless ``include_published``. Progress is reported as
+    ``PROGRESS`` state with ``done``/``total``/``failed``.
+    """
+    from app.models.book import Page, PageStatus
+    from app.services.image_analyzer import analyze_images
+    from app.services.manifest_stats import recount_manifest_stats
+
+    with task_session() as db:
+        query = db.query(Page).filter(
+            Page.book_id == book_id,
+            Page.page_number >= page_start,
+            Page.page_number <= page_end,
+        )
+        if not include_published:
+            query = query.filter(Page.analysis_status != PageStatus.PUBLISHED)
+        pages = {}
+        for page in query.order_by(Page.page_number):
+            source = page_image_source(page)
+            if source:
+                pages[os.path.join(settings.MEDIA_DIR, source)] = page
+                page.analysis_status = PageStatus.ANALYZING
+        db.commit()
+
+        total = len(pages)
+        done = 0
+        failed = []
+        self.update_state(state="PROGRESS", meta={"done": 0, "total": total, "failed": 0})
+
+        pending = dict(pages)
+        try:
+            for path, units in analyze_images(list(pages)):
+                page = pending.pop(path)
+                try:
+                    if not store_page_analysis(db, page, units):
+                        failed.append(page.page_number)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Storing analysis failed for page {page.page_number}: {e}")
+                    page.analysis_status = PageStatus.ERROR
+                    page.analysis_error = str(e)
+                    db.commit()
+                    failed.append(page.page_number)
+
+                done += 1
+                self.update_state(
+                    state="PROGRESS",
+                    meta={"done": done, "total": total, "failed": len(failed)},
+                )
+        except Exception as e:
+            # The OCR pool itself failed: pages still marked ANALYZING would
+            # stay that way, so record the error on them
+            db.rollback()
+            logger.error(f"Batch analysis of pages {page_start}-{page_end} failed: {e}")
+            for page in pending.values():
+                page.analysis_status = PageStatus.ERROR
+                page.analysis_error = str(e)
+            db.commit()
+            bump_content_revision_sync()
+            raise
+
+        recount_manifest_stats(db, book_id)
+        db.commit()
+        bump_content_revision_sync()
+
+    logger.info(f"Batch analysis of pages {page_start}-{page_end}: {done} pages, {len(failed)} failed")
+    return {
+        "status": "success",
+        "pages": done,
+        "failed_pages": sorted(failed),
+    }
+
+
+@celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
+def generate_image_variants_task(self, page_id: int):
+    """Write the responsive image derivatives of a page (see app/services/image_variants.py)."""
+    from app.models.book import Page
+    from app.services.image_variants import generate_image_variants, remove_stale_variants
+
+    try:
+        with task_session() as db:
+            page = db.query(Page).filter(Page.id == page_id).first()
+            if not page:
+                logger.error(f"Page {page_id} not found")
+                return {"status": "error", "message": "Page not found"}
+
+            source = page_image_source(page)
+            if not source:
+                return {"status": "error", "message": "Page has no image"}
+
+            variants = generate_image_variants(
+                os.path.join(settings.MEDIA_DIR, source), page.page_number,
+            )
+            if variants is None:
+                return {"status": "error", "message": "Source image not found"}
+
+            # Keep the generation that cached payloads and bundles still reference
+            previous = page.image_variants or {}
+            if previous.get("hash") == variants["hash"]:
+                variants["previous_hash"] = previous.get("previous_hash")
+            else:
+                variants["previous_hash"] = previous.get("hash")
+
+            if variants != page.image_variants:
+                page.image_variants = variants
+                db.commit()
+                bump_content_revision_sync()
+
+            # Only once nothing committed points at them
+            remove_stale_variants(page.page_number, (variants["hash"], variants["previous_hash"]))
+
+            return {"status": "success", "page_id": page_id, "hash": variants["hash"]}
+
+    except Exception as e:
+        logger.error(f"Image variants failed for page {page_id}: {e}")
+        self.retry(exc=e)
+
+
+def enqueue_image_variants(page_id: int) -> None:
+    """Queue ``generate_image_variants_task``; without a broker the page keeps its plain image."""
+    try:
+        generate_image_variants_task.delay(page_id)
+    except Exception as e:
+        logger.warning(f"Could not queue image variants for page {page_id}: {e}")
+
+
+@celery_app.task(bind=True)
+def compact_page_versions_task(self, keep: int = None):
+    """Trim every page's version history to the newest ``keep`` versions (see app/services/page_versions.py)."""
+    from sqlalchemy import func, select
+    from app.models.book import PageVersion
+    from app.services.page_versions import compact_page_versions
+
+    keep = keep or settings.PAGE_VERSIONS_KEEP
+    if keep <= 0:
+        return {"status": "success", "pages": 0, "removed": 0}
+
+    with task_session() as db:
+        page_ids = db.execute(
+            select(PageVersion.page_id)
+            .group_by(PageVersion.page_id)
+            .having(func.count(PageVersion.id) > keep)
+        ).scalars().all()
+
+        removed = 0
+        for page_id in page_ids:
+            removed += compact_page_versions(db, page_id, keep)
+            db.commit()
+
+    logger.info(f"Version compaction: {removed} versions removed from {len(page_ids)} pages")
+    return {"status": "success", "pages": len(page_ids), "removed": removed}
+
+
+@celery_app.task(bind=True)
+def batch_publish_task(self, book_id: int, page_ids: list = None, admin_id: int = None):
+    """QA and publish many pages at once (see app/services/batch_publish.py); returns the report."""
+    from app.services.batch_publish import publish_pages
+
+    self.update_state(state="PROGRESS", meta={"stage": "qa", "book_id": book_id})
+    with task_session() as db:
+        report = publish_pages(db, book_id, page_ids, admin_id)
+        db.commit()
+
+    if report["published"]:
+        from app.services.bundle import schedule_bundle_build
+
+        bump_content_revision_sync()
+        schedule_bundle_build()
+    return {"status": "success", **report}
+
+
+@celery_app.task(bind=True)
+def book_qa_report_task(self, book_id: int):
+    """Refresh the book-wide QA report (see app/services/qa_report.py); returns it."""
+    from app.services.qa_report import build_qa_report
+
+    self.update_state(state="PROGRESS", meta={"stage": "qa", "book_id": book_id})
+    with task_session() as db:
+        report = build_qa_report(db, book_id)
+        db.commit()
+
+    logger.info(
+        f"Book QA report: {report['recomputed']}/{report['pages']} pages recomputed, "
+        f"{report['failed']} failing"
+    )
+    return {"status": "success", **report}
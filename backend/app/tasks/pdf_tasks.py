@@ -2,8 +2,11 @@
 
 import logging
 import os
+from typing import List, Optional
 
 from app.tasks.celery_app import celery_app
+from app.tasks.db import task_session
+from app.cache import bump_content_revision_sync
 from app.config import get_settings
 
 logger = logging.getLogger("muallimi")
@@ -11,22 +14,34 @@ settings = get_settings()
 
 
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
-def process_pdf_task(self, pdf_path: str):
-    """Process uploaded PDF: render pages + extract text."""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import Session
-    from app.database import Base
-    from app.models.book import Book, Page, TextUnit, UnitType
-    from app.services.pdf_import import render_pdf_pages, extract_text_units
+def process_pdf_task(self, pdf_path: str, imported_page_ids: Optional[List[int]] = None):
+    """Process uploaded PDF: render pages + extract text.
 
-    engine = create_engine(settings.sync_database_url)
+    Pages are rendered in small ranges on a thread pool (see
+    ``iter_render_pdf_pages``) while text is extracted from a single open
+    pdfplumber document; each page is committed as soon as it is rendered
+    and progress is reported as ``PROGRESS`` state with ``done``/``total``.
+    Pages committed by an attempt are passed on to the retry in
+    ``imported_page_ids``; only those pages get their non-manual units
+    replaced, so a retry does not duplicate them, while units of pages
+    imported earlier (possibly published and mapped to audio) are left
+    alone.
+    """
+    import pdfplumber
+    from sqlalchemy import delete as sa_delete, insert as sa_insert
+    from app.models.book import Book, Page, TextUnit, UnitType
+    from app.services.pdf_import import (
+        pdf_page_count, iter_render_pdf_pages, extract_pdf_page_units,
+    )
+    from app.services.manifest_stats import recount_manifest_stats
+    from app.tasks.page_tasks import enqueue_image_variants
 
+    imported = set(imported_page_ids or [])
     try:
-        # Render pages
         output_dir = os.path.join(settings.MEDIA_DIR, "pages")
-        pages_info = render_pdf_pages(pdf_path, output_dir)
+        total = pdf_page_count(pdf_path)
 
-        with Session(engine) as db:
+        with task_session() as db:
             # Create or get book
             book = db.query(Book).first()
             if not book:
@@ -34,61 +49,81 @@ def process_pdf_task(self, pdf_path: str):
                     title="Muallimi Soniy",
                     description="Ahmad Xodiy Maqsudiy — Muallimi Soniy (Ikkinchi Muallim)",
                     author="Ahmad Xodiy Maqsudiy",
-                    total_pages=len(pages_info),
+                    total_pages=total,
                 )
                 db.add(book)
-                db.flush()
             else:
-                book.total_pages = len(pages_info)
-
-            # Create page records
-            for pinfo in pages_info:
-                existing = db.query(Page).filter(
-                    Page.book_id == book.id,
-                    Page.page_number == pinfo["page_number"]
-                ).first()
+                book.total_pages = total
+            db.commit()
+            book_id = book.id
 
-                if existing:
-                    existing.image_path = pinfo["image_path"]
-                    existing.image_2x_path = pinfo["image_2x_path"]
-                    existing.image_width = pinfo["width"]
-                    existing.image_height = pinfo["height"]
-                    page = existing
-                else:
-                    page = Page(
-                        book_id=book.id,
-                        page_number=pinfo["page_number"],
-                        image_path=pinfo["image_path"],
-                        image_2x_path=pinfo["image_2x_path"],
-                        image_width=pinfo["width"],
-                        image_height=pinfo["height"],
-                    )
-                    db.add(page)
-                    db.flush()
+            existing_pages = {
+                page.page_number: page
+                for page in db.query(Page).filter(Page.book_id == book_id)
+            }
 
-                # Try extracting text units
-                units = extract_text_units(pdf_path, pinfo["page_number"])
-                if units:
-                    page.has_text_data = True
-                    for uinfo in units:
-                        text_unit = TextUnit(
-                            page_id=page.id,
-                            unit_type=UnitType(uinfo["unit_type"]),
-                            text_content=uinfo["text_content"],
-                            bbox_x=uinfo["bbox_x"],
-                            bbox_y=uinfo["bbox_y"],
-                            bbox_w=uinfo["bbox_w"],
-                            bbox_h=uinfo["bbox_h"],
-                            sort_order=uinfo["sort_order"],
-                            is_manual=False,
+            done = 0
+            with pdfplumber.open(pdf_path) as pdf:
+                for pinfo in iter_render_pdf_pages(pdf_path, output_dir, page_count=total):
+                    page = existing_pages.get(pinfo["page_number"])
+                    if page:
+                        page.image_path = pinfo["image_path"]
+                        page.image_2x_path = pinfo["image_2x_path"]
+                        page.image_width = pinfo["width"]
+                        page.image_height = pinfo["height"]
+                    else:
+                        page = Page(
+                            book_id=book_id,
+                            page_number=pinfo["page_number"],
+                            image_path=pinfo["image_path"],
+                            image_2x_path=pinfo["image_2x_path"],
+                            image_width=pinfo["width"],
+                            image_height=pinfo["height"],
                         )
-                        db.add(text_unit)
+                        db.add(page)
+                        db.flush()
+                        existing_pages[page.page_number] = page
+
+                    # Try extracting text units
+                    units = extract_pdf_page_units(pdf, pinfo["page_number"])
+                    if units:
+                        page.has_text_data = True
+                        if page.id in imported:
+                            # Written by an earlier attempt of this import
+                            db.execute(sa_delete(TextUnit).where(
+                                TextUnit.page_id == page.id, TextUnit.is_manual == False,
+                            ))
+                        db.execute(sa_insert(TextUnit), [
+                            {
+                                "page_id": page.id,
+                                "unit_type": UnitType(uinfo["unit_type"]),
+                                "text_content": uinfo["text_content"],
+                                "bbox_x": uinfo["bbox_x"],
+                                "bbox_y": uinfo["bbox_y"],
+                                "bbox_w": uinfo["bbox_w"],
+                                "bbox_h": uinfo["bbox_h"],
+                                "sort_order": uinfo["sort_order"],
+                                "is_manual": False,
+                            }
+                            for uinfo in units
+                        ])
+                    db.commit()
+                    imported.add(page.id)
+                    enqueue_image_variants(page.id)
+
+                    done += 1
+                    self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+                    logger.info(f"Imported page {pinfo['page_number']} ({done}/{total})")
 
+            recount_manifest_stats(db, book_id)
             db.commit()
-            logger.info(f"PDF processing complete: {len(pages_info)} pages")
+            bump_content_revision_sync()
+            logger.info(f"PDF processing complete: {done} pages")
 
-        return {"status": "success", "pages": len(pages_info)}
+        return {"status": "success", "pages": done}
 
     except Exception as e:
         logger.error(f"PDF processing failed: {e}")
-        self.retry(exc=e)
+        raise self.retry(
+            exc=e, args=[pdf_path], kwargs={"imported_page_ids": sorted(imported)},
+        )
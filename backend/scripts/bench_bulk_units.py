@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Regression benchmark: bulk unit edits must take a fixed number of statements.
+
+For each batch size, creates a throwaway page with that many units inside a
+transaction that is rolled back at the end, then applies an overlay-editor
+save through ``apply_unit_edits``: every unit reordered and moved, a tenth
+deleted and as many created. Counts the SQL round trips (an executemany
+counts once) and times each save.
+
+Creates are one multi-row ``INSERT ... RETURNING`` on PostgreSQL; SQLite
+cannot return ordered IDs from one statement, so run this against Postgres.
+
+Usage (from backend/, DATABASE_URL pointing at a dev database):
+    python scripts/bench_bulk_units.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.models.book import Book, Page, TextUnit, UnitType
+from app.services.unit_editor import apply_unit_edits
+
+BATCH_SIZES = [10, 50, 200, 500]
+
+
+def editor_save(unit_ids):
+    """Actions the overlay editor sends after reordering a page."""
+    drop = len(unit_ids) // 10 or 1
+    edits = [
+        {
+            "action": "update",
+            "id": unit_id,
+            "sort_order": len(unit_ids) - i,
+            "bbox_x": 10.0,
+            "bbox_y": i * 0.1,
+            "bbox_w": 5.0,
+            "bbox_h": 2.0,
+        }
+        for i, unit_id in enumerate(unit_ids[drop:])
+    ]
+    edits += [{"action": "delete", "id": unit_id} for unit_id in unit_ids[:drop]]
+    edits += [
+        {"action": "create", "unit_type": "letter", "text_content": "ب", "sort_order": 1000 + i}
+        for i in range(drop)
+    ]
+    return edits
+
+
+async def bench():
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        db = AsyncSession(bind=conn, expire_on_commit=False)
+        try:
+            book = Book(title="bench", total_pages=len(BATCH_SIZES))
+            db.add(book)
+            await db.flush()
+
+            pages = {}
+            for page_number, unit_count in enumerate(BATCH_SIZES, start=1):
+                page = Page(book_id=book.id, page_number=page_number)
+                db.add(page)
+                await db.flush()
+                units = [
+                    TextUnit(page_id=page.id, unit_type=UnitType.LETTER, text_content="ب", sort_order=i)
+                    for i in range(unit_count)
+                ]
+                db.add_all(units)
+                await db.flush()
+                pages[unit_count] = (page.id, [u.id for u in units])
+            db.expunge_all()
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+            counts = {}
+            for unit_count, (page_id, unit_ids) in pages.items():
+                edits = editor_save(unit_ids)
+                statements.clear()
+                started = time.perf_counter()
+                result = await db.run_sync(apply_unit_edits, page_id, edits)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                counts[unit_count] = len(statements)
+                assert len(result["created_ids"]) == result["created"]
+                print(
+                    f"{unit_count:>5} units: {len(statements)} statements, {elapsed_ms:.1f} ms "
+                    f"({result['updated']} updated, {result['deleted']} deleted, {result['created']} created)"
+                )
+            event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+            for unit_count, (page_id, _unit_ids) in pages.items():
+                remaining = await db.scalar(
+                    select(func.count(TextUnit.id)).where(TextUnit.page_id == page_id)
+                )
+                assert remaining == unit_count, (unit_count, remaining)
+
+            assert len(set(counts.values())) == 1, f"Statement count grows with batch size: {counts}"
+            print("OK: statement count is constant")
+        finally:
+            await db.close()
+            await trans.rollback()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Load test: middleware stack overhead on GET /api/v1/book/pages/{n}.
+
+Builds two otherwise identical apps around the real v1 router:
+  - "base_http": logging + rate limit as BaseHTTPMiddleware (the previous
+    implementation, reproduced below),
+  - "asgi": the current pure ASGI middlewares from app.middleware,
+and drives each in-process (httpx ASGITransport, no network) with a fixed
+concurrency, reporting requests/sec and latency percentiles.
+
+Usage (from backend/, DATABASE_URL pointing at a seeded dev database):
+    python scripts/bench_middleware.py [page_number] [requests] [concurrency]
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.api.v1.router import router as v1_router
+from app.middleware import RequestLoggingMiddleware, logger
+from app.middleware.rate_limit import RateLimitMiddleware, check_memory, client_ip
+
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())[:8]
+        start_time = time.time()
+        request.state.request_id = request_id
+        response = await call_next(request)
+        logger.info(
+            "request",
+            extra={
+                "request_id": request_id,
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "duration_ms": round((time.time() - start_time) * 1000, 2),
+                "client_ip": request.client.host if request.client else None,
+                "user_agent": request.headers.get("user-agent", "")[:200],
+            },
+        )
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.method == "POST":
+            for pattern, (max_requests, window) in RateLimitMiddleware.LIMITS.items():
+                if request.url.path.startswith(pattern):
+                    check_memory(f"rl:{pattern}:{client_ip(request.scope)}", max_requests, window, time.time())
+                    break
+        return await call_next(request)
+
+
+def build_app(logging_mw, rate_limit_mw) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(logging_mw)
+    app.add_middleware(rate_limit_mw)
+    app.include_router(v1_router)
+    return app
+
+
+async def run(app: FastAPI, url: str, total: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.get(url)
+        response.raise_for_status()
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                r = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                assert r.status_code == 200 and "x-request-id" in r.headers
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return total / elapsed, p50, p99
+
+
+async def main() -> None:
+    page_number = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    url = f"/api/v1/book/pages/{page_number}"
+
+    # Keep the per-request JSON log line (it is part of the cost) off the terminal
+    logger.handlers = [logging.NullHandler()]
+
+    apps = {
+        "base_http": build_app(LegacyRequestLoggingMiddleware, LegacyRateLimitMiddleware),
+        "asgi": build_app(RequestLoggingMiddleware, RateLimitMiddleware),
+    }
+    print(f"GET {url}: {total} requests, concurrency {concurrency}")
+    for name, app in apps.items():
+        rps, p50, p99 = await run(app, url, total, concurrency)
+        print(f"{name:<10} {rps:8.0f} req/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Regression benchmark: page payload query count must not grow with unit count.
+
+Creates throwaway pages with an increasing number of text units (each with a
+published audio mapping) inside a transaction that is rolled back at the end,
+then counts the SQL statements issued by ``build_page_payload``.
+
+Usage (from backend/, DATABASE_URL pointing at a dev database):
+    python scripts/bench_page_queries.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.models.audio import AudioFile, AudioSegment, AudioStatus, UnitSegmentMapping
+from app.models.book import Book, Page, TextUnit, UnitType
+from app.services.page_payload import build_page_payload
+
+UNIT_COUNTS = [10, 50, 150, 500]
+
+
+async def bench():
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        db = AsyncSession(bind=conn, expire_on_commit=False)
+        try:
+            book = Book(title="bench", total_pages=len(UNIT_COUNTS))
+            db.add(book)
+            await db.flush()
+
+            audio = AudioFile(
+                book_id=book.id,
+                original_filename="bench.mp3",
+                file_path="audio/bench.mp3",
+                status=AudioStatus.READY,
+                page_start=1,
+                page_end=len(UNIT_COUNTS),
+            )
+            db.add(audio)
+            await db.flush()
+
+            for page_number, unit_count in enumerate(UNIT_COUNTS, start=1):
+                page = Page(book_id=book.id, page_number=page_number)
+                db.add(page)
+                await db.flush()
+
+                units = [
+                    TextUnit(page_id=page.id, unit_type=UnitType.LETTER, text_content="ب", sort_order=i)
+                    for i in range(unit_count)
+                ]
+                segments = [
+                    AudioSegment(
+                        audio_file_id=audio.id,
+                        segment_index=page_number * 10000 + i,
+                        file_path=f"segments/bench_{page_number}_{i}.mp3",
+                        start_ms=i * 100,
+                        end_ms=i * 100 + 90,
+                        duration_ms=90,
+                    )
+                    for i in range(unit_count)
+                ]
+                db.add_all(units + segments)
+                await db.flush()
+                db.add_all([
+                    UnitSegmentMapping(text_unit_id=u.id, audio_segment_id=s.id, is_published=True)
+                    for u, s in zip(units, segments)
+                ])
+            await db.flush()
+            db.expunge_all()
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+            counts = {}
+            for page_number, unit_count in enumerate(UNIT_COUNTS, start=1):
+                statements.clear()
+                started = time.perf_counter()
+                payload = await build_page_payload(db, book.id, page_number)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                assert len(payload["text_units"]) == unit_count
+                assert all(u["audio_segment_url"] for u in payload["text_units"])
+                counts[unit_count] = len(statements)
+                print(f"{unit_count:>5} units: {len(statements)} queries, {elapsed_ms:.1f} ms")
+            event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+            assert len(set(counts.values())) == 1, f"Query count grows with unit count: {counts}"
+            print("OK: query count is constant")
+        finally:
+            await db.close()
+            await trans.rollback()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
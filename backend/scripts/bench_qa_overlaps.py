@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Regression benchmark: QA overlap detection must scale close to linearly.
+
+Builds synthetic alphabet-grid pages (rows of split letter units, some of
+them jittered into their neighbours) and times ``check_overlaps`` on each.
+Up to ``REFERENCE_MAX_UNITS`` units the result is compared with the
+original pairwise scan, which is also timed.
+
+Usage (from backend/):
+    python scripts/bench_qa_overlaps.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.qa_checker import check_overlaps, find_overlaps
+
+UNIT_COUNTS = [1000, 2000, 5000, 10000]
+REFERENCE_MAX_UNITS = 1000
+# Time may grow at most this much faster than the unit count
+MAX_SUPERLINEAR_FACTOR = 3.0
+
+
+def grid_page(unit_count, seed=0):
+    """Letter units on a 100x100 page: square cells, 5% nudged into a neighbour."""
+    rng = random.Random(seed)
+    columns = max(1, int(unit_count ** 0.5))
+    cell = 100 / columns
+    units = []
+    for i in range(unit_count):
+        row, column = divmod(i, columns)
+        x, y = column * cell, row * cell
+        if rng.random() < 0.05:
+            x += rng.uniform(0.3, 0.8) * cell
+        units.append({
+            "text_content": "بَ",
+            "bbox_x": x,
+            "bbox_y": y,
+            "bbox_w": cell * 0.9,
+            "bbox_h": cell * 0.9,
+            "sort_order": i,
+        })
+    return units
+
+
+def pairwise_overlaps(units):
+    """The original O(n^2) scan."""
+    overlaps = []
+    for i, u1 in enumerate(units):
+        for j, u2 in enumerate(units):
+            if i >= j:
+                continue
+            x1, y1, w1, h1 = u1.get("bbox_x", 0), u1.get("bbox_y", 0), u1.get("bbox_w", 0), u1.get("bbox_h", 0)
+            x2, y2, w2, h2 = u2.get("bbox_x", 0), u2.get("bbox_y", 0), u2.get("bbox_w", 0), u2.get("bbox_h", 0)
+            if w1 == 0 or w2 == 0:
+                continue
+            overlap_x = max(0, min(x1 + w1, x2 + w2) - max(x1, x2))
+            overlap_y = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
+            overlap_area = overlap_x * overlap_y
+            area1 = w1 * h1
+            area2 = w2 * h2
+            min_area = min(area1, area2) if min(area1, area2) > 0 else 1
+            if overlap_area / min_area > 0.3:
+                overlaps.append({
+                    "unit_a": u1.get("sort_order", i),
+                    "unit_b": u2.get("sort_order", j),
+                    "overlap_ratio": round(overlap_area / min_area, 2),
+                })
+    return overlaps
+
+
+def bench():
+    timings = {}
+    for unit_count in UNIT_COUNTS:
+        units = grid_page(unit_count)
+        started = time.perf_counter()
+        result = check_overlaps(units)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timings[unit_count] = elapsed_ms
+        line = f"{unit_count:>6} units: {elapsed_ms:8.1f} ms, {result['message']}"
+
+        if unit_count <= REFERENCE_MAX_UNITS:
+            started = time.perf_counter()
+            expected = pairwise_overlaps(units)
+            reference_ms = (time.perf_counter() - started) * 1000
+            assert find_overlaps(units) == expected, unit_count
+            assert result["details"]["overlaps"] == expected[:10], unit_count
+            line += f" (pairwise: {reference_ms:.1f} ms, identical)"
+        print(line)
+
+    smallest, largest = UNIT_COUNTS[0], UNIT_COUNTS[-1]
+    growth = timings[largest] / timings[smallest]
+    allowed = largest / smallest * MAX_SUPERLINEAR_FACTOR
+    assert growth <= allowed, f"Time grew {growth:.1f}x for {largest // smallest}x units"
+    print(f"OK: {largest // smallest}x units took {growth:.1f}x time")
+
+
+if __name__ == "__main__":
+    bench()
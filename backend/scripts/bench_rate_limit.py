@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-request overhead of the rate limiter.
+
+Measures the limiter check alone (no HTTP stack) for:
+  - the in-memory fallback (bounded LRU of per-client deques),
+  - the Redis Lua sliding window (one EVALSHA round trip), if REDIS_URL
+    is reachable.
+
+Clients are drawn from a pool larger than RATE_LIMIT_FALLBACK_MAX_KEYS so
+eviction is part of the measurement.
+
+Usage (from backend/):
+    python scripts/bench_rate_limit.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cache import get_redis
+from app.config import get_settings
+from app.middleware import rate_limit
+
+settings = get_settings()
+MAX_REQUESTS, WINDOW = 10, 300
+
+
+def report(label: str, elapsed: float, iterations: int) -> None:
+    print(f"{label:<28} {elapsed / iterations * 1e6:8.2f} µs/request  ({iterations} requests)")
+
+
+def bench_memory(iterations: int, clients: int) -> None:
+    rate_limit._rate_limit_store.clear()
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(iterations):
+        rate_limit.check_memory(f"rl:/bench:{i % clients}", MAX_REQUESTS, WINDOW, now + i * 1e-4)
+    report("memory fallback", time.perf_counter() - started, iterations)
+    print(f"{'':<28} {len(rate_limit._rate_limit_store)} keys kept "
+          f"(cap {settings.RATE_LIMIT_FALLBACK_MAX_KEYS})")
+
+
+async def bench_redis(iterations: int, clients: int) -> None:
+    client = get_redis()
+    try:
+        await client.ping()
+    except Exception as e:
+        print(f"redis sliding window         skipped ({e})")
+        return
+
+    keys = [f"rl:/bench:{i}" for i in range(clients)]
+    started = time.perf_counter()
+    for i in range(iterations):
+        await rate_limit.check_redis(client, keys[i % clients], MAX_REQUESTS, WINDOW, time.time())
+    report("redis sliding window", time.perf_counter() - started, iterations)
+
+    for start in range(0, len(keys), 1000):
+        await client.delete(*keys[start:start + 1000])
+
+
+async def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    clients = settings.RATE_LIMIT_FALLBACK_MAX_KEYS * 2
+    bench_memory(iterations, clients)
+    await bench_redis(min(iterations, 5000), clients)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())